@@ -0,0 +1,43 @@
+"""add session timestamps
+
+Revision ID: 5a1d2f9c7e41
+Revises: initial_schema, 31ef93caae33
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a1d2f9c7e41'
+down_revision: Union[str, Sequence[str], None] = ('initial_schema', '31ef93caae33')
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sessions', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.add_column('sessions', sa.Column('last_accessed_at', sa.DateTime(), nullable=True))
+    # Existing rows start their retention clock at upgrade time
+    op.execute("UPDATE sessions SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
+    op.create_index('ix_sessions_created_at', 'sessions', ['created_at'])
+    op.create_index('ix_sessions_last_accessed_at', 'sessions', ['last_accessed_at'])
+
+    # The retention worker reclaims space with incremental vacuum, which only
+    # works once auto_vacuum is INCREMENTAL; existing files need one VACUUM
+    # to switch modes, and VACUUM cannot run inside a transaction
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            op.execute("VACUUM")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sessions_last_accessed_at', table_name='sessions')
+    op.drop_index('ix_sessions_created_at', table_name='sessions')
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('last_accessed_at')
+        batch_op.drop_column('created_at')
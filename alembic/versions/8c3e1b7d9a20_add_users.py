@@ -0,0 +1,54 @@
+"""add users
+
+Revision ID: 8c3e1b7d9a20
+Revises: 5a1d2f9c7e41
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3e1b7d9a20'
+down_revision: Union[str, None] = '5a1d2f9c7e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Records that the upgrade found an existing users table, so that the
+# downgrade leaves that table in place instead of dropping user data
+adopted_tables = sa.table('alembic_adopted_tables', sa.column('name', sa.String))
+
+
+def upgrade() -> None:
+    # Databases created before the migrations may already have the table
+    if sa.inspect(op.get_bind()).has_table('users'):
+        op.create_table('alembic_adopted_tables',
+            sa.Column('name', sa.String(length=64), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+        op.bulk_insert(adopted_tables, [{'name': 'users'}])
+        return
+    op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if sa.inspect(bind).has_table('alembic_adopted_tables'):
+        adopted = bind.execute(
+            sa.select(adopted_tables.c.name).where(adopted_tables.c.name == 'users')
+        ).first()
+        op.drop_table('alembic_adopted_tables')
+        if adopted is not None:
+            return
+    op.drop_table('users')
@@ -0,0 +1,64 @@
+"""add document owner
+
+Revision ID: a7d4c9e2b813
+Revises: f3b8d2a61c47
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d4c9e2b813'
+down_revision: Union[str, None] = 'f3b8d2a61c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _documents(*extra):
+    return sa.Table('documents', sa.MetaData(),
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('chunks_json', sa.Text(), nullable=False),
+        sa.Column('characters', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.Index('ix_documents_last_used_at', 'last_used_at'),
+        *extra
+    )
+
+
+def upgrade() -> None:
+    # The unnamed unique constraint on content_hash cannot be dropped by name
+    # on SQLite, so the table is rebuilt from a definition without it.
+    # Documents uploaded before this have no owner and are not served.
+    with op.batch_alter_table('documents', copy_from=_documents(), recreate='always') as batch_op:
+        batch_op.add_column(sa.Column('owner', sa.String(length=255), nullable=True))
+        batch_op.create_index('ix_documents_owner', ['owner'])
+        batch_op.create_unique_constraint(
+            'uq_documents_owner_content_hash', ['owner', 'content_hash']
+        )
+
+
+def downgrade() -> None:
+    # Keep one copy of each PDF uploaded by several clients
+    op.execute(
+        "DELETE FROM documents WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM documents GROUP BY content_hash)"
+    )
+    documents = _documents(
+        sa.Column('owner', sa.String(length=255), nullable=True),
+        sa.Index('ix_documents_owner', 'owner'),
+        sa.UniqueConstraint('owner', 'content_hash', name='uq_documents_owner_content_hash'),
+    )
+    with op.batch_alter_table('documents', copy_from=documents, recreate='always') as batch_op:
+        batch_op.drop_constraint('uq_documents_owner_content_hash', type_='unique')
+        batch_op.drop_index('ix_documents_owner')
+        batch_op.drop_column('owner')
+        batch_op.create_unique_constraint('uq_documents_content_hash', ['content_hash'])
@@ -0,0 +1,37 @@
+"""add pregenerated quizzes
+
+Revision ID: b4f2a6c81d35
+Revises: 8c3e1b7d9a20
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f2a6c81d35'
+down_revision: Union[str, None] = '8c3e1b7d9a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('pregenerated_quizzes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('generation_key', sa.String(length=64), nullable=False),
+        sa.Column('questions_json', sa.Text(), nullable=False),
+        sa.Column('tokens', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_pregenerated_quizzes_generation_key', 'pregenerated_quizzes', ['generation_key'])
+    op.create_index('ix_pregenerated_quizzes_created_at', 'pregenerated_quizzes', ['created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pregenerated_quizzes_created_at', table_name='pregenerated_quizzes')
+    op.drop_index('ix_pregenerated_quizzes_generation_key', table_name='pregenerated_quizzes')
+    op.drop_table('pregenerated_quizzes')
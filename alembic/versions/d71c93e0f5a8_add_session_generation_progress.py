@@ -0,0 +1,29 @@
+"""add session generation progress
+
+Revision ID: d71c93e0f5a8
+Revises: b4f2a6c81d35
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd71c93e0f5a8'
+down_revision: Union[str, None] = 'b4f2a6c81d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('sessions', sa.Column('expected_questions', sa.Integer(), nullable=True))
+    op.add_column('sessions', sa.Column('generation_status', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sessions') as batch_op:
+        batch_op.drop_column('generation_status')
+        batch_op.drop_column('expected_questions')
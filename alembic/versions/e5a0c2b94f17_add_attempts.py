@@ -0,0 +1,35 @@
+"""add attempts
+
+Revision ID: e5a0c2b94f17
+Revises: d71c93e0f5a8
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a0c2b94f17'
+down_revision: Union[str, None] = 'd71c93e0f5a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('attempts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('quiz_id', sa.String(length=36), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('outcomes', sa.LargeBinary(), nullable=False),
+        sa.Column('choices', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_attempts_quiz_id', 'attempts', ['quiz_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_attempts_quiz_id', table_name='attempts')
+    op.drop_table('attempts')
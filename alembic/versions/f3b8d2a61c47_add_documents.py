@@ -0,0 +1,39 @@
+"""add documents
+
+Revision ID: f3b8d2a61c47
+Revises: e5a0c2b94f17
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d2a61c47'
+down_revision: Union[str, None] = 'e5a0c2b94f17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('documents',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('chunks_json', sa.Text(), nullable=False),
+        sa.Column('characters', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash')
+    )
+    op.create_index('ix_documents_last_used_at', 'documents', ['last_used_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_last_used_at', table_name='documents')
+    op.drop_table('documents')
@@ -1,20 +1,47 @@
 from flask import Flask
 from flask_cors import CORS
 from config import Config
-from routes.question_routes import question_bp
+from routes.question_routes import question_bp, start_pregeneration, warm_up
 from routes.auth_routes import auth_bp
-from models.models import init_db
+from routes.metrics_routes import metrics_bp
+from routes.data_routes import data_bp
+from models.models import init_db, db_session
+from services.auth import is_secure_secret
+from services.retention import start_retention_worker
+from services import metrics, responses
+
+# Tokens signed with a guessable key would let anyone act as any user
+if not is_secure_secret(Config.SECRET_KEY):
+    if Config.AUTH_REQUIRED:
+        raise RuntimeError("AUTH_REQUIRED is set but SECRET_KEY is not; set a random SECRET_KEY")
+    print("SECRET_KEY is not set; sign-in and bearer tokens are disabled")
 
 app = Flask(__name__)
 CORS(app)
 app.config.from_object(Config)
+metrics.init_app(app, server_timing=Config.SERVER_TIMING_ENABLED)
+responses.init_app(app, min_size=Config.RESPONSE_COMPRESS_MIN_BYTES)
 
 # Initialize database
 init_db()
+retention_worker = start_retention_worker(Config)
+pregeneration_worker = start_pregeneration()
 
 # Register blueprints
 app.register_blueprint(question_bp, url_prefix='/api')
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
+app.register_blueprint(metrics_bp)
+app.register_blueprint(data_bp, url_prefix='/api/data')
+
+
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    db_session.remove()
+
+
+# Provider clients are otherwise built lazily on the first LLM request
+if Config.LLM_WARM_UP_ON_START:
+    warm_up()
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
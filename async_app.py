@@ -0,0 +1,193 @@
+"""
+Async server for the LLM-bound endpoints.
+
+/api/generate, /api/generate/batch and /api/evaluate/<quiz_id> run as
+coroutines awaiting the providers' ``ainvoke``, so a waiting LLM call holds
+no thread and one process can keep hundreds of them in flight. PDF parsing
+and other blocking work is offloaded to a thread pool. Every other route is
+served by the Flask app from ``app.py`` on its own thread pool.
+
+    python async_app.py --port 8000
+    gunicorn async_app:create_app --worker-class aiohttp.GunicornWebWorker
+"""
+from aiohttp import web
+from multidict import CIMultiDict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app import app as flask_app
+from routes.async_question_routes import CPU_EXECUTOR, routes
+from routes.question_routes import get_http_pool, get_llm_service
+from services import metrics, responses
+import argparse
+import asyncio
+import io
+import sys
+from urllib.parse import unquote
+
+WSGI_EXECUTOR = web.AppKey("wsgi_executor", ThreadPoolExecutor)
+
+# Set by the server from the body it sends
+_SKIPPED_RESPONSE_HEADERS = {"content-length", "transfer-encoding", "connection"}
+
+
+def _wsgi_environ(request, body):
+    path = unquote(request.raw_path.split("?", 1)[0])
+    environ = {
+        "REQUEST_METHOD": request.method,
+        "SCRIPT_NAME": "",
+        # WSGI strings are bytes decoded as latin-1
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": request.query_string,
+        "SERVER_NAME": request.url.host or "localhost",
+        "SERVER_PORT": str(request.url.port or ""),
+        "SERVER_PROTOCOL": f"HTTP/{request.version.major}.{request.version.minor}",
+        "REMOTE_ADDR": request.remote or "",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": request.scheme,
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in request.headers.items():
+        key = name.upper().replace("-", "_")
+        if key == "CONTENT_TYPE":
+            environ[key] = value
+        elif key != "CONTENT_LENGTH":
+            key = "HTTP_" + key
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+# Streamed bodies are relayed in pieces of about this size
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+def _start_wsgi(environ):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = status
+        response["headers"] = headers
+
+    result = flask_app(environ, start_response)
+    return response["status"], response["headers"], result
+
+
+def _drain(result):
+    try:
+        return b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+
+
+def _read_chunks(iterator, limit=STREAM_CHUNK_BYTES):
+    """Pull body chunks until ``limit`` bytes are buffered; None at the end"""
+    chunks = []
+    size = 0
+    for chunk in iterator:
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b"".join(chunks) if chunks else None
+
+
+async def wsgi_bridge(request):
+    """Serve a request with the Flask app on the WSGI thread pool"""
+    body = await request.read()
+    loop = asyncio.get_running_loop()
+    executor = request.app[WSGI_EXECUTOR]
+    status, headers, result = await loop.run_in_executor(
+        executor, _start_wsgi, _wsgi_environ(request, body)
+    )
+    code, _, reason = status.partition(" ")
+    response_headers = CIMultiDict(
+        (name, value)
+        for name, value in headers
+        if name.lower() not in _SKIPPED_RESPONSE_HEADERS
+    )
+
+    if any(name.lower() == "content-length" for name, _ in headers):
+        payload = await loop.run_in_executor(executor, _drain, result)
+        return web.Response(
+            status=int(code), reason=reason or None, headers=response_headers, body=payload
+        )
+
+    # Streamed responses (e.g. the NDJSON export) are relayed as they are produced
+    response = web.StreamResponse(status=int(code), reason=reason or None, headers=response_headers)
+    await response.prepare(request)
+    iterator = iter(result)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, _read_chunks, iterator)
+            if chunk is None:
+                break
+            await response.write(chunk)
+    finally:
+        if hasattr(result, "close"):
+            await loop.run_in_executor(executor, result.close)
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    # Flask-CORS covers the bridged routes (including preflight requests)
+    response = await handler(request)
+    if request.headers.get("Origin") and "Access-Control-Allow-Origin" not in response.headers:
+        response.headers["Access-Control-Allow-Origin"] = "*"
+    return response
+
+
+async def _shutdown_executors(app):
+    app[CPU_EXECUTOR].shutdown(wait=False)
+    app[WSGI_EXECUTOR].shutdown(wait=False)
+
+
+async def _warm_up_connections(app):
+    # Async connections belong to the serving loop, so they are opened here
+    await get_llm_service().awarm_up(Config.LLM_WARM_UP_CONNECTIONS)
+
+
+async def _close_http_pool(app):
+    await get_http_pool().aclose()
+
+
+async def create_app():
+    app = web.Application(
+        middlewares=[
+            cors_middleware,
+            # Bridged requests are timed by the Flask app itself
+            metrics.aiohttp_middleware(
+                server_timing=Config.SERVER_TIMING_ENABLED, skip_routes=("wsgi",)
+            ),
+            # Bridged responses arrive already compressed by the Flask app
+            responses.aiohttp_middleware(min_size=Config.RESPONSE_COMPRESS_MIN_BYTES),
+        ],
+        client_max_size=Config.MAX_CONTENT_LENGTH,
+    )
+    app[CPU_EXECUTOR] = ThreadPoolExecutor(
+        max_workers=Config.ASYNC_CPU_WORKERS, thread_name_prefix="async-cpu"
+    )
+    app[WSGI_EXECUTOR] = ThreadPoolExecutor(
+        max_workers=Config.ASYNC_WSGI_WORKERS, thread_name_prefix="async-wsgi"
+    )
+    app.add_routes(routes)
+    app.router.add_route("*", "/{path:.*}", wsgi_bridge, name="wsgi")
+    if Config.LLM_WARM_UP_ON_START:
+        app.on_startup.append(_warm_up_connections)
+    app.on_cleanup.append(_shutdown_executors)
+    app.on_cleanup.append(_close_http_pool)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the async server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
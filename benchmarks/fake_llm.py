@@ -0,0 +1,170 @@
+"""
+Deterministic stand-in for a LangChain chat model.
+
+Replays canned JSON responses so benchmarks exercise the full parsing and
+post-processing path without any network access.
+"""
+import asyncio
+import json
+import re
+import time
+
+SAMPLE_QUESTIONS = {
+    "mcq": {
+        "question": "What is the powerhouse of the cell?",
+        "options": ["Mitochondria", "Nucleus", "Ribosome", "Golgi body"],
+        "answer": "Mitochondria",
+        "explanation": "Mitochondria produce ATP.",
+    },
+    "true_false": {
+        "question": "The Earth orbits the Sun.",
+        "answer": "true",
+        "explanation": "Heliocentric model.",
+    },
+    "fill_in_blank": {
+        "question": "_____ is the capital of France.",
+        "answer": "Paris",
+        "explanation": "Paris is the capital.",
+    },
+    "short": {
+        "question": "Define photosynthesis.",
+        "answer": "Conversion of light energy into chemical energy by plants.",
+        "explanation": "Occurs in chloroplasts.",
+    },
+    "long": {
+        "question": "Explain how photosynthesis works.",
+        "answer": "Light reactions produce ATP and NADPH; the Calvin cycle fixes CO2.",
+        "explanation": "Two stages.",
+    },
+    "code": {
+        "question": "Write a function that adds two numbers.",
+        "answer": "def add(a, b):\n    return a + b",
+        "explanation": "Returns the sum.",
+    },
+    "sequence": {
+        "question": "Arrange the stages of mitosis in order",
+        "answer": [
+            {"id": "1", "content": "Prophase"},
+            {"id": "2", "content": "Metaphase"},
+            {"id": "3", "content": "Anaphase"},
+            {"id": "4", "content": "Telophase"},
+        ],
+        "explanation": "PMAT.",
+    },
+    "diagram": {
+        "question": "Draw a labelled diagram of a neuron.",
+        "answer": "Cell body, dendrites, axon, myelin sheath, axon terminals.",
+        "explanation": "Label all parts.",
+    },
+    "match_the_following": {
+        "question": "Match the organelles to their functions",
+        "match_the_following_pairs": {
+            "left": ["Mitochondria", "Ribosome", "Nucleus"],
+            "right": ["Energy", "Protein synthesis", "Genetic material"],
+        },
+        "answer": {"Mitochondria": "Energy", "Ribosome": "Protein synthesis", "Nucleus": "Genetic material"},
+        "explanation": "Standard functions.",
+    },
+}
+
+GRADE_RESPONSE = {"is_correct": True, "explanation": "Covers the key points.", "score": 0.9}
+
+
+class FakeResponse:
+    def __init__(self, content, prompt_tokens=0):
+        self.content = content
+        completion_tokens = len(content) // 4
+        self.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+
+class FakeStructuredModel:
+    """``with_structured_output(..., include_raw=True)`` counterpart of FakeChatModel"""
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def _fit(self, value, schema):
+        # Keep only what the schema asks for, as a provider's structured output would
+        if isinstance(value, dict) and "properties" in schema:
+            return {
+                key: self._fit(value[key], schema["properties"][key])
+                for key in schema["properties"]
+                if key in value
+            }
+        if isinstance(value, list) and "items" in schema:
+            return [self._fit(item, schema["items"]) for item in value]
+        return value
+
+    def _structure(self, raw):
+        parsed = json.loads(raw.content)
+        if "is_correct" in parsed and parsed["is_correct"] and self.schema["title"] == "grade_short":
+            parsed["explanation"] = ""
+        # Mixed-type schemas (anyOf) are returned as generated
+        if "anyOf" not in json.dumps(self.schema):
+            parsed = self._fit(parsed, self.schema)
+        content = json.dumps(parsed, separators=(",", ":"))
+        raw = FakeResponse(content, raw.usage_metadata["input_tokens"])
+        return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+    def invoke(self, prompt, **kwargs):
+        return self._structure(self.model.invoke(prompt, **kwargs))
+
+    async def ainvoke(self, prompt, **kwargs):
+        return self._structure(await self.model.ainvoke(prompt, **kwargs))
+
+
+class FakeChatModel:
+    """Answers generation prompts with canned questions and grading prompts with a fixed grade"""
+
+    def __init__(self, latency=0.0):
+        self.calls = 0
+        self.latency = latency
+
+    def _prompt_text(self, prompt):
+        if isinstance(prompt, str):
+            return prompt
+        parts = []
+        for message in prompt:
+            content = getattr(message, "content", message)
+            parts.append(content if isinstance(content, str) else json.dumps(content))
+        return "\n".join(parts)
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        return FakeStructuredModel(self, schema)
+
+    def invoke(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(prompt)
+
+    def _respond(self, prompt):
+        text = self._prompt_text(prompt)
+        prompt_tokens = len(text) // 4
+
+        # Matches both single-type prompts and the "- N type questions"
+        # allocation lines of combined prompts
+        requested = re.findall(r"(\d+) (\w+) questions", text)
+        if requested:
+            questions = []
+            for count, question_type in requested:
+                template = SAMPLE_QUESTIONS.get(question_type, SAMPLE_QUESTIONS["short"])
+                for i in range(int(count)):
+                    question = json.loads(json.dumps(template))
+                    question["question"] = f"{template['question']} (#{i + 1})"
+                    question["type"] = question_type
+                    questions.append(question)
+            return FakeResponse(json.dumps({"questions": questions}), prompt_tokens)
+
+        return FakeResponse(json.dumps(GRADE_RESPONSE), prompt_tokens)
@@ -0,0 +1,143 @@
+"""
+Local OpenAI-compatible stand-in for load tests.
+
+Serves ``POST /v1/chat/completions`` with the canned replies of
+``fake_llm.FakeChatModel``, after a configurable latency with jitter, and
+fails a share of calls on purpose. Structured-output requests
+(``response_format`` of type ``json_schema``) get replies fitted to the
+schema. Point the app at it with ``OPENAI_BASE_URL``:
+
+    python benchmarks/fake_openai_server.py --port 8900 --latency 0.5 --jitter 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=fake python app.py
+
+``GET /stats`` returns the calls served and errors injected so far.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiohttp import web  # noqa: E402
+
+from benchmarks.fake_llm import FakeChatModel, FakeStructuredModel  # noqa: E402
+
+
+def _prompt_text(messages) -> str:
+    parts = []
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content or "")
+    return "\n".join(parts)
+
+
+def _pad(content: str, padding: int) -> str:
+    """Lengthen every question's explanation to grow the response size"""
+    if not padding:
+        return content
+    data = json.loads(content)
+    for question in data.get("questions", []):
+        question["explanation"] = question.get("explanation", "") + " " + "x" * padding
+    return json.dumps(data)
+
+
+def build_app(
+    latency: float = 0.5,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 500,
+    padding: int = 0,
+    seed=None,
+) -> web.Application:
+    model = FakeChatModel()
+    rng = random.Random(seed)
+    stats = {"calls": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "started": time.time()}
+
+    async def chat_completions(request):
+        body = await request.json()
+        stats["calls"] += 1
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return web.json_response(
+                {"error": {"message": "Injected failure", "type": "server_error", "code": None}},
+                status=error_status,
+            )
+
+        text = _prompt_text(body.get("messages", []))
+        reply = model.invoke(text)
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            spec = response_format["json_schema"]
+            schema = {**spec.get("schema", {}), "title": spec.get("name", "")}
+            reply = FakeStructuredModel(model, schema)._structure(reply)["raw"]
+        content = _pad(reply.content, padding)
+
+        prompt_tokens = len(text) // 4
+        completion_tokens = len(content) // 4
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        return web.json_response(
+            {
+                "id": f"chatcmpl-fake-{stats['calls']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    async def models(request):
+        return web.json_response(
+            {"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "local"}]}
+        )
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_get("/v1/models", models)
+    app.router.add_get("/stats", get_stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- seconds on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed calls")
+    parser.add_argument("--padding", type=int, default=0, help="Extra characters per question explanation")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    web.run_app(
+        build_app(args.latency, args.jitter, args.error_rate, args.error_status, args.padding, args.seed),
+        host=args.host,
+        port=args.port,
+        print=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""
+End-to-end load test of the HTTP API against a local fake LLM.
+
+Starts ``fake_openai_server.py`` and the app (Flask or the async server) in
+subprocesses, with the app using a throwaway database in a temporary
+directory and ``OPENAI_BASE_URL`` pointing at the fake. It then drives a
+weighted mix of operations at a fixed concurrency and prints throughput,
+latency percentiles and errors per operation as JSON, so runs can be
+stored and compared between releases:
+
+    python benchmarks/loadtest.py --concurrency 16 --duration 30 > baseline.json
+    python benchmarks/loadtest.py --server async --compare baseline.json
+    python benchmarks/loadtest.py --mix generate=1,quiz=5,evaluate=2 --llm-latency 1.5
+
+Operations: ``generate`` (JSON topic request), ``generate_pdf`` (multipart
+PDF upload), ``quiz`` (GET /api/quiz/<id>) and ``evaluate``.
+
+An operation whose p99 is far above its p50 (``--tail-ratio``) is reported
+on stderr and fails the run, like a regression against ``--compare``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import aiohttp  # noqa: E402
+
+DEFAULT_MIX = "generate=2,generate_pdf=1,quiz=4,evaluate=3"
+
+# Run in the app subprocess: a fresh schema in the cwd database, then serve
+LAUNCHERS = {
+    "flask": (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from models.models import Base, engine; Base.metadata.create_all(engine)\n"
+        "from app import app\n"
+        "app.run(host='127.0.0.1', port=int(sys.argv[2]), threaded=True)\n"
+    ),
+    "async": (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from models.models import Base, engine; Base.metadata.create_all(engine)\n"
+        "from aiohttp import web; import async_app\n"
+        "web.run_app(async_app.create_app(), host='127.0.0.1', port=int(sys.argv[2]), print=None)\n"
+    ),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for entry in value.split(","):
+        name, _, weight = entry.partition("=")
+        name = name.strip()
+        if name not in ("generate", "generate_pdf", "quiz", "evaluate"):
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class Processes:
+    """The fake LLM server and the app under test"""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="quiz-loadtest-")
+        self.llm_port = free_port()
+        self.app_port = free_port()
+        self.procs = []
+
+    @property
+    def llm_url(self):
+        return f"http://127.0.0.1:{self.llm_port}"
+
+    @property
+    def app_url(self):
+        return self.args.target or f"http://127.0.0.1:{self.app_port}"
+
+    def _spawn(self, cmd, env=None):
+        log = open(os.path.join(self.workdir, f"proc{len(self.procs)}.log"), "w")
+        proc = subprocess.Popen(
+            cmd, cwd=self.workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        self.procs.append(proc)
+        return proc
+
+    def start(self):
+        args = self.args
+        self._spawn(
+            [
+                sys.executable,
+                os.path.join(ROOT, "benchmarks", "fake_openai_server.py"),
+                "--port", str(self.llm_port),
+                "--latency", str(args.llm_latency),
+                "--jitter", str(args.llm_jitter),
+                "--error-rate", str(args.llm_error_rate),
+                "--padding", str(args.llm_padding),
+                "--seed", "0",
+            ]
+        )
+        if args.target:
+            return
+        env = {
+            **os.environ,
+            "OPENAI_API_KEY": "loadtest",
+            "OPENAI_BASE_URL": f"{self.llm_url}/v1",
+            "OPENAI_API_BASE": f"{self.llm_url}/v1",
+            "LLM_PROVIDERS": "openai",
+            # The harness is one client; per-client limits would dominate
+            "CLIENT_REQUESTS_PER_MINUTE": "0",
+            "CLIENT_DAILY_TOKEN_QUOTA": "0",
+            "PREGEN_ENABLED": "false",
+            "QUIZ_RESULTS_DIR": os.path.join(self.workdir, "quiz_results"),
+            "IMAGE_STORE_DIR": os.path.join(self.workdir, "images"),
+            "PYTHONWARNINGS": "ignore",
+            **dict(args.app_env),
+        }
+        self._spawn(
+            [sys.executable, "-c", LAUNCHERS[args.server], ROOT, str(self.app_port)], env=env
+        )
+
+    async def wait_ready(self, session, timeout=60):
+        deadline = time.monotonic() + timeout
+        for url in (f"{self.llm_url}/stats", f"{self.app_url}/metrics"):
+            while True:
+                try:
+                    async with session.get(url) as response:
+                        await response.read()
+                        break
+                except aiohttp.ClientError:
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"{url} did not come up; logs in {self.workdir}")
+                    if any(proc.poll() is not None for proc in self.procs):
+                        raise RuntimeError(f"A server exited early; logs in {self.workdir}")
+                    await asyncio.sleep(0.2)
+
+    def stop(self):
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if not self.args.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Workload:
+    """Issues the mixed operations and records every outcome"""
+
+    def __init__(self, args, base_url, session):
+        from benchmarks.run import make_sample_pdf
+
+        self.args = args
+        self.base_url = base_url
+        self.session = session
+        self.rng = random.Random(args.seed)
+        self.pdf = make_sample_pdf(pages=args.pdf_pages)
+        self.quizzes = []  # (quiz_id, questions)
+        self.samples = defaultdict(list)  # operation -> [seconds]
+        self.errors = Counter()  # "operation: reason" -> count
+        self.error_samples = {}  # "operation: reason" -> first response body
+
+    def _topic_request(self):
+        return {
+            "subject": "Biology",
+            "topic": f"Cells {self.rng.randrange(self.args.topics)}",
+            "question_type": self.args.question_types,
+            "difficulty": "medium",
+            "num_questions": self.args.num_questions,
+        }
+
+    async def _timed(self, operation, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, self.base_url + path, **kwargs) as response:
+                body = await response.read()
+                elapsed = time.perf_counter() - start
+                if response.status >= 400:
+                    return self._failed(f"{operation}: HTTP {response.status}", body)
+                payload = json.loads(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            return self._failed(f"{operation}: {type(e).__name__}", str(e))
+        if payload.get("success") is False:
+            return self._failed(f"{operation}: success=false", body)
+        self.samples[operation].append(elapsed)
+        return payload
+
+    def _failed(self, key, detail):
+        self.errors[key] += 1
+        if key not in self.error_samples:
+            if isinstance(detail, bytes):
+                detail = detail.decode("utf-8", "replace")
+            self.error_samples[key] = detail[:300]
+        return None
+
+    def _remember(self, payload):
+        if payload and payload.get("quiz_id") and payload.get("questions"):
+            self.quizzes.append((payload["quiz_id"], payload["questions"]))
+
+    async def generate(self):
+        self._remember(await self._timed("generate", "POST", "/api/generate", json=self._topic_request()))
+
+    async def generate_pdf(self):
+        form = aiohttp.FormData()
+        form.add_field("file", self.pdf, filename="loadtest.pdf", content_type="application/pdf")
+        form.add_field("question_type", self.args.question_types[0])
+        form.add_field("num_questions", str(self.args.num_questions))
+        self._remember(await self._timed("generate_pdf", "POST", "/api/generate", data=form))
+
+    async def quiz(self):
+        if not self.quizzes:
+            return await self.generate()
+        quiz_id, _ = self.rng.choice(self.quizzes)
+        await self._timed("quiz", "GET", f"/api/quiz/{quiz_id}")
+
+    async def evaluate(self):
+        if not self.quizzes:
+            return await self.generate()
+        quiz_id, questions = self.rng.choice(self.quizzes)
+        # Half right, half wrong, so both local and LLM grading paths run
+        answers = [
+            {"answer": question.get("answer") if self.rng.random() < 0.5 else "not sure"}
+            for question in questions
+        ]
+        await self._timed("evaluate", "POST", f"/api/evaluate/{quiz_id}", json={"answers": answers})
+
+    async def worker(self, operations, weights, deadline, budget):
+        while time.monotonic() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            operation = self.rng.choices(operations, weights)[0]
+            await getattr(self, operation)()
+
+    async def run(self, mix, concurrency, duration, max_requests):
+        for _ in range(self.args.seed_quizzes):
+            await self.generate()
+        self.samples.clear()
+        self.errors.clear()
+        self.error_samples.clear()
+
+        operations, weights = list(mix), list(mix.values())
+        budget = [max_requests or float("inf")]
+        start = time.perf_counter()
+        deadline = time.monotonic() + duration
+        await asyncio.gather(
+            *(self.worker(operations, weights, deadline, budget) for _ in range(concurrency))
+        )
+        return time.perf_counter() - start
+
+
+def summarize(samples, errors, elapsed):
+    def stats(values, failed):
+        ordered = sorted(values)
+        ms = lambda v: round(v * 1000, 2) if v is not None else None  # noqa: E731
+        return {
+            "requests": len(values) + failed,
+            "errors": failed,
+            "throughput_rps": round(len(values) / elapsed, 2) if elapsed else None,
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "max_ms": ms(ordered[-1] if ordered else None),
+        }
+
+    failed_by_operation = Counter()
+    for key, count in errors.items():
+        failed_by_operation[key.split(":")[0]] += count
+    operations = {
+        operation: stats(samples.get(operation, []), failed_by_operation[operation])
+        for operation in sorted(set(samples) | set(failed_by_operation))
+    }
+    overall = stats([v for values in samples.values() for v in values], sum(errors.values()))
+    return overall, operations
+
+
+def compare(output, baseline_path, threshold):
+    """Operations whose throughput fell or p95 rose by more than ``threshold``"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    current = {"overall": output["overall"], **output["operations"]}
+    previous = {"overall": baseline["overall"], **baseline.get("operations", {})}
+    for name, result in current.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        if before.get("p95_ms") and result.get("p95_ms"):
+            result["baseline_p95_ms"] = before["p95_ms"]
+            if result["p95_ms"] > before["p95_ms"] * (1 + threshold):
+                regressions.append(f"{name}: p95")
+        if before.get("throughput_rps") and result.get("throughput_rps") is not None:
+            result["baseline_throughput_rps"] = before["throughput_rps"]
+            if result["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+                regressions.append(f"{name}: throughput")
+    return regressions
+
+
+def latency_tails(output, ratio, min_gap_ms):
+    """
+    Operations whose p99 is more than ``ratio`` times their p50 and at least
+    ``min_gap_ms`` above it: a slow path some requests take, such as a stall
+    or retry, that throughput and p50 hide
+    """
+    tails = []
+    results = {"overall": output["overall"], **output["operations"]}
+    for name, result in results.items():
+        p50, p99 = result.get("p50_ms"), result.get("p99_ms")
+        if p50 and p99 and p99 > p50 * ratio and p99 - p50 >= min_gap_ms:
+            tails.append(f"{name}: p99 {p99} ms vs p50 {p50} ms")
+    return tails
+
+
+def parse_env(value: str):
+    name, _, setting = value.partition("=")
+    if not name or not _:
+        raise argparse.ArgumentTypeError("--app-env takes NAME=VALUE")
+    return name, setting
+
+
+async def run(args):
+    processes = Processes(args)
+    processes.start()
+    try:
+        timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await processes.wait_ready(session)
+            workload = Workload(args, processes.app_url, session)
+            elapsed = await workload.run(args.mix, args.concurrency, args.duration, args.requests)
+            async with session.get(f"{processes.llm_url}/stats") as response:
+                llm_stats = await response.json()
+        return workload, elapsed, llm_stats
+    finally:
+        processes.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API load test with a fake LLM")
+    parser.add_argument("--server", choices=sorted(LAUNCHERS), default="flask")
+    parser.add_argument("--target", help="Load an already running app at this URL instead")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--question-types", type=lambda v: v.split(","), default=["mcq", "short"])
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--topics", type=int, default=50, help="Distinct topics requested")
+    parser.add_argument("--pdf-pages", type=int, default=3)
+    parser.add_argument("--seed-quizzes", type=int, default=3, help="Quizzes generated before measuring")
+    parser.add_argument("--request-timeout", type=float, default=120)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM seconds per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-padding", type=int, default=0, help="Extra characters per generated question")
+    parser.add_argument("--app-env", type=parse_env, action="append", default=[], help="NAME=VALUE setting for the app (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the work directory and server logs")
+    parser.add_argument("--compare", help="Baseline JSON file from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression vs baseline")
+    parser.add_argument("--tail-ratio", type=float, default=4, help="Flag operations whose p99 exceeds this multiple of p50 (0 disables)")
+    parser.add_argument("--tail-min-ms", type=float, default=1000, help="Ignore tails smaller than this gap between p50 and p99")
+    args = parser.parse_args()
+
+    workload, elapsed, llm_stats = asyncio.run(run(args))
+    overall, operations = summarize(workload.samples, workload.errors, elapsed)
+    output = {
+        "benchmark": "loadtest",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "server": args.server if not args.target else args.target,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": args.mix,
+            "llm_latency": args.llm_latency,
+            "llm_jitter": args.llm_jitter,
+            "llm_error_rate": args.llm_error_rate,
+            "llm_padding": args.llm_padding,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "overall": overall,
+        "operations": operations,
+        "errors": dict(workload.errors.most_common()),
+        "error_samples": workload.error_samples,
+        "llm": {key: llm_stats[key] for key in ("calls", "errors", "prompt_tokens", "completion_tokens")},
+    }
+    regressions = []
+    if args.compare:
+        regressions = compare(output, args.compare, args.threshold)
+        output["regressions"] = regressions
+
+    tails = []
+    if args.tail_ratio:
+        tails = latency_tails(output, args.tail_ratio, args.tail_min_ms)
+        output["latency_tails"] = tails
+        for tail in tails:
+            print(f"Latency tail: {tail}", file=sys.stderr)
+
+    json.dump(output, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    sys.exit(1 if regressions or tails else 0)
+
+
+if __name__ == "__main__":
+    main()
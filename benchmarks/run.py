@@ -0,0 +1,250 @@
+"""
+Offline microbenchmarks for the Python-side hot paths.
+
+Everything runs locally: LLM calls go to a deterministic fake model and the
+sample PDF and image are generated in memory. Results are printed as JSON so
+runs can be stored and compared between versions:
+
+    python benchmarks/run.py > baseline.json
+    python benchmarks/run.py --compare baseline.json
+    python benchmarks/run.py --filter preprocess --min-time 0.5
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+warnings.filterwarnings("ignore")
+
+from benchmarks.fake_llm import SAMPLE_QUESTIONS, FakeChatModel  # noqa: E402
+
+
+def make_sample_pdf(pages=20, lines_per_page=40):
+    """Build a small text PDF in memory without any PDF library"""
+    rng = random.Random(42)
+    words = "cell energy membrane protein enzyme gene nucleus osmosis photosynthesis respiration".split()
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(words) for _ in range(12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 40 800 Td 14 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_sample_image(width=1024, height=1024):
+    """Noisy RGBA PNG: a worst case for JPEG compression"""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(42)
+    pixels = rng.integers(0, 256, size=(height, width, 4), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "RGBA").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_benchmarks():
+    """Return a list of (name, callable) pairs"""
+    from models.models import SessionModel
+    from routes.question_routes import compress_image, load_pdf_context
+    from services.llm_service import LLMService
+    from services.pdf_inspect import count_pdf_pages
+    from services.providers import ProviderBackend
+    from werkzeug.datastructures import FileStorage
+
+    service = LLMService(backends=[ProviderBackend("fake", FakeChatModel())])
+    benchmarks = []
+
+    answers = {
+        "mcq": ("  Mitochondria ", "Mitochondria"),
+        "true_false": ("TRUE", "true"),
+        "fill_in_blank": ("paris", "Paris"),
+        "short": ("Light to chemical energy", SAMPLE_QUESTIONS["short"]["answer"]),
+        "sequence": (
+            json.dumps(["Prophase", "Metaphase", "Anaphase", "Telophase"]),
+            SAMPLE_QUESTIONS["sequence"]["answer"],
+        ),
+        "match_the_following": (
+            str(SAMPLE_QUESTIONS["match_the_following"]["answer"]),
+            SAMPLE_QUESTIONS["match_the_following"]["answer"],
+        ),
+    }
+    for question_type, (user_answer, correct_answer) in answers.items():
+        benchmarks.append(
+            (
+                f"preprocess_answer[{question_type}]",
+                lambda u=user_answer, t=question_type: service._preprocess_answer(u, t),
+            )
+        )
+        processed_user = service._preprocess_answer(user_answer, question_type)
+        processed_correct = service._preprocess_answer(correct_answer, question_type)
+        benchmarks.append(
+            (
+                f"basic_string_match[{question_type}]",
+                lambda u=processed_user, c=processed_correct, t=question_type: service._basic_string_match(u, c, t),
+            )
+        )
+
+    evaluations = [{"is_correct": i % 3 != 0} for i in range(100)]
+    benchmarks.append(("calculate_quiz_score[100]", lambda: service.calculate_quiz_score(evaluations)))
+
+    large_quiz = []
+    for i in range(500):
+        question_type = list(SAMPLE_QUESTIONS)[i % len(SAMPLE_QUESTIONS)]
+        question = dict(SAMPLE_QUESTIONS[question_type], type=question_type)
+        question["question"] = f"{question['question']} ({i})"
+        large_quiz.append(question)
+    session = SessionModel()
+    session.set_questions(large_quiz)
+    benchmarks.append(("session_set_questions[500]", lambda: session.set_questions(large_quiz)))
+    benchmarks.append(("session_get_questions[500]", lambda: session.get_questions()))
+
+    image_bytes = make_sample_image()
+    benchmarks.append(("compress_image[1024x1024]", lambda: compress_image(io.BytesIO(image_bytes))))
+
+    long_pdf_bytes = make_sample_pdf(pages=500, lines_per_page=5)
+    benchmarks.append(
+        ("count_pdf_pages[500 pages]", lambda: count_pdf_pages(io.BytesIO(long_pdf_bytes)))
+    )
+
+    pdf_bytes = make_sample_pdf()
+    benchmarks.append(
+        (
+            "pdf_load_split[20 pages]",
+            lambda: load_pdf_context(FileStorage(io.BytesIO(pdf_bytes), filename="sample.pdf")),
+        )
+    )
+
+    benchmarks.append(
+        (
+            "generate_questions[fake llm, 3 types x 10]",
+            lambda: service.generate_questions(
+                "Biology", "Cells", ["mcq", "true_false", "match_the_following"], "medium", 10
+            ),
+        )
+    )
+    short_question = dict(SAMPLE_QUESTIONS["short"], type="short")
+    benchmarks.append(
+        (
+            "evaluate_answer[fake llm, short]",
+            lambda: service.evaluate_answer(short_question, "Plants turn light into energy"),
+        )
+    )
+    mcq_question = dict(SAMPLE_QUESTIONS["mcq"], type="mcq")
+    benchmarks.append(
+        ("evaluate_answer[local, mcq]", lambda: service.evaluate_answer(mcq_question, "Mitochondria"))
+    )
+    return benchmarks
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """Time ``fn`` with an auto-calibrated loop count; returns seconds per call"""
+    fn()  # warm up caches and lazy imports
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return number, samples
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if not previous:
+            continue
+        ratio = result["median_us"] / previous["median_us"] if previous["median_us"] else 1.0
+        result["baseline_median_us"] = previous["median_us"]
+        result["ratio"] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(result["name"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--compare", help="Baseline JSON file from a previous run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    results = []
+    for name, fn in build_benchmarks():
+        if args.filter and args.filter not in name:
+            continue
+        number, samples = measure(fn, args.min_time, args.repeat)
+        results.append(
+            {
+                "name": name,
+                "loops": number,
+                "min_us": round(min(samples) * 1e6, 3),
+                "median_us": round(statistics.median(samples) * 1e6, 3),
+                "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+            }
+        )
+
+    output = {
+        "benchmark": "microbench",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    regressions = []
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        output["regressions"] = regressions
+
+    json.dump(output, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
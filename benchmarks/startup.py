@@ -0,0 +1,78 @@
+"""
+Measure interpreter startup cost of the app's entry points.
+
+Runs each target in a fresh interpreter with ``-X importtime`` and reports
+the wall time plus the slowest imports (cumulative milliseconds) as JSON:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --target app --target manage_db --top 15
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TARGETS = ["app", "routes.question_routes", "services.llm_service", "manage_db"]
+
+
+def measure(target, top=10, repeat=3, max_depth=2):
+    """Import ``target`` in a subprocess and collect -X importtime output"""
+    wall_times = []
+    modules = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {target}"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        wall_times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            return {"target": target, "error": proc.stderr.strip().splitlines()[-1]}
+
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            parts = line[len("import time:"):].split("|")
+            try:
+                cumulative = int(parts[1])
+            except ValueError:
+                continue  # header row
+            name = parts[2].rstrip()
+            depth = (len(name) - len(name.lstrip())) // 2
+            if depth > max_depth:
+                continue
+            modules.setdefault(name.strip(), []).append(cumulative)
+
+    slowest = sorted(
+        ((name, min(times)) for name, times in modules.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "target": target,
+        "wall_seconds": round(min(wall_times), 4),
+        "slowest_imports_ms": {name: round(us / 1000, 2) for name, us in slowest},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", action="append", help="Module to import")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=2, help="Import nesting depth to report")
+    args = parser.parse_args()
+
+    results = [measure(t, args.top, args.repeat, args.depth) for t in args.target or DEFAULT_TARGETS]
+    json.dump({"benchmark": "startup", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
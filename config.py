@@ -1,12 +1,152 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class Config:
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key')
+    # Signs access tokens. There is no default: while it is unset tokens are
+    # neither issued nor accepted, and AUTH_REQUIRED refuses to start.
+    SECRET_KEY = os.getenv('SECRET_KEY')
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     # SQLite configuration
     SQLITE_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'question_generator.db')
-    DATABASE_URL = f'sqlite:///{SQLITE_DB_PATH}' 
\ No newline at end of file
+    DATABASE_URL = f'sqlite:///{SQLITE_DB_PATH}'
+
+    # Retention policy for the sessions table. Unset values disable that rule.
+    SESSION_MAX_AGE_DAYS = float(os.getenv('SESSION_MAX_AGE_DAYS', 0)) or None
+    SESSION_MAX_IDLE_DAYS = float(os.getenv('SESSION_MAX_IDLE_DAYS', 0)) or None
+    SESSION_TOUCH_GRANULARITY_SECONDS = int(os.getenv('SESSION_TOUCH_GRANULARITY_SECONDS', 3600))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 200))
+    RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', 3600))
+    RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 1000))
+
+    # Batch generation
+    MAX_BATCH_VARIANTS = int(os.getenv('MAX_BATCH_VARIANTS', 10))
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+
+    # LLM providers, in order of preference
+    LLM_PROVIDERS = [p.strip() for p in os.getenv('LLM_PROVIDERS', 'openai').split(',') if p.strip()]
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 0)) or None
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+    LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', 1.0))
+
+    # Client-side LLM rate limits per provider (0 disables a limit)
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv('LLM_REQUESTS_PER_MINUTE', 0)) or None
+    LLM_TOKENS_PER_MINUTE = float(os.getenv('LLM_TOKENS_PER_MINUTE', 0)) or None
+    LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv('LLM_RATE_LIMIT_MAX_WAIT', 30))
+
+    # Retries for failed or incomplete LLM responses
+    LLM_MAX_ATTEMPTS = int(os.getenv('LLM_MAX_ATTEMPTS', 3))
+    LLM_RETRY_BACKOFF = float(os.getenv('LLM_RETRY_BACKOFF', 0.5))
+    LLM_RETRY_MAX_WAIT = float(os.getenv('LLM_RETRY_MAX_WAIT', 8))
+
+    # Request deadline for generation and grading, in seconds (0 for none).
+    # Clients can ask for their own with an X-Request-Timeout header or a
+    # ?timeout= parameter, up to the maximum.
+    REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', 0)) or None
+    REQUEST_MAX_TIMEOUT_SECONDS = float(os.getenv('REQUEST_MAX_TIMEOUT_SECONDS', 600)) or None
+
+    # Build LLM provider clients at startup instead of on first use, and
+    # pre-open this many pooled connections to each provider host
+    LLM_WARM_UP_ON_START = os.getenv('LLM_WARM_UP_ON_START', 'false').lower() == 'true'
+    LLM_WARM_UP_CONNECTIONS = int(os.getenv('LLM_WARM_UP_CONNECTIONS', 4))
+
+    # HTTP connection pool shared by the OpenAI-compatible provider clients
+    # (HTTP/2 needs the h2 package)
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv('LLM_HTTP_MAX_CONNECTIONS', 100))
+    LLM_HTTP_MAX_KEEPALIVE = int(os.getenv('LLM_HTTP_MAX_KEEPALIVE', 20))
+    LLM_HTTP_KEEPALIVE_SECONDS = float(os.getenv('LLM_HTTP_KEEPALIVE_SECONDS', 60))
+    LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv('LLM_HTTP_CONNECT_TIMEOUT', 5))
+    LLM_HTTP_POOL_TIMEOUT = float(os.getenv('LLM_HTTP_POOL_TIMEOUT', 10))
+    LLM_HTTP2 = os.getenv('LLM_HTTP2', 'false').lower() == 'true'
+
+    # Send Server-Timing headers on every response (clients can also opt in
+    # per request with an X-Server-Timing header)
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+
+    # Model tiering (opt-in): route simple operations to a faster model. Routes
+    # are "operation:question_type:difficulty=tier" entries; empty uses defaults.
+    # Grading routes match on question type only.
+    LLM_TIERING_ENABLED = os.getenv('LLM_TIERING_ENABLED', 'false').lower() == 'true'
+    LLM_MODEL_ROUTES = os.getenv('LLM_MODEL_ROUTES', '')
+    LLM_GRADE_CONFIDENCE_MARGIN = float(os.getenv('LLM_GRADE_CONFIDENCE_MARGIN', 0.2))
+
+    # How long a request waits on an identical in-flight LLM call
+    LLM_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('LLM_SINGLE_FLIGHT_TIMEOUT', 180))
+
+    # Quizzes with several types and at most this many questions are
+    # generated in a single LLM call (0 disables)
+    LLM_COMBINED_MAX_QUESTIONS = int(os.getenv('LLM_COMBINED_MAX_QUESTIONS', 10))
+
+    # Share of LLM calls (0-1) using the providers' native structured output
+    # instead of prompt-only JSON; llm_parse_total and the completion token
+    # counters are labelled by output_mode to compare the two
+    LLM_STRUCTURED_OUTPUT = float(os.getenv('LLM_STRUCTURED_OUTPUT', 0))
+    # Grades leave the explanation empty for correct answers
+    LLM_GRADE_SHORT_EXPLANATIONS = os.getenv('LLM_GRADE_SHORT_EXPLANATIONS', 'false').lower() == 'true'
+
+    # Async server (async_app.py): threads for CPU-bound work such as PDF
+    # parsing, and threads for routes served by the Flask app
+    ASYNC_CPU_WORKERS = int(os.getenv('ASYNC_CPU_WORKERS', 4))
+    ASYNC_WSGI_WORKERS = int(os.getenv('ASYNC_WSGI_WORKERS', 16))
+
+    # Request limits, checked before any parsing or LLM work. Flask enforces
+    # MAX_CONTENT_LENGTH while the body streams in.
+    MAX_CONTENT_LENGTH = int(float(os.getenv('MAX_UPLOAD_MB', 16)) * 1024 * 1024)
+    PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 30))
+    MAX_QUESTIONS_PER_QUIZ = int(os.getenv('MAX_QUESTIONS_PER_QUIZ', 50))
+
+    # Responses at least this large are gzip/brotli compressed when the
+    # client accepts it
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+
+    # Spool for uploaded answer images, referenced by id from /evaluate
+    IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR', os.path.join(tempfile.gettempdir(), 'quiz-images'))
+    IMAGE_STORE_MAX_AGE_HOURS = float(os.getenv('IMAGE_STORE_MAX_AGE_HOURS', 24))
+    MAX_IMAGE_MB = float(os.getenv('MAX_IMAGE_MB', 10))
+
+    # Uploaded PDFs stored as extracted text (POST /api/documents) and
+    # referenced by doc_id from /generate; removed after going unused
+    DOCUMENT_MAX_AGE_HOURS = float(os.getenv('DOCUMENT_MAX_AGE_HOURS', 720))
+    DOCUMENT_CACHE_SIZE = int(os.getenv('DOCUMENT_CACHE_SIZE', 32))
+
+    # Access tokens and per-client limits on the LLM-bound endpoints. Without
+    # AUTH_REQUIRED, anonymous callers are limited by address. 0 disables a limit.
+    AUTH_REQUIRED = os.getenv('AUTH_REQUIRED', 'false').lower() == 'true'
+    AUTH_TOKEN_TTL_HOURS = float(os.getenv('AUTH_TOKEN_TTL_HOURS', 1))
+    AUTH_VERIFY_CACHE_SIZE = int(os.getenv('AUTH_VERIFY_CACHE_SIZE', 10000))
+    CLIENT_REQUESTS_PER_MINUTE = int(os.getenv('CLIENT_REQUESTS_PER_MINUTE', 20))
+    CLIENT_DAILY_TOKEN_QUOTA = int(os.getenv('CLIENT_DAILY_TOKEN_QUOTA', 500000))
+
+    # Background pre-generation of the most requested topic quizzes while the
+    # server is idle, within a daily token budget (0 = unlimited)
+    PREGEN_ENABLED = os.getenv('PREGEN_ENABLED', 'false').lower() == 'true'
+    PREGEN_INTERVAL_SECONDS = float(os.getenv('PREGEN_INTERVAL_SECONDS', 60))
+    PREGEN_IDLE_SECONDS = float(os.getenv('PREGEN_IDLE_SECONDS', 30))
+    PREGEN_TOP_KEYS = int(os.getenv('PREGEN_TOP_KEYS', 10))
+    PREGEN_STOCK_PER_KEY = int(os.getenv('PREGEN_STOCK_PER_KEY', 2))
+    PREGEN_MIN_REQUESTS = float(os.getenv('PREGEN_MIN_REQUESTS', 3))
+    PREGEN_DAILY_TOKEN_BUDGET = int(os.getenv('PREGEN_DAILY_TOKEN_BUDGET', 200000))
+    PREGEN_MAX_AGE_HOURS = float(os.getenv('PREGEN_MAX_AGE_HOURS', 72))
+    PREGEN_DEMAND_HALF_LIFE_HOURS = float(os.getenv('PREGEN_DEMAND_HALF_LIFE_HOURS', 72))
+
+    # Progressive quizzes: /generate with "progressive" returns after the
+    # first questions and generates the rest in the background
+    PROGRESSIVE_FIRST_BATCH = int(os.getenv('PROGRESSIVE_FIRST_BATCH', 3))
+    PROGRESSIVE_WORKERS = int(os.getenv('PROGRESSIVE_WORKERS', 4))
+    PROGRESSIVE_WAIT_SECONDS = float(os.getenv('PROGRESSIVE_WAIT_SECONDS', 120))
+    PROGRESSIVE_STALE_SECONDS = float(os.getenv('PROGRESSIVE_STALE_SECONDS', 600))
+
+    # Bulk NDJSON export/import. The API endpoints are disabled unless
+    # DATA_API_TOKEN is set; clients send it as a bearer token.
+    QUIZ_RESULTS_DIR = os.getenv('QUIZ_RESULTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'quiz_results'))
+    DATA_API_TOKEN = os.getenv('DATA_API_TOKEN')
+    BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', 500))
+
+    # Item analytics: every evaluation is stored as an attempt; statistics
+    # for the most recently viewed quizzes are cached and updated in place
+    ITEM_ANALYTICS_ENABLED = os.getenv('ITEM_ANALYTICS_ENABLED', 'true').lower() == 'true'
+    ITEM_ANALYTICS_CACHE_SIZE = int(os.getenv('ITEM_ANALYTICS_CACHE_SIZE', 256))
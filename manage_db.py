@@ -1,6 +1,7 @@
 import click
 import os
 import subprocess
+from config import Config
 
 @click.group()
 def cli():
@@ -31,5 +32,145 @@ def downgrade():
     subprocess.run(["alembic", "downgrade", "-1"])
     click.echo("Rolled back one migration")
 
+@cli.command()
+@click.option('--max-age-days', type=float, default=Config.SESSION_MAX_AGE_DAYS, help='Delete sessions created more than this many days ago')
+@click.option('--max-idle-days', type=float, default=Config.SESSION_MAX_IDLE_DAYS, help='Delete sessions not accessed for this many days')
+@click.option('--batch-size', type=int, default=Config.RETENTION_BATCH_SIZE, help='Rows deleted per transaction')
+@click.option('--dry-run', is_flag=True, help='Only report how many sessions, attempts and result files would be deleted')
+@click.option('--vacuum/--no-vacuum', default=True, help='Run an incremental vacuum after pruning')
+@click.option('--full', is_flag=True, help='Run a full VACUUM (enables incremental vacuum on first use)')
+def prune(max_age_days, max_idle_days, batch_size, dry_run, vacuum, full):
+    """Delete expired quiz sessions and reclaim disk space"""
+    from services.retention import (
+        compact_database,
+        count_expired_sessions,
+        prune_expired_sessions,
+    )
+
+    if dry_run:
+        counts = count_expired_sessions(
+            max_age_days, max_idle_days, results_dir=Config.QUIZ_RESULTS_DIR
+        )
+        click.echo(
+            f"{counts['sessions']} sessions would be deleted, with {counts['attempts']} "
+            f"attempts and {counts['result_files']} result files"
+        )
+        return
+
+    if not (max_age_days or max_idle_days):
+        click.echo("No retention policy configured; pass --max-age-days or --max-idle-days")
+    else:
+        deleted = prune_expired_sessions(
+            max_age_days=max_age_days,
+            max_idle_days=max_idle_days,
+            batch_size=batch_size,
+            results_dir=Config.QUIZ_RESULTS_DIR,
+        )
+        click.echo(f"Deleted {deleted} expired sessions with their attempts and result files")
+
+    if vacuum or full:
+        result = compact_database(full=full)
+        click.echo(
+            f"Reclaimed {result['reclaimed_bytes']} bytes "
+            f"({result['before_bytes']} -> {result['after_bytes']}), "
+            f"{result['free_bytes']} bytes still free, auto_vacuum={result['auto_vacuum']}"
+        )
+
+@cli.command()
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='File to write (default: stdout)')
+@click.option('--since', type=click.DateTime(), default=None, help='Only quizzes and results created at or after this time')
+@click.option('--until', type=click.DateTime(), default=None, help='Only quizzes and results created before this time')
+@click.option('--quiz-id', multiple=True, help='Only this quiz (repeatable)')
+@click.option('--include', type=click.Choice(['all', 'quizzes', 'results']), default='all', help='Record types to export')
+@click.option('--page-size', type=int, default=Config.BULK_BATCH_SIZE, help='Quizzes read per database page')
+def export(output, since, until, quiz_id, include, page_size):
+    """Stream quizzes and results as NDJSON"""
+    from services.bulk_transfer import export_ndjson
+
+    lines = 0
+    for line in export_ndjson(
+        Config.QUIZ_RESULTS_DIR,
+        since=since,
+        until=until,
+        quiz_ids=quiz_id,
+        include_quizzes=include in ('all', 'quizzes'),
+        include_results=include in ('all', 'results'),
+        page_size=page_size,
+    ):
+        output.write(line)
+        lines += 1
+    output.flush()
+    click.echo(f"Exported {lines} records", err=True)
+
+@cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=Config.BULK_BATCH_SIZE, help='Records committed per transaction')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), default=None, help='Progress file used to resume (default: PATH.checkpoint)')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint')
+def import_records(path, batch_size, checkpoint, restart):
+    """Import an NDJSON export; rerun to resume after an interruption"""
+    import json
+    from services.bulk_transfer import import_ndjson
+
+    checkpoint = checkpoint or f"{path}.checkpoint"
+    start = {"lines": 0, "offset": 0}
+    if os.path.exists(checkpoint) and not restart:
+        with open(checkpoint) as f:
+            start = json.load(f)
+        click.echo(f"Resuming after line {start['lines']}", err=True)
+
+    def save_checkpoint(lines, offset):
+        with open(checkpoint, 'w') as f:
+            json.dump({"lines": lines, "offset": offset}, f)
+
+    with open(path, 'rb') as stream:
+        stats = import_ndjson(
+            stream,
+            Config.QUIZ_RESULTS_DIR,
+            batch_size=batch_size,
+            start_line=start["lines"],
+            start_offset=start["offset"],
+            on_batch=save_checkpoint,
+        )
+    os.remove(checkpoint)
+    click.echo(
+        f"Imported {stats['quizzes']} quizzes and {stats['results']} results; "
+        f"{stats['skipped']} already present, {stats['errors']} invalid lines"
+    )
+
+@cli.command('item-stats')
+@click.option('--quiz-id', multiple=True, help='Only this quiz (repeatable; default: every quiz with attempts)')
+@click.option('--flagged-only', is_flag=True, help='Only questions with a quality flag')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='File to write (default: stdout)')
+def item_stats(quiz_id, flagged_only, output):
+    """Write per-question statistics as NDJSON, one quiz per line"""
+    import json
+    from models.models import AttemptModel, Session, SessionModel
+    from services.item_analytics import ItemAnalytics
+
+    # Quizzes are visited once each, so nothing needs to stay cached
+    analytics = ItemAnalytics(cache_size=1)
+    session = Session()
+    try:
+        quiz_ids = quiz_id or [
+            row[0] for row in session.query(AttemptModel.quiz_id).distinct().order_by(AttemptModel.quiz_id)
+        ]
+        flagged = 0
+        for current in quiz_ids:
+            quiz = session.query(SessionModel).filter_by(id=current).first()
+            if quiz is None:
+                continue
+            report = analytics.report(current, quiz.get_questions())
+            if flagged_only:
+                report["items"] = [item for item in report["items"] if item["flags"]]
+                if not report["items"]:
+                    continue
+            flagged += sum(1 for item in report["items"] if item["flags"])
+            output.write(json.dumps(report) + "\n")
+            session.expunge_all()
+    finally:
+        session.close()
+    click.echo(f"{flagged} flagged questions", err=True)
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, LargeBinary, UniqueConstraint, create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, scoped_session
+from datetime import datetime, timedelta
 import uuid
 import json
 
@@ -11,6 +12,11 @@ class SessionModel(Base):
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     questions_json = Column(Text, nullable=False)  # Store complete JSON response
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Progressive quizzes only: questions still being generated are pending
+    expected_questions = Column(Integer, nullable=True)
+    generation_status = Column(String(16), nullable=True)
 
     def set_questions(self, questions):
         """Store questions as JSON string"""
@@ -20,12 +26,107 @@ class SessionModel(Base):
         """Retrieve questions from JSON string"""
         return json.loads(self.questions_json) if self.questions_json else []
 
-# Database connection setup
+    def touch(self, granularity_seconds=3600):
+        """Record an access, but only write when the stored time is stale.
+
+        Returns True if last_accessed_at was updated and needs a commit.
+        """
+        now = datetime.utcnow()
+        if (
+            self.last_accessed_at is None
+            or now - self.last_accessed_at >= timedelta(seconds=granularity_seconds)
+        ):
+            self.last_accessed_at = now
+            return True
+        return False
+
+    def progress(self, stale_after_seconds=None):
+        """Ready and pending question counts, or None for a quiz stored whole.
+
+        A quiz still generating after ``stale_after_seconds`` lost its worker
+        and is reported as failed.
+        """
+        if self.generation_status is None:
+            return None
+        status = self.generation_status
+        if (
+            status == "generating"
+            and stale_after_seconds
+            and self.created_at is not None
+            and datetime.utcnow() - self.created_at > timedelta(seconds=stale_after_seconds)
+        ):
+            status = "failed"
+        ready = len(self.get_questions())
+        total = self.expected_questions or ready
+        return {"status": status, "ready": ready, "pending": max(0, total - ready), "total": total}
+
+class PregeneratedQuizModel(Base):
+    """A quiz generated ahead of demand, consumed by the first matching request"""
+    __tablename__ = 'pregenerated_quizzes'
+
+    id = Column(Integer, primary_key=True)
+    generation_key = Column(String(64), nullable=False, index=True)
+    questions_json = Column(Text, nullable=False)
+    tokens = Column(Integer, nullable=False, default=0)  # LLM tokens spent on it
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def set_questions(self, questions):
+        self.questions_json = json.dumps(questions)
+
+    def get_questions(self):
+        return json.loads(self.questions_json) if self.questions_json else []
+
+class AttemptModel(Base):
+    """One evaluated submission, encoded compactly for item analytics"""
+    __tablename__ = 'attempts'
+
+    id = Column(Integer, primary_key=True)
+    quiz_id = Column(String(36), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # One int8 per question: 1 correct, 0 incorrect, -1 not answered
+    outcomes = Column(LargeBinary, nullable=False)
+    # One int8 per question: chosen option index for mcq, else -1
+    choices = Column(LargeBinary, nullable=False)
+
+class DocumentModel(Base):
+    """An uploaded PDF, stored as extracted text chunks for repeated generation"""
+    __tablename__ = 'documents'
+    __table_args__ = (
+        UniqueConstraint('owner', 'content_hash', name='uq_documents_owner_content_hash'),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Client that uploaded it ("user:<id>" or "addr:<address>"); only it can use the document
+    owner = Column(String(255), nullable=True, index=True)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the PDF
+    filename = Column(String(255), nullable=True)
+    page_count = Column(Integer, nullable=False, default=0)
+    chunks_json = Column(Text, nullable=False)
+    characters = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def set_chunks(self, chunks):
+        self.chunks_json = json.dumps(chunks)
+        self.characters = sum(len(chunk) for chunk in chunks)
+
+    def get_chunks(self):
+        return json.loads(self.chunks_json) if self.chunks_json else []
+
+class UserModel(Base):
+    __tablename__ = 'users'
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String(255), unique=True, nullable=False)
+    password = Column(String(255), nullable=False)  # Password hash
+    name = Column(String(100), nullable=False)
+
 DATABASE_URL = "sqlite:///application.db"
 engine = create_engine(DATABASE_URL)
 Session = sessionmaker(bind=engine)
-db_session = Session()
+# One session per thread; removed at the end of each Flask request
+db_session = scoped_session(Session)
 
 def init_db():
     """Initialize the database by creating all tables."""
-    print("Please use 'alembic upgrade head' to initialize the database!")
\ No newline at end of file
+    print("Please use 'alembic upgrade head' to initialize the database!")
@@ -0,0 +1,480 @@
+from aiohttp import web
+from werkzeug.datastructures import FileStorage
+from routes.auth_routes import get_client_gate
+from routes.question_routes import (
+    DOCUMENT_DEFAULTS,
+    answer_summary,
+    attach_uploaded_images,
+    batch_entry,
+    evaluation_entry,
+    get_document_store,
+    get_llm_service,
+    get_progressive_quizzes,
+    load_pdf_context,
+    prepare_user_answer,
+    record_attempt,
+    requested_timeout,
+    shortfall,
+    take_pregenerated,
+    validate_batch_specs,
+    validate_pdf_upload,
+    validate_quiz_request,
+    wants_progressive,
+)
+from services.auth import AuthError
+from services.deadlines import DeadlineExceeded
+from services.documents import DocumentNotFoundError
+from services.image_store import ImageNotFoundError
+from services.rate_limiter import RateLimitExceeded
+from services.responses import dumps, parse_fields, project
+from services import deadlines, metrics
+from models.models import Session, SessionModel
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+import asyncio
+import functools
+import json
+import math
+
+
+# Thread pool for CPU-bound and blocking work (PDF parsing, file and DB I/O)
+CPU_EXECUTOR = web.AppKey("cpu_executor", ThreadPoolExecutor)
+
+routes = web.RouteTableDef()
+
+# Strong references to background generation tasks until they finish
+_background_tasks = set()
+
+
+async def run_blocking(request, fn, *args, **kwargs):
+    """Run blocking work off the event loop, keeping metric labels and timings"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        request.app[CPU_EXECUTOR], metrics.run_in_context(fn, *args, **kwargs)
+    )
+
+
+def json_response(payload, status=200, headers=None):
+    """JSON response serialized with orjson"""
+    return web.Response(
+        body=dumps(payload), status=status, headers=headers, content_type="application/json"
+    )
+
+
+def json_error(message, status=400):
+    return json_response({"success": False, "error": message}, status=status)
+
+
+def rate_limited_response(error):
+    """Build a 429 response telling the client when to retry"""
+    return json_response(
+        {"success": False, "error": str(error)},
+        status=429,
+        headers={"Retry-After": str(int(math.ceil(error.retry_after))), **error.headers},
+    )
+
+
+def unauthorized_response(error):
+    return json_response(
+        {"success": False, "error": str(error)},
+        status=401,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def client_limited(handler):
+    """aiohttp counterpart of ``auth_routes.client_limited``"""
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        gate = get_client_gate()
+        try:
+            admission = gate.admit(request.headers.get("Authorization"), request.remote)
+        except AuthError as e:
+            return unauthorized_response(e)
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+
+        # Kept for work the handler leaves running in the background
+        request["client_admission"] = admission
+        # Tasks and executor calls started by the handler share this tally
+        with metrics.tally_tokens() as tally:
+            response = await handler(request)
+        gate.charge(admission, tally.total)
+        response.headers.update(admission.headers())
+        return response
+
+    return wrapper
+
+
+def client_id(request) -> str:
+    """The client admitted for this request; call inside a client_limited handler"""
+    return request["client_admission"].client
+
+
+def request_deadline(handler):
+    """aiohttp counterpart of ``question_routes.request_deadline``"""
+
+    @functools.wraps(handler)
+    async def wrapper(request):
+        try:
+            seconds = requested_timeout(
+                request.headers.get("X-Request-Timeout"), request.query.get("timeout")
+            )
+        except ValueError as e:
+            return json_error(str(e))
+        # Tasks the handler starts inherit the deadline
+        with deadlines.deadline(seconds):
+            return await handler(request)
+
+    return wrapper
+
+
+def deadline_exceeded_response():
+    return json_response(
+        {"success": False, "error": "Request deadline exceeded", "timed_out": True}, status=504
+    )
+
+
+def too_large_response():
+    return json_error(
+        f"Request body exceeds {Config.MAX_CONTENT_LENGTH // (1024 * 1024)} MB", 413
+    )
+
+
+def save_quizzes(question_lists):
+    """Store each list of questions as a quiz in one transaction; returns the ids"""
+    # A session per call: the module-level db_session is not safe across threads
+    session = Session()
+    try:
+        quizzes = []
+        for questions in question_lists:
+            quiz = SessionModel()
+            quiz.set_questions(questions)
+            quizzes.append(quiz)
+        session.add_all(quizzes)
+        with metrics.timed("db_commit"):
+            session.commit()
+        return [quiz.id for quiz in quizzes]
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def load_quiz_questions(quiz_id):
+    """
+    Return a quiz's questions and progress and record the access, or
+    (None, None) if missing
+    """
+    session = Session()
+    try:
+        quiz = session.query(SessionModel).filter_by(id=quiz_id).first()
+        if not quiz:
+            return None, None
+        if quiz.touch(Config.SESSION_TOUCH_GRANULARITY_SECONDS):
+            session.commit()
+        return quiz.get_questions(), quiz.progress(Config.PROGRESSIVE_STALE_SECONDS)
+    finally:
+        session.close()
+
+
+async def start_progressive_quiz(request, params):
+    """
+    Async ``question_routes.start_progressive_quiz``: the remaining questions
+    are generated in a task that outlives the request
+    """
+    service = get_llm_service()
+    progressive = get_progressive_quizzes()
+    total = params["num_questions"]
+    first = await service.agenerate_questions(
+        **dict(params, num_questions=Config.PROGRESSIVE_FIRST_BATCH)
+    )
+    quiz_id = await run_blocking(request, progressive.create, first, total)
+    admission = request.get("client_admission")
+
+    async def fill():
+        failed = False
+        rest = []
+        # The rest of the quiz is not bound by the first request's deadline
+        with metrics.tally_tokens() as tally, deadlines.unbounded():
+            try:
+                if total > len(first):
+                    rest = await service.agenerate_remaining(**params, questions=first)
+            except Exception as e:
+                print(f"Error generating remaining questions for quiz {quiz_id}: {str(e)}")
+                failed = True
+        await run_blocking(request, progressive.finish, quiz_id, rest, failed)
+        # Background tokens count against the same client's quota
+        if admission is not None:
+            get_client_gate().charge(admission, tally.total)
+
+    task = asyncio.ensure_future(fill())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    progress = {
+        "status": "generating",
+        "ready": len(first),
+        "pending": max(0, total - len(first)),
+        "total": total,
+    }
+    return quiz_id, first, progress
+
+
+def pdf_upload(form):
+    field = form.get("file")
+    if not isinstance(field, web.FileField):
+        return None
+    return FileStorage(field.file, filename=field.filename)
+
+
+@routes.post("/api/generate", name="questions.generate_questions")
+@client_limited
+@request_deadline
+async def generate_questions(request):
+    try:
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            question_type, num_questions, error = validate_quiz_request(
+                form.get("question_type", "mcq"), form.get("num_questions", 5)
+            )
+            if error:
+                return json_error(error)
+
+            doc_id = form.get("doc_id")
+            if doc_id:
+                combined_text = await run_blocking(
+                    request, get_document_store().context, doc_id, client_id(request)
+                )
+            else:
+                upload = pdf_upload(form)
+                error = await run_blocking(request, validate_pdf_upload, upload)
+                if error:
+                    return json_error(error)
+
+                combined_text = await run_blocking(request, load_pdf_context, upload)
+
+            params = dict(
+                subject=DOCUMENT_DEFAULTS["subject"],
+                topic=DOCUMENT_DEFAULTS["topic"],
+                question_type=question_type,
+                difficulty=form.get("difficulty", "medium"),
+                num_questions=num_questions,
+                context=combined_text,
+            )
+            progressive = form.get("progressive")
+            questions = None
+        else:
+            data = await request.json()
+            doc_id = data.get("doc_id")
+            if doc_id:
+                data = {**DOCUMENT_DEFAULTS, **data}
+            question_type, num_questions, error = validate_quiz_request(
+                data["question_type"], data["num_questions"]
+            )
+            if error:
+                return json_error(error)
+
+            params = dict(
+                subject=data["subject"],
+                topic=data["topic"],
+                question_type=question_type,
+                difficulty=data["difficulty"],
+                num_questions=num_questions,
+            )
+            progressive = data.get("progressive")
+            if doc_id:
+                params["context"] = await run_blocking(
+                    request, get_document_store().context, doc_id, client_id(request)
+                )
+                questions = None
+            else:
+                questions = await run_blocking(request, take_pregenerated, **params)
+
+        if questions is None and wants_progressive(progressive, num_questions):
+            quiz_id, questions, progress = await start_progressive_quiz(request, params)
+            return json_response(
+                {"success": True, "questions": questions, "quiz_id": quiz_id, "progress": progress}
+            )
+
+        marker = {}
+        if questions is None:
+            service = get_llm_service()
+            questions = await service.agenerate_questions(**params)
+            marker = shortfall(service, question_type, num_questions, questions)
+
+        quiz_ids = await run_blocking(request, save_quizzes, [questions])
+        return json_response(
+            {"success": True, "questions": questions, "quiz_id": quiz_ids[0], **marker}
+        )
+
+    except web.HTTPRequestEntityTooLarge:
+        return too_large_response()
+    except DocumentNotFoundError as e:
+        return json_error(str(e), 404)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except DeadlineExceeded:
+        return deadline_exceeded_response()
+    except Exception as e:
+        return json_error(str(e))
+
+
+@routes.post("/api/generate/batch", name="questions.generate_question_batch")
+@client_limited
+@request_deadline
+async def generate_question_batch(request):
+    """Generate several quiz variants from one PDF or topic in a single request"""
+    try:
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            doc_id = form.get("doc_id")
+            subject = form.get("subject", DOCUMENT_DEFAULTS["subject"])
+            topic = form.get("topic", DOCUMENT_DEFAULTS["topic"])
+            specs = json.loads(form.get("quizzes", "[]"))
+        else:
+            form = None
+            data = await request.json()
+            doc_id = data.get("doc_id")
+            if doc_id:
+                data = {**DOCUMENT_DEFAULTS, **data}
+            subject = data["subject"]
+            topic = data["topic"]
+            specs = data.get("quizzes", [])
+
+        error = validate_batch_specs(specs)
+        if error:
+            return json_error(error)
+
+        # Parse the source once and share it across every variant
+        if doc_id:
+            context = await run_blocking(
+                request, get_document_store().context, doc_id, client_id(request)
+            )
+        elif form is not None:
+            upload = pdf_upload(form)
+            error = await run_blocking(request, validate_pdf_upload, upload)
+            if error:
+                return json_error(error)
+            context = await run_blocking(request, load_pdf_context, upload)
+        else:
+            context = data.get("context", "")
+
+        variants = await get_llm_service().agenerate_question_batch(
+            subject=subject, topic=topic, specs=specs, context=context
+        )
+
+        # Variants left empty are not stored
+        stored = await run_blocking(
+            request,
+            save_quizzes,
+            [variant["questions"] for variant in variants if variant["questions"]],
+        )
+        stored = iter(stored)
+        quiz_ids = [next(stored) if variant["questions"] else None for variant in variants]
+
+        return json_response(
+            {
+                "success": True,
+                "quiz_ids": [quiz_id for quiz_id in quiz_ids if quiz_id is not None],
+                "quizzes": [
+                    batch_entry(quiz_id, variant) for quiz_id, variant in zip(quiz_ids, variants)
+                ],
+            }
+        )
+
+    except web.HTTPRequestEntityTooLarge:
+        return too_large_response()
+    except DocumentNotFoundError as e:
+        return json_error(str(e), 404)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except DeadlineExceeded:
+        return deadline_exceeded_response()
+    except Exception as e:
+        return json_error(str(e))
+
+
+@routes.post("/api/evaluate/{quiz_id}", name="questions.evaluate_answers")
+@client_limited
+@request_deadline
+async def evaluate_answers(request):
+    quiz_id = request.match_info["quiz_id"]
+    try:
+        if request.content_type == "multipart/form-data":
+            # Answers JSON plus binary image parts it references
+            form = await request.post()
+            user_answers = json.loads(form.get("answers", "[]"))
+            parts = {
+                name: field.file
+                for name, field in form.items()
+                if isinstance(field, web.FileField)
+            }
+            try:
+                await run_blocking(request, attach_uploaded_images, user_answers, parts)
+            except ValueError as e:
+                return json_error(str(e))
+        else:
+            data = await request.json()
+            user_answers = data.get("answers", [])
+
+        questions, progress = await run_blocking(request, load_quiz_questions, quiz_id)
+        if questions is None:
+            return json_error("Quiz not found", 404)
+        if progress is not None and len(questions) < len(user_answers):
+            # Wait only for the pending questions that were answered
+            questions, progress = await get_progressive_quizzes().wait_for_async(
+                quiz_id,
+                len(user_answers),
+                deadlines.cap(Config.PROGRESSIVE_WAIT_SECONDS),
+                executor=request.app[CPU_EXECUTOR],
+            )
+
+        pairs = list(zip(questions, user_answers))
+        for q, user_answer in pairs:
+            if not isinstance(user_answer, dict) or "answer" not in user_answer:
+                return json_error("Invalid user answer format")
+            if not isinstance(q, dict) or "question" not in q or "answer" not in q:
+                return json_error("Invalid question format")
+
+        # Summarize first: grading strips the image from the answer
+        answers = [answer_summary(user_answer["answer"]) for _, user_answer in pairs]
+
+        # Reading stored images is file I/O
+        await run_blocking(
+            request, lambda: [prepare_user_answer(user_answer) for _, user_answer in pairs]
+        )
+
+        # Answers are graded concurrently; local grading never leaves the loop
+        service = get_llm_service()
+        results = await asyncio.gather(
+            *(service.aevaluate_answer(q, user_answer["answer"]) for q, user_answer in pairs)
+        )
+        evaluation_results = [
+            evaluation_entry(q, answer, result)
+            for (q, _), answer, result in zip(pairs, answers, results)
+        ]
+
+        # Calculate overall score
+        score_data = service.calculate_quiz_score(evaluation_results)
+        await run_blocking(request, record_attempt, quiz_id, questions, evaluation_results)
+
+        payload = {
+            "quiz_id": quiz_id,
+            "detailed_results": evaluation_results,
+            **score_data,
+        }
+        if progress is not None:
+            payload["progress"] = progress
+        fields = parse_fields(request.query.get("fields"))
+        return json_response({"success": True, **project(payload, fields)})
+
+    except web.HTTPRequestEntityTooLarge:
+        return too_large_response()
+    except ImageNotFoundError as e:
+        return json_error(str(e))
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return json_error(f"Error evaluating answers: {str(e)}", 500)
@@ -1,11 +1,88 @@
-from flask import Blueprint, request, jsonify, current_app
-# from models.models import UserModel, db_session
+from flask import Blueprint, g, request, jsonify, make_response
+from models.models import UserModel, db_session
 from werkzeug.security import generate_password_hash, check_password_hash
-import jwt
-from datetime import datetime, timedelta
+from services.auth import AuthError, TokenVerifier, bearer_token
+from services.client_limits import ClientGate
+from services.rate_limiter import RateLimitExceeded
+from services import metrics
+from config import Config
+import functools
+import math
+import threading
 
 
 auth_bp = Blueprint("auth", __name__)
+_client_gate = None
+_client_gate_lock = threading.Lock()
+
+
+def get_client_gate():
+    """Build the shared token verifier and client limits on first use"""
+    global _client_gate
+    if _client_gate is None:
+        with _client_gate_lock:
+            if _client_gate is None:
+                verifier = TokenVerifier(
+                    Config.SECRET_KEY,
+                    ttl_seconds=Config.AUTH_TOKEN_TTL_HOURS * 3600,
+                    cache_size=Config.AUTH_VERIFY_CACHE_SIZE,
+                )
+                _client_gate = ClientGate(
+                    verifier,
+                    auth_required=Config.AUTH_REQUIRED,
+                    requests_per_minute=Config.CLIENT_REQUESTS_PER_MINUTE or None,
+                    tokens_per_day=Config.CLIENT_DAILY_TOKEN_QUOTA or None,
+                )
+    return _client_gate
+
+
+def unauthorized_response(error):
+    response = jsonify({"success": False, "error": str(error)})
+    response.status_code = 401
+    response.headers["WWW-Authenticate"] = "Bearer"
+    return response
+
+
+def rate_limited_response(error):
+    """Build a 429 response telling the client when to retry"""
+    response = jsonify({"success": False, "error": str(error)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(int(math.ceil(error.retry_after)))
+    response.headers.update(error.headers)
+    return response
+
+
+def client_limited(view):
+    """
+    Authenticate the caller, apply their request limit and bill the LLM
+    tokens the view used against their daily quota
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        gate = get_client_gate()
+        try:
+            admission = gate.admit(request.headers.get("Authorization"), request.remote_addr)
+        except AuthError as e:
+            return unauthorized_response(e)
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+
+        # Kept for work the view leaves running in the background
+        g.client_admission = admission
+        with metrics.tally_tokens() as tally:
+            response = make_response(view(*args, **kwargs))
+        gate.charge(admission, tally.total)
+        response.headers.update(admission.headers())
+        return response
+
+    return wrapper
+
+
+def client_id() -> str:
+    """The client admitted for this request; call inside a client_limited view"""
+    return g.client_admission.client
+
 
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
@@ -17,13 +94,13 @@ def signup():
     if not email or not password:
         return jsonify({"message": "Username and password are required."}), 400
 
-    # if db_session.query(UserModel).filter_by(email=email).first():
-    #     return jsonify({"message": "Username already exists."}), 400
+    if db_session.query(UserModel).filter_by(email=email).first():
+        return jsonify({"message": "Username already exists."}), 400
 
-    # hashed_password = generate_password_hash(password)
-    # new_user = UserModel(email=email, password=hashed_password, name=name)
-    # db_session.add(new_user)
-    # db_session.commit()
+    hashed_password = generate_password_hash(password)
+    new_user = UserModel(email=email, password=hashed_password, name=name or "")
+    db_session.add(new_user)
+    db_session.commit()
 
     return jsonify({"message": "User created successfully."}), 201
 
@@ -36,19 +113,31 @@ def signin():
     if not email or not password:
         return jsonify({"message": "email and password are required."}), 400
 
-    # user = db_session.query(UserModel).filter_by(email=email).first()
+    user = db_session.query(UserModel).filter_by(email=email).first()
+
+    if not user or not check_password_hash(user.password, password):
+        return jsonify({"message": "Invalid credentials."}), 401
+
+    verifier = get_client_gate().verifier
+    try:
+        token = verifier.issue(user.id)
+    except AuthError as e:
+        return jsonify({"message": str(e)}), 503
 
-    # if not user or not check_password_hash(user.password, password):
-    #     return jsonify({"message": "Invalid credentials."}), 401
-    
-    # token = jwt.encode(
-    #     {
-    #         "user_id": user.id,
-    #         "exp": datetime.utcnow() + timedelta(hours=1)  # Token expires in 1 hour
-    #     },
-    #     current_app.config['SECRET_KEY'],
-    #     algorithm="HS256"
-    # )
+    return jsonify(
+        {"message": "Login successful.", "token": token, "expires_in": int(verifier.ttl_seconds)}
+    ), 200
 
-    return jsonify({"message": "Login successful.", "token": 'token'}), 200
+@auth_bp.route('/signout', methods=['POST'])
+def signout():
+    """Revoke the bearer token of this request"""
+    verifier = get_client_gate().verifier
+    token = bearer_token(request.headers.get("Authorization"))
+    try:
+        if token is None:
+            raise AuthError("Missing bearer token")
+        verifier.revoke(verifier.verify(token))
+    except AuthError as e:
+        return unauthorized_response(e)
 
+    return jsonify({"message": "Signed out."}), 200
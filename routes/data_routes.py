@@ -0,0 +1,88 @@
+from flask import Blueprint, Response, request, jsonify
+from services.auth import bearer_token
+from services.bulk_transfer import export_ndjson, import_ndjson
+from datetime import datetime
+from config import Config
+import functools
+import hmac
+
+
+data_bp = Blueprint("data", __name__)
+
+
+def data_token_required(view):
+    """Allow only callers presenting DATA_API_TOKEN; disabled when unset"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not Config.DATA_API_TOKEN:
+            return jsonify({"success": False, "error": "Bulk data API is disabled"}), 404
+        token = bearer_token(request.headers.get("Authorization")) or ""
+        if not hmac.compare_digest(token.encode(), Config.DATA_API_TOKEN.encode()):
+            return jsonify({"success": False, "error": "Invalid data API token"}), 401
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _parse_time(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+@data_bp.route("/export", methods=["GET"])
+@data_token_required
+def export_data():
+    """Stream quizzes and results as NDJSON (filters: since, until, quiz_id, include)"""
+    try:
+        since = _parse_time("since")
+        until = _parse_time("until")
+    except ValueError:
+        return jsonify({"success": False, "error": "since/until must be ISO 8601 times"}), 400
+
+    include = request.args.get("include", "all")
+    if include not in ("all", "quizzes", "results"):
+        return jsonify({"success": False, "error": "include must be all, quizzes or results"}), 400
+
+    lines = export_ndjson(
+        Config.QUIZ_RESULTS_DIR,
+        since=since,
+        until=until,
+        quiz_ids=request.args.getlist("quiz_id"),
+        include_quizzes=include in ("all", "quizzes"),
+        include_results=include in ("all", "results"),
+        page_size=Config.BULK_BATCH_SIZE,
+    )
+    return Response(
+        lines,
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=quizzes.ndjson"},
+    )
+
+
+@data_bp.route("/import", methods=["POST"])
+@data_token_required
+def import_data():
+    """
+    Import an NDJSON body in batches. Quizzes that already exist are
+    skipped, so an interrupted upload can simply be sent again; ``skip``
+    resumes after the ``lines`` reported by an earlier run.
+    """
+    # The body is streamed line by line, so the upload size limit does not apply
+    request.max_content_length = None
+    try:
+        skip = max(0, int(request.args.get("skip", 0)))
+    except ValueError:
+        return jsonify({"success": False, "error": "skip must be a number of lines"}), 400
+
+    try:
+        stats = import_ndjson(
+            request.stream,
+            Config.QUIZ_RESULTS_DIR,
+            batch_size=Config.BULK_BATCH_SIZE,
+            start_line=skip,
+        )
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Import failed: {str(e)}"}), 500
+
+    return jsonify({"success": True, **stats})
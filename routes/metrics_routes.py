@@ -0,0 +1,12 @@
+from flask import Blueprint, Response
+from services import metrics
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(
+        metrics.REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,17 +1,305 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from routes.auth_routes import client_id, client_limited, get_client_gate, rate_limited_response
+from services.deadlines import DeadlineExceeded
+from services.documents import DocumentNotFoundError, DocumentStore, extract_pdf_chunks, join_chunks
+from services.http_pool import HttpPool
+from services.image_store import ImageNotFoundError, ImageStore
+from services.item_analytics import ItemAnalytics, save_attempt
 from services.llm_service import LLMService
+from services.model_routing import ModelRoutingTable
+from services.pdf_inspect import count_pdf_pages
+from services.pregeneration import start_pregeneration_worker
+from services.progressive import ProgressiveQuizzes
+from services.rate_limiter import RateLimitExceeded
+from services.responses import parse_fields, project
+from services import deadlines, metrics
 from models.models import SessionModel, db_session
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from concurrent.futures import ThreadPoolExecutor
+import functools
 import os
-from PIL import Image
+import tempfile
+import threading
 import io
 import base64
+import binascii
+import hashlib
 import json
+from config import Config
 
 
 question_bp = Blueprint("questions", __name__)
-llm_service = LLMService(provider="openai")  # or "openai"
+_llm_service = None
+_image_store = None
+_document_store = None
+_pregenerator = None
+_progressive = None
+_progressive_executor = None
+_item_analytics = None
+_http_pool = None
+_llm_service_lock = threading.Lock()
+
+
+def _model_routes():
+    """Routing table from config, or None when tiering is disabled"""
+    if not Config.LLM_TIERING_ENABLED:
+        return None
+    if Config.LLM_MODEL_ROUTES:
+        return ModelRoutingTable.parse(Config.LLM_MODEL_ROUTES)
+    return ModelRoutingTable()
+
+
+def get_http_pool():
+    """Build the HTTP pool shared by the provider clients on first use"""
+    global _http_pool
+    if _http_pool is None:
+        with _llm_service_lock:
+            if _http_pool is None:
+                _http_pool = HttpPool(
+                    max_connections=Config.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.LLM_HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.LLM_HTTP_KEEPALIVE_SECONDS,
+                    connect_timeout=Config.LLM_HTTP_CONNECT_TIMEOUT,
+                    pool_timeout=Config.LLM_HTTP_POOL_TIMEOUT,
+                    http2=Config.LLM_HTTP2,
+                )
+    return _http_pool
+
+
+def get_llm_service():
+    """Build the shared LLMService on first use"""
+    global _llm_service
+    if _llm_service is None:
+        http_pool = get_http_pool()
+        with _llm_service_lock:
+            if _llm_service is None:
+                _llm_service = LLMService(
+                    provider=Config.LLM_PROVIDERS[0],
+                    fallback_providers=Config.LLM_PROVIDERS[1:],
+                    timeout=Config.LLM_TIMEOUT_SECONDS,
+                    hedge=Config.LLM_HEDGE_ENABLED,
+                    hedge_percentile=Config.LLM_HEDGE_PERCENTILE,
+                    hedge_min_delay=Config.LLM_HEDGE_MIN_DELAY,
+                    requests_per_minute=Config.LLM_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=Config.LLM_TOKENS_PER_MINUTE,
+                    rate_limit_max_wait=Config.LLM_RATE_LIMIT_MAX_WAIT,
+                    max_attempts=Config.LLM_MAX_ATTEMPTS,
+                    retry_backoff=Config.LLM_RETRY_BACKOFF,
+                    retry_max_wait=Config.LLM_RETRY_MAX_WAIT,
+                    model_routes=_model_routes(),
+                    grade_confidence_margin=Config.LLM_GRADE_CONFIDENCE_MARGIN,
+                    single_flight_timeout=Config.LLM_SINGLE_FLIGHT_TIMEOUT,
+                    combined_max_questions=Config.LLM_COMBINED_MAX_QUESTIONS,
+                    structured_output=Config.LLM_STRUCTURED_OUTPUT,
+                    grade_short_explanations=Config.LLM_GRADE_SHORT_EXPLANATIONS,
+                    http_pool=http_pool,
+                )
+    return _llm_service
+
+
+def get_image_store():
+    """Build the shared ImageStore on first use"""
+    global _image_store
+    if _image_store is None:
+        with _llm_service_lock:
+            if _image_store is None:
+                _image_store = ImageStore(
+                    Config.IMAGE_STORE_DIR,
+                    max_age_seconds=Config.IMAGE_STORE_MAX_AGE_HOURS * 3600,
+                    max_bytes=int(Config.MAX_IMAGE_MB * 1024 * 1024),
+                )
+    return _image_store
+
+
+def get_document_store():
+    """Build the shared DocumentStore on first use"""
+    global _document_store
+    if _document_store is None:
+        with _llm_service_lock:
+            if _document_store is None:
+                _document_store = DocumentStore(
+                    max_age_seconds=Config.DOCUMENT_MAX_AGE_HOURS * 3600,
+                    cache_size=Config.DOCUMENT_CACHE_SIZE,
+                )
+    return _document_store
+
+
+def get_progressive_quizzes():
+    """Build the shared ProgressiveQuizzes and its worker pool on first use"""
+    global _progressive, _progressive_executor
+    if _progressive is None:
+        with _llm_service_lock:
+            if _progressive is None:
+                _progressive_executor = ThreadPoolExecutor(
+                    max_workers=Config.PROGRESSIVE_WORKERS, thread_name_prefix="progressive"
+                )
+                _progressive = ProgressiveQuizzes(
+                    stale_after_seconds=Config.PROGRESSIVE_STALE_SECONDS
+                )
+    return _progressive
+
+
+def get_item_analytics():
+    """Build the shared ItemAnalytics cache on first use"""
+    global _item_analytics
+    if _item_analytics is None:
+        with _llm_service_lock:
+            if _item_analytics is None:
+                _item_analytics = ItemAnalytics(cache_size=Config.ITEM_ANALYTICS_CACHE_SIZE)
+    return _item_analytics
+
+
+def record_attempt(quiz_id, questions, evaluation_results):
+    """Store an evaluation for item analytics; failures never fail grading"""
+    if not Config.ITEM_ANALYTICS_ENABLED:
+        return
+    try:
+        save_attempt(quiz_id, questions, evaluation_results)
+    except Exception as e:
+        print(f"Error recording attempt for quiz {quiz_id}: {str(e)}")
+
+
+def _provider_metrics():
+    """Expose provider health and rate-limiter queues at scrape time"""
+    if _llm_service is None:
+        return []
+    lines = [
+        "# TYPE llm_provider_error_rate gauge",
+        "# TYPE llm_provider_latency_p95_seconds gauge",
+        "# TYPE llm_rate_limit_queue_depth gauge",
+    ]
+    for stats in _llm_service.provider_stats():
+        label = f'{{provider="{stats["name"]}"}}'
+        lines.append(f"llm_provider_error_rate{label} {stats['error_rate']}")
+        if stats["p95_seconds"] is not None:
+            lines.append(f"llm_provider_latency_p95_seconds{label} {stats['p95_seconds']}")
+        if stats["rate_limit"]:
+            lines.append(f"llm_rate_limit_queue_depth{label} {stats['rate_limit']['queue_depth']}")
+    return lines
+
+
+metrics.REGISTRY.register_collector(_provider_metrics)
+
+
+def warm_up():
+    """Construct provider clients and open connections before the first request arrives"""
+    get_llm_service().warm_up(Config.LLM_WARM_UP_CONNECTIONS)
+
+
+def start_pregeneration():
+    """Start the background quiz pre-generation worker if enabled"""
+    global _pregenerator
+    _pregenerator = start_pregeneration_worker(Config, get_llm_service)
+    return _pregenerator
+
+
+def take_pregenerated(subject, topic, question_type, difficulty, num_questions):
+    """A stocked pre-generated quiz for these parameters, or None"""
+    if _pregenerator is None:
+        return None
+    return _pregenerator.take(subject, topic, question_type, difficulty, num_questions)
+
+
+def requested_timeout(header, param):
+    """
+    A request's deadline in seconds, from its X-Request-Timeout header or
+    timeout parameter. Raises ValueError for an invalid value.
+    """
+    return deadlines.parse_timeout(
+        header if header is not None else param,
+        default=Config.REQUEST_TIMEOUT_SECONDS,
+        maximum=Config.REQUEST_MAX_TIMEOUT_SECONDS,
+    )
+
+
+def request_deadline(view):
+    """Run the view's LLM calls under the request's deadline"""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            seconds = requested_timeout(
+                request.headers.get("X-Request-Timeout"), request.args.get("timeout")
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        with deadlines.deadline(seconds):
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+def deadline_exceeded_response():
+    return jsonify({"success": False, "error": "Request deadline exceeded", "timed_out": True}), 504
+
+
+def shortfall(service, question_types, num_questions, questions):
+    """Timed-out marker for a quiz the request deadline left short of questions"""
+    if not deadlines.expired():
+        return {}
+    missing = service.missing_questions(question_types, num_questions, questions)
+    return {"timed_out": True, "missing": missing} if missing else {}
+
+
+def batch_entry(quiz_id, variant):
+    """One item of a batch response's quizzes"""
+    entry = {
+        "quiz_id": quiz_id,
+        "num_questions": len(variant["questions"]),
+        "duplicates_removed": variant["duplicates_removed"],
+    }
+    if variant.get("missing"):
+        entry["missing"] = variant["missing"]
+    if variant.get("timed_out"):
+        entry["timed_out"] = True
+    return entry
+
+
+def parse_flag(value):
+    """Read a boolean request parameter sent as JSON or as a form string"""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def wants_progressive(value, num_questions):
+    return parse_flag(value) and num_questions > Config.PROGRESSIVE_FIRST_BATCH
+
+
+def start_progressive_quiz(params):
+    """
+    Generate and store the first questions of a quiz, then generate the rest
+    in the background. Returns (quiz_id, first_questions, progress).
+    """
+    service = get_llm_service()
+    progressive = get_progressive_quizzes()
+    total = params["num_questions"]
+    first = service.generate_questions(**dict(params, num_questions=Config.PROGRESSIVE_FIRST_BATCH))
+    quiz_id = progressive.create(first, expected=total)
+
+    admission = g.get("client_admission")
+
+    def fill():
+        # The rest of the quiz is not bound by the first request's deadline
+        with metrics.tally_tokens() as tally, deadlines.unbounded():
+            progressive.fill(
+                quiz_id,
+                lambda _: service.generate_remaining(**params, questions=first),
+                total - len(first),
+            )
+        # Background tokens count against the same client's quota
+        if admission is not None:
+            get_client_gate().charge(admission, tally.total)
+
+    _progressive_executor.submit(metrics.run_in_context(fill))
+    progress = {
+        "status": "generating",
+        "ready": len(first),
+        "pending": max(0, total - len(first)),
+        "total": total,
+    }
+    return quiz_id, first, progress
+
 
 QUIZ_TYPES = [
     "mcq",
@@ -25,8 +313,193 @@ QUIZ_TYPES = [
     "diagram",
 ]
 
+INVALID_QUESTION_TYPE = (
+    "Invalid question type. Must be one of 'mcq', 'short', 'long', 'code', "
+    "'fill_in_blank', 'match_the_following', 'true_false', 'sequence', 'diagram'."
+)
+
+
+# Subject and topic sent to the LLM for uploaded material
+DOCUMENT_DEFAULTS = {"subject": "Document Analysis", "topic": "PDF Content", "difficulty": "medium"}
+
+
+def parse_question_types(value):
+    """Accept a type name, a list of names or a JSON-encoded list"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+    if isinstance(value, str):
+        value = [value]
+    if (
+        not isinstance(value, list)
+        or not value
+        or not all(isinstance(q_type, str) for q_type in value)
+        or not set(value).issubset(QUIZ_TYPES)
+    ):
+        return None
+    return value
+
+
+def validate_quiz_request(question_type, num_questions):
+    """
+    Check the requested types and count before any parsing or LLM work.
+    Returns ``(question_types, num_questions, error)``.
+    """
+    question_types = parse_question_types(question_type)
+    if question_types is None:
+        return None, None, INVALID_QUESTION_TYPE
+    try:
+        num_questions = int(num_questions)
+    except (TypeError, ValueError):
+        return None, None, "num_questions must be an integer"
+    if not 1 <= num_questions <= Config.MAX_QUESTIONS_PER_QUIZ:
+        return (
+            None,
+            None,
+            f"num_questions must be between 1 and {Config.MAX_QUESTIONS_PER_QUIZ}",
+        )
+    return question_types, num_questions, None
+
+
+def validate_batch_specs(specs):
+    """Normalize batch quiz specs in place; returns an error message or None"""
+    if not isinstance(specs, list) or not specs:
+        return "quizzes must be a non-empty list"
+
+    if len(specs) > Config.MAX_BATCH_VARIANTS:
+        return f"At most {Config.MAX_BATCH_VARIANTS} quizzes can be generated per batch"
+
+    for spec in specs:
+        if not isinstance(spec, dict):
+            return "Each quiz must be an object"
+        question_types, num_questions, error = validate_quiz_request(
+            spec.get("question_type", ["mcq"]), spec.get("num_questions", 5)
+        )
+        if error:
+            return error
+        spec["question_type"] = question_types
+        spec["num_questions"] = num_questions
+    return None
+
+
+def validate_pdf_upload(file, max_pages=None):
+    """
+    Cheap checks on an uploaded PDF, run before it is saved or parsed.
+    Returns an error message or None.
+    """
+    if not file or not file.filename or not file.filename.endswith(".pdf"):
+        return "Invalid file format. File must be PDF."
+
+    max_pages = Config.PDF_MAX_PAGES if max_pages is None else max_pages
+    try:
+        with metrics.timed("pdf_inspect"):
+            page_count = count_pdf_pages(file.stream)
+    except ValueError as e:
+        return str(e)
+    if page_count > max_pages:
+        return f"File must have less than {max_pages} pages"
+    return None
+
+
+def too_large_response():
+    return (
+        jsonify(
+            {
+                "success": False,
+                "error": f"Request body exceeds {Config.MAX_CONTENT_LENGTH // (1024 * 1024)} MB",
+            }
+        ),
+        413,
+    )
+
+
+def prepare_user_answer(user_answer):
+    """Resolve an answer's image into what the grader receives"""
+    answer = user_answer.get("answer")
+    if not isinstance(answer, dict) or not isinstance(answer.get("image"), dict):
+        return user_answer
+
+    image = answer["image"]
+    if "image_id" in image:
+        # Stored uploads are base64-encoded once, here, for the provider payload
+        answer["image"] = get_image_store().data_url(image["image_id"])
+    elif "path" in image:
+        # Convert image paths to base64 if present
+        base64_image = get_base64_image(image["path"])
+        if base64_image:
+            answer["image"] = {"base64": base64_image, "originalPath": image["path"]}
+    return user_answer
+
+
+def attach_uploaded_images(user_answers, parts):
+    """
+    Spool the image parts of a multipart evaluation and point answers that
+    reference one (``{"image": {"part": name}}``) at its stored id
+    """
+    stored = {}
+    for user_answer in user_answers:
+        answer = user_answer.get("answer") if isinstance(user_answer, dict) else None
+        image = answer.get("image") if isinstance(answer, dict) else None
+        if not isinstance(image, dict) or "part" not in image:
+            continue
+        name = image["part"]
+        if name not in parts:
+            raise ValueError(f"Missing image part: {name}")
+        if name not in stored:
+            stored[name] = get_image_store().put(parts[name])["image_id"]
+        answer["image"] = {"image_id": stored[name]}
+    return user_answers
+
+
+def image_reference(image):
+    """Describe a submitted image by hash and size instead of its data"""
+    if isinstance(image, dict):
+        reference = {k: v for k, v in image.items() if k != "base64"}
+        data = image.get("base64")
+    else:
+        reference = {}
+        data = image
+    if isinstance(data, str) and data:
+        header, _, payload = data.rpartition(",")
+        if header.startswith("data:"):
+            reference["media_type"] = header[5:].split(";")[0]
+        try:
+            raw = base64.b64decode(payload)
+        except (ValueError, binascii.Error):
+            raw = payload.encode("utf-8")
+        reference["sha256"] = hashlib.sha256(raw).hexdigest()
+        reference["bytes"] = len(raw)
+    return reference
+
+
+def answer_summary(answer):
+    """The answer as echoed back in results, with images as references"""
+    if not isinstance(answer, dict) or "image" not in answer:
+        return answer
+    summary = {k: v for k, v in answer.items() if k not in ("image", "image_data")}
+    summary["image"] = image_reference(answer["image"])
+    return summary
+
+
+def evaluation_entry(question, answer, result):
+    """One item of an evaluation response's detailed_results"""
+    entry = {
+        "question": question["question"],
+        "user_answer": answer,
+        "correct_answer": question["answer"],
+        "is_correct": result["is_correct"],
+        "explanation": result["explanation"],
+    }
+    if result.get("timed_out"):
+        entry["timed_out"] = True
+    return entry
+
 
 def compress_image(image_file, max_size_mb=1):
+    from PIL import Image
+
     # Open the image
     img = Image.open(image_file)
 
@@ -69,119 +542,199 @@ def get_base64_image(image_path):
         return None
 
 
-@question_bp.route("/generate", methods=["POST"])
-def generate_questions():
-    try:
-        if request.files:
-            file = request.files["file"]
-            num_questions = int(request.form.get("num_questions", 5))
-            question_type = request.form.get("question_type", "mcq")
-            difficulty = request.form.get("difficulty", "medium")
-
-            try:
-                question_type = json.loads(question_type)
-            except:
-                pass
+def load_pdf_context(file):
+    """
+    Save an uploaded PDF, split it and return the combined chunk text.
+    Check it with validate_pdf_upload first.
+    """
+    fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    file.save(temp_path)
 
-            if not set(["mcq", "match_the_following", "true_false"]).issubset(QUIZ_TYPES):
-                return (
-                    jsonify(
-                        {
-                            "success": False,
-                            "error": "Invalid question type. Must be one of 'mcq', 'short', 'long', 'code', 'fill_in_blank', 'match_the_following', 'true_false', 'sequence', 'diagram'.",
-                        }
-                    ),
-                    400,
-                )
-
-            if not file.filename.endswith(".pdf"):
-                return (
-                    jsonify(
-                        {
-                            "success": False,
-                            "error": "Invalid file format. File must be PDF.",
-                        }
-                    ),
-                    400,
-                )
-
-            # Save PDF temporarily
-            temp_path = "temp.pdf"
-            file.save(temp_path)
+    try:
+        _, chunks = extract_pdf_chunks(temp_path)
+        return join_chunks(chunks)
+    finally:
+        # Clean up temp file
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
 
-            try:
-                # Use Langchain's PDF loader
-                loader = PyPDFLoader(temp_path)
-                pages = loader.load()
-
-                # Check page limit
-                if len(pages) > 30:
-                    return (
-                        jsonify(
-                            {
-                                "success": False,
-                                "error": "File must have less than 30 pages",
-                            }
-                        ),
-                        400,
-                    )
-
-                # Split text into chunks
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=2000, chunk_overlap=200, length_function=len
-                )
-                texts = text_splitter.split_documents(pages)
-
-                # Combine relevant chunks
-                combined_text = " ".join([doc.page_content for doc in texts])
-
-                # Generate questions using the same prompt as generate_questions
-                questions = llm_service.generate_questions(
-                    subject="Document Analysis",
-                    topic="PDF Content",
-                    question_type=question_type,
-                    difficulty=difficulty,
-                    num_questions=num_questions,
-                    context=combined_text,
-                )
 
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
+@question_bp.route("/generate", methods=["POST"])
+@client_limited
+@request_deadline
+def generate_questions():
+    try:
+        if request.mimetype == "multipart/form-data":
+            question_type, num_questions, error = validate_quiz_request(
+                request.form.get("question_type", "mcq"),
+                request.form.get("num_questions", 5),
+            )
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+
+            doc_id = request.form.get("doc_id")
+            if doc_id:
+                combined_text = get_document_store().context(doc_id, client_id())
+            else:
+                file = request.files.get("file")
+                error = validate_pdf_upload(file)
+                if error:
+                    return jsonify({"success": False, "error": error}), 400
+
+                combined_text = load_pdf_context(file)
+
+            # Generate questions using the same prompt as generate_questions
+            params = dict(
+                subject=DOCUMENT_DEFAULTS["subject"],
+                topic=DOCUMENT_DEFAULTS["topic"],
+                question_type=question_type,
+                difficulty=request.form.get("difficulty", "medium"),
+                num_questions=num_questions,
+                context=combined_text,
+            )
+            progressive = request.form.get("progressive")
+            questions = None
 
         else:
             data = request.json
-            question_type = data["question_type"]
-
-            if not set(["mcq", "match_the_following", "true_false"]).issubset(QUIZ_TYPES):
-                return (
-                    jsonify(
-                        {
-                            "success": False,
-                            "error": "Invalid question type. Must be one of 'mcq', 'short', 'long', 'code', 'fill_in_blank', 'match_the_following', 'true_false', 'sequence', 'diagram'.",
-                        }
-                    ),
-                    400,
-                )
+            doc_id = data.get("doc_id")
+            if doc_id:
+                data = {**DOCUMENT_DEFAULTS, **data}
+            question_type, num_questions, error = validate_quiz_request(
+                data["question_type"], data["num_questions"]
+            )
+            if error:
+                return jsonify({"success": False, "error": error}), 400
 
-            questions = llm_service.generate_questions(
+            params = dict(
                 subject=data["subject"],
                 topic=data["topic"],
                 question_type=question_type,
                 difficulty=data["difficulty"],
-                num_questions=data["num_questions"],
+                num_questions=num_questions,
             )
+            progressive = data.get("progressive")
+            if doc_id:
+                # Stored material: no upload and no parsing, just the text
+                params["context"] = get_document_store().context(doc_id, client_id())
+                questions = None
+            else:
+                questions = take_pregenerated(**params)
+
+        if questions is None and wants_progressive(progressive, num_questions):
+            quiz_id, questions, progress = start_progressive_quiz(params)
+            return jsonify(
+                {"success": True, "questions": questions, "quiz_id": quiz_id, "progress": progress}
+            )
+
+        marker = {}
+        if questions is None:
+            service = get_llm_service()
+            questions = service.generate_questions(**params)
+            marker = shortfall(service, question_type, num_questions, questions)
 
         # Create session and store questions as JSON
         session = SessionModel()
         session.set_questions(questions)
         db_session.add(session)
-        db_session.commit()
+        with metrics.timed("db_commit"):
+            db_session.commit()
+
+        return jsonify({"success": True, "questions": questions, "quiz_id": session.id, **marker})
+
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except DocumentNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except DeadlineExceeded:
+        return deadline_exceeded_response()
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-        return jsonify({"success": True, "questions": questions, "quiz_id": session.id})
 
+@question_bp.route("/generate/batch", methods=["POST"])
+@client_limited
+@request_deadline
+def generate_question_batch():
+    """Generate several quiz variants from one PDF or topic in a single request"""
+    try:
+        multipart = request.mimetype == "multipart/form-data"
+        if multipart:
+            file = request.files.get("file")
+            doc_id = request.form.get("doc_id")
+            subject = request.form.get("subject", DOCUMENT_DEFAULTS["subject"])
+            topic = request.form.get("topic", DOCUMENT_DEFAULTS["topic"])
+            specs = json.loads(request.form.get("quizzes", "[]"))
+        else:
+            data = request.json
+            doc_id = data.get("doc_id")
+            if doc_id:
+                data = {**DOCUMENT_DEFAULTS, **data}
+            subject = data["subject"]
+            topic = data["topic"]
+            specs = data.get("quizzes", [])
+
+        error = validate_batch_specs(specs)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        if multipart and not doc_id:
+            error = validate_pdf_upload(file)
+            if error:
+                return jsonify({"success": False, "error": error}), 400
+
+        # Parse the source once and share it across every variant
+        if doc_id:
+            context = get_document_store().context(doc_id, client_id())
+        elif multipart:
+            context = load_pdf_context(file)
+        else:
+            context = data.get("context", "")
+
+        variants = get_llm_service().generate_question_batch(
+            subject=subject,
+            topic=topic,
+            specs=specs,
+            context=context,
+            max_workers=Config.BATCH_MAX_WORKERS,
+        )
+
+        # Store every variant in one transaction; ones left empty are skipped
+        sessions = []
+        for variant in variants:
+            session = None
+            if variant["questions"]:
+                session = SessionModel()
+                session.set_questions(variant["questions"])
+            sessions.append(session)
+        db_session.add_all([session for session in sessions if session is not None])
+        with metrics.timed("db_commit"):
+            db_session.commit()
+
+        quiz_ids = [session.id if session is not None else None for session in sessions]
+        return jsonify(
+            {
+                "success": True,
+                "quiz_ids": [quiz_id for quiz_id in quiz_ids if quiz_id is not None],
+                "quizzes": [
+                    batch_entry(quiz_id, variant) for quiz_id, variant in zip(quiz_ids, variants)
+                ],
+            }
+        )
+
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except DocumentNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except DeadlineExceeded:
+        return deadline_exceeded_response()
     except Exception as e:
+        db_session.rollback()
         return jsonify({"success": False, "error": str(e)}), 400
 
 
@@ -209,7 +762,7 @@ def generate_questions():
 #             content = f"An image was provided. Please analyze this image and generate questions based on its content."
 
 #             # Generate questions using the image content
-#             questions = llm_service.generate_questions(
+#             questions = get_llm_service().generate_questions(
 #                 subject="Image Analysis",
 #                 topic="Image Content",
 #                 question_type=request.form.get("question_type", "mcq"),
@@ -245,33 +798,138 @@ def generate_questions():
 #         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@question_bp.route("/documents", methods=["POST"])
+@client_limited
+def upload_document():
+    """
+    Extract and store a PDF once; the returned doc_id replaces the file in
+    /generate and /generate/batch
+    """
+    try:
+        file = request.files.get("file")
+        error = validate_pdf_upload(file)
+        if error:
+            return jsonify({"success": False, "error": error}), 400
+
+        document = get_document_store().put(file, client_id())
+        return jsonify({"success": True, **document}), 201 if document["created"] else 200
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Error processing document: {str(e)}"}), 500
+
+
+@question_bp.route("/documents/<string:doc_id>", methods=["GET"])
+@client_limited
+def get_document(doc_id):
+    try:
+        return jsonify({"success": True, **get_document_store().describe(doc_id, client_id())})
+    except DocumentNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+
+
+@question_bp.route("/documents/<string:doc_id>", methods=["DELETE"])
+@client_limited
+def delete_document(doc_id):
+    if not get_document_store().delete(doc_id, client_id()):
+        return jsonify({"success": False, "error": f"Unknown document id: {doc_id}"}), 404
+    return jsonify({"success": True})
+
+
+@question_bp.route("/images", methods=["POST"])
+@client_limited
+def upload_images():
+    """Store answer images once; the returned ids can be reused in /evaluate"""
+    try:
+        if not request.files:
+            return jsonify({"success": False, "error": "No image provided"}), 400
+
+        images = [
+            {"name": name, **get_image_store().put(file.stream)}
+            for name, file in request.files.items(multi=True)
+        ]
+        return jsonify({"success": True, "images": images})
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+
 @question_bp.route("/quiz/<string:quiz_id>", methods=["GET"])
 def get_questions(quiz_id):
     try:
-        session = db_session.query(SessionModel).filter_by(id=quiz_id).first()
+        # Progressive quizzes change underneath the shared session
+        session = (
+            db_session.query(SessionModel).filter_by(id=quiz_id).populate_existing().first()
+        )
 
         if not session:
             return jsonify({"success": False, "error": "Quiz not found"}), 404
 
-        questions = session.get_questions()
-        return jsonify({"success": True, "questions": questions})
+        if session.touch(Config.SESSION_TOUCH_GRANULARITY_SECONDS):
+            db_session.commit()
+
+        payload = {"questions": session.get_questions()}
+        progress = session.progress(Config.PROGRESSIVE_STALE_SECONDS)
+        if progress is not None:
+            payload["progress"] = progress
+        fields = parse_fields(request.args.get("fields"))
+        return jsonify({"success": True, **project(payload, fields)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@question_bp.route("/quiz/<string:quiz_id>/analytics", methods=["GET"])
+def get_quiz_analytics(quiz_id):
+    """Per-question difficulty, discrimination and distractor counts"""
+    try:
+        session = db_session.query(SessionModel).filter_by(id=quiz_id).first()
+        if not session:
+            return jsonify({"success": False, "error": "Quiz not found"}), 404
+
+        report = get_item_analytics().report(quiz_id, session.get_questions())
+        return jsonify({"success": True, **report})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 
 @question_bp.route("/evaluate/<string:quiz_id>", methods=["POST"])
+@client_limited
+@request_deadline
 def evaluate_answers(quiz_id):
     try:
-        data = request.get_json()
-        user_answers = data.get("answers", [])
+        if request.mimetype == "multipart/form-data":
+            # Multipart: answers JSON plus binary image parts it references
+            user_answers = json.loads(request.form.get("answers", "[]"))
+            try:
+                attach_uploaded_images(
+                    user_answers,
+                    {name: file.stream for name, file in request.files.items()},
+                )
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+        else:
+            data = request.get_json()
+            user_answers = data.get("answers", [])
 
         # Get questions from session
-        session = db_session.query(SessionModel).filter_by(id=quiz_id).first()
+        session = (
+            db_session.query(SessionModel).filter_by(id=quiz_id).populate_existing().first()
+        )
         if not session:
             return jsonify({"success": False, "error": "Quiz not found"}), 404
 
+        if session.touch(Config.SESSION_TOUCH_GRANULARITY_SECONDS):
+            db_session.commit()
+
         # Get questions directly - no need to parse JSON again
         questions = session.get_questions()
+        progress = session.progress(Config.PROGRESSIVE_STALE_SECONDS)
+        if progress is not None and len(questions) < len(user_answers):
+            # Wait only for the pending questions that were answered
+            questions, progress = get_progressive_quizzes().wait_for(
+                quiz_id, len(user_answers), deadlines.cap(Config.PROGRESSIVE_WAIT_SECONDS)
+            )
 
         # Evaluate each answer
         evaluation_results = []
@@ -284,29 +942,6 @@ def evaluate_answers(quiz_id):
                     400,
                 )
 
-            # Convert image paths to base64 if present
-            if (
-                isinstance(user_answer.get("answer"), dict)
-                and "image" in user_answer["answer"]
-            ):
-                image_data = user_answer["answer"]["image"]
-                if image_data and "path" in image_data:
-                    base64_image = get_base64_image(image_data["path"])
-                    if base64_image:
-                        user_answer["answer"]["image"] = {
-                            "base64": base64_image,
-                            "originalPath": image_data["path"],
-                        }
-
-            # Decode the base64 image if present and prepare it for LLM evaluation
-            if (
-                "image" in user_answer["answer"]
-                and "base64" in user_answer["answer"]["image"]
-            ):
-                base64_image_data = user_answer["answer"]["image"]
-                # Attach the base64 image data directly to the user answer
-                user_answer["answer"]["image_data"] = base64_image_data
-
             # Ensure q is a dictionary
             if not isinstance(q, dict) or "question" not in q or "answer" not in q:
                 return (
@@ -314,29 +949,32 @@ def evaluate_answers(quiz_id):
                     400,
                 )
 
-            result = llm_service.evaluate_answer(q, user_answer["answer"])
-            evaluation_json = {
-                "question": q["question"],
-                "user_answer": user_answer["answer"],
-                "correct_answer": q["answer"],
-                "is_correct": result["is_correct"],
-                "explanation": result["explanation"],
-            }
-
-            evaluation_results.append(evaluation_json)
+            # Summarize first: grading strips the image from the answer
+            answer = answer_summary(user_answer["answer"])
+            prepare_user_answer(user_answer)
+            result = get_llm_service().evaluate_answer(q, user_answer["answer"])
+            evaluation_results.append(evaluation_entry(q, answer, result))
 
         # Calculate overall score
-        score_data = llm_service.calculate_quiz_score(evaluation_results)
-
-        return jsonify(
-            {
-                "success": True,
-                "quiz_id": quiz_id,
-                "detailed_results": evaluation_results,
-                **score_data,
-            }
-        )
-
+        score_data = get_llm_service().calculate_quiz_score(evaluation_results)
+        record_attempt(quiz_id, questions, evaluation_results)
+
+        payload = {
+            "quiz_id": quiz_id,
+            "detailed_results": evaluation_results,
+            **score_data,
+        }
+        if progress is not None:
+            payload["progress"] = progress
+        fields = parse_fields(request.args.get("fields"))
+        return jsonify({"success": True, **project(payload, fields)})
+
+    except RequestEntityTooLarge:
+        return too_large_response()
+    except ImageNotFoundError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
     except Exception as e:
         return (
             jsonify({"success": False, "error": f"Error evaluating answers: {str(e)}"}),
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+import uuid
+import jwt
+
+
+# Secrets anyone could guess: unset, empty or the old development default
+INSECURE_SECRETS = {None, "", "dev-secret-key"}
+
+
+class AuthError(Exception):
+    """Raised for a missing, malformed, expired or revoked token"""
+
+
+def is_secure_secret(secret: Optional[str]) -> bool:
+    return secret not in INSECURE_SECRETS
+
+
+class TokenVerifier:
+    """
+    Issues and verifies HS256 access tokens.
+
+    Verified claims are kept in an LRU cache keyed by the token, so a client
+    sending the same token on every request pays for signature checking
+    once. Expiry and revocation are still checked on every call. Revoked
+    token ids are held until the token would have expired anyway.
+
+    With an insecure secret (see INSECURE_SECRETS) tokens are neither issued
+    nor accepted, since anyone could sign their own.
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        ttl_seconds: float = 3600,
+        algorithm: str = "HS256",
+        cache_size: int = 10000,
+    ):
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+        self.algorithm = algorithm
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _require_secret(self):
+        if not is_secure_secret(self.secret):
+            raise AuthError("Token authentication is disabled: SECRET_KEY is not set")
+
+    def issue(self, subject, **claims) -> str:
+        self._require_secret()
+        now = int(time.time())
+        payload = {
+            **claims,
+            "sub": str(subject),
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + int(self.ttl_seconds),
+        }
+        return jwt.encode(payload, self.secret, algorithm=self.algorithm)
+
+    def verify(self, token: str) -> dict:
+        """Return the token's claims or raise AuthError"""
+        self._require_secret()
+        now = time.time()
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None:
+                self._cache.move_to_end(token)
+                self.cache_hits += 1
+
+        if claims is None:
+            try:
+                claims = jwt.decode(
+                    token,
+                    self.secret,
+                    algorithms=[self.algorithm],
+                    options={"require": ["exp", "sub", "jti"]},
+                )
+            except jwt.ExpiredSignatureError:
+                raise AuthError("Token has expired")
+            except jwt.InvalidTokenError:
+                raise AuthError("Invalid token")
+            with self._lock:
+                self.cache_misses += 1
+                self._cache[token] = claims
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if claims["exp"] <= now:
+            with self._lock:
+                self._cache.pop(token, None)
+            raise AuthError("Token has expired")
+        if claims["jti"] in self._revoked:
+            raise AuthError("Token has been revoked")
+        return claims
+
+    def revoke(self, claims: dict):
+        """Reject the token with these claims from now on"""
+        now = time.time()
+        with self._lock:
+            self._revoked[claims["jti"]] = claims["exp"]
+            # Expired tokens fail verification on their own
+            for jti in [jti for jti, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[jti]
+
+    def snapshot(self) -> dict:
+        return {
+            "cached_tokens": len(self._cache),
+            "revoked_tokens": len(self._revoked),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """The token from an ``Authorization: Bearer`` header, or None"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
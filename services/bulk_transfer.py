@@ -0,0 +1,282 @@
+"""
+Streaming NDJSON export and import of quizzes and results.
+
+Every line is one JSON record with a ``type`` of ``quiz`` (a ``sessions``
+row) or ``result`` (a ``quiz_results/*.json`` file). Export reads the
+database one keyset page at a time through a server-side cursor and the
+result files one at a time, so memory use does not grow with the data.
+Import commits in batches, skips quizzes that already exist and reports
+progress after each batch so an interrupted run can resume.
+"""
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+from sqlalchemy import select
+from models.models import SessionModel, Session, engine
+import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+QUIZ_RECORD = "quiz"
+RESULT_RECORD = "result"
+RESULT_FILE_PREFIX = "quiz_results_"
+
+_QUIZ_COLUMNS = (
+    SessionModel.id,
+    SessionModel.questions_json,
+    SessionModel.created_at,
+    SessionModel.last_accessed_at,
+    SessionModel.expected_questions,
+    SessionModel.generation_status,
+)
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _loads(line: bytes):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def iter_quiz_records(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    quiz_ids: Optional[Iterable[str]] = None,
+    page_size: int = 500,
+    bind=engine,
+) -> Iterator[dict]:
+    """
+    Yield quiz records ordered by id. Each page is its own short read, so a
+    long export never holds the database lock for long.
+    """
+    conditions = []
+    if since is not None:
+        conditions.append(SessionModel.created_at >= since)
+    if until is not None:
+        conditions.append(SessionModel.created_at < until)
+    if quiz_ids:
+        conditions.append(SessionModel.id.in_(list(quiz_ids)))
+
+    last_id = ""
+    while True:
+        query = (
+            select(*_QUIZ_COLUMNS)
+            .where(SessionModel.id > last_id, *conditions)
+            .order_by(SessionModel.id)
+            .limit(page_size)
+        )
+        count = 0
+        with bind.connect() as conn:
+            rows = conn.execution_options(stream_results=True, yield_per=page_size).execute(query)
+            for row in rows:
+                count += 1
+                last_id = row.id
+                yield {
+                    "type": QUIZ_RECORD,
+                    "id": row.id,
+                    "created_at": _isoformat(row.created_at),
+                    "last_accessed_at": _isoformat(row.last_accessed_at),
+                    "expected_questions": row.expected_questions,
+                    "generation_status": row.generation_status,
+                    # Stored JSON is embedded as is instead of being re-parsed
+                    "questions": (
+                        orjson.Fragment(row.questions_json)
+                        if orjson is not None
+                        else json.loads(row.questions_json)
+                    ),
+                }
+        if count < page_size:
+            return
+
+
+def iter_result_records(
+    results_dir: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    quiz_ids: Optional[Iterable[str]] = None,
+) -> Iterator[dict]:
+    """Yield result files as records, reading one file at a time"""
+    if not os.path.isdir(results_dir):
+        return
+    quiz_ids = set(quiz_ids or ())
+    for name in sorted(os.listdir(results_dir)):
+        if not (name.startswith(RESULT_FILE_PREFIX) and name.endswith(".json")):
+            continue
+        quiz_id = name[len(RESULT_FILE_PREFIX) : -len(".json")]
+        if quiz_ids and quiz_id not in quiz_ids:
+            continue
+        try:
+            with open(os.path.join(results_dir, name), "rb") as f:
+                data = _loads(f.read())
+        except (OSError, ValueError) as e:
+            print(f"Skipping unreadable result file {name}: {str(e)}")
+            continue
+
+        timestamp = None
+        try:
+            timestamp = _parse_datetime(data.get("timestamp"))
+        except (TypeError, ValueError):
+            pass
+        if timestamp is not None and (
+            (since is not None and timestamp < since) or (until is not None and timestamp >= until)
+        ):
+            continue
+        yield {"type": RESULT_RECORD, **data, "quiz_id": data.get("quiz_id", quiz_id)}
+
+
+def export_ndjson(
+    results_dir: str,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    quiz_ids: Optional[Iterable[str]] = None,
+    include_quizzes: bool = True,
+    include_results: bool = True,
+    page_size: int = 500,
+) -> Iterator[bytes]:
+    """Yield NDJSON lines for the selected quizzes and results"""
+    quiz_ids = list(quiz_ids or ())
+    if include_quizzes:
+        for record in iter_quiz_records(since, until, quiz_ids, page_size):
+            yield _dumps(record)
+    if include_results:
+        for record in iter_result_records(results_dir, since, until, quiz_ids):
+            yield _dumps(record)
+
+
+def _write_result_file(results_dir: str, record: dict) -> bool:
+    """Write a result record as a file unless it exists; returns True if written"""
+    data = {key: value for key, value in record.items() if key != "type"}
+    quiz_id = str(data.get("quiz_id", ""))
+    if not quiz_id or os.sep in quiz_id or (os.altsep and os.altsep in quiz_id):
+        raise ValueError("Result record needs a valid quiz_id")
+    path = os.path.join(results_dir, f"{RESULT_FILE_PREFIX}{quiz_id}.json")
+    if os.path.exists(path):
+        return False
+    os.makedirs(results_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=results_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def _commit_quizzes(session, records: list) -> int:
+    """Insert the quizzes of a batch that do not exist yet; returns how many"""
+    ids = [record["id"] for record in records]
+    existing = {
+        row.id for row in session.query(SessionModel.id).filter(SessionModel.id.in_(ids))
+    }
+    added = 0
+    for record in records:
+        if record["id"] in existing:
+            continue
+        existing.add(record["id"])
+        quiz = SessionModel(
+            id=record["id"],
+            created_at=_parse_datetime(record.get("created_at")),
+            last_accessed_at=_parse_datetime(record.get("last_accessed_at")),
+            expected_questions=record.get("expected_questions"),
+            generation_status=record.get("generation_status"),
+        )
+        quiz.set_questions(record.get("questions") or [])
+        session.add(quiz)
+        added += 1
+    session.commit()
+    return added
+
+
+def import_ndjson(
+    stream,
+    results_dir: str,
+    batch_size: int = 500,
+    start_line: int = 0,
+    start_offset: int = 0,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Import NDJSON records from a binary stream.
+
+    Quizzes are committed ``batch_size`` at a time. After each batch
+    ``on_batch(lines, offset)`` receives the lines and bytes consumed so
+    far; passing them back as ``start_line`` and ``start_offset`` (or
+    re-sending the stream) resumes the import, and quizzes that already
+    exist are skipped. Lines before ``start_line`` are skipped when the
+    stream cannot be seeked to ``start_offset``.
+    """
+    stats = {"lines": start_line, "quizzes": 0, "results": 0, "skipped": 0, "errors": 0}
+    offset = start_offset
+    skip = start_line
+    if start_offset:
+        stream.seek(start_offset)
+        skip = 0
+
+    session = Session()
+    pending = []
+    pending_results = 0
+
+    def flush():
+        nonlocal pending, pending_results
+        added = _commit_quizzes(session, pending) if pending else 0
+        stats["quizzes"] += added
+        stats["skipped"] += len(pending) - added
+        pending = []
+        pending_results = 0
+        if on_batch is not None:
+            on_batch(stats["lines"], offset)
+
+    try:
+        for line in stream:
+            offset += len(line)
+            if skip:
+                skip -= 1
+                continue
+            stats["lines"] += 1
+            if not line.strip():
+                continue
+            try:
+                record = _loads(line)
+                kind = record.get("type")
+                if kind == QUIZ_RECORD:
+                    if not isinstance(record.get("id"), str):
+                        raise ValueError("Quiz record needs an id")
+                    pending.append(record)
+                elif kind == RESULT_RECORD:
+                    if _write_result_file(results_dir, record):
+                        stats["results"] += 1
+                    else:
+                        stats["skipped"] += 1
+                    pending_results += 1
+                else:
+                    raise ValueError(f"Unknown record type: {kind}")
+            except (ValueError, TypeError, AttributeError) as e:
+                stats["errors"] += 1
+                print(f"Skipping line {stats['lines']}: {str(e)}")
+                continue
+            if len(pending) + pending_results >= batch_size:
+                flush()
+        flush()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return stats
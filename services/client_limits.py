@@ -0,0 +1,161 @@
+from collections import deque
+from typing import Dict, Optional
+from services.auth import AuthError, TokenVerifier, bearer_token
+from services.rate_limiter import RateLimitExceeded
+import math
+import threading
+import time
+
+SECONDS_PER_DAY = 86400
+
+
+class SlidingWindowLimiter:
+    """At most ``limit`` requests per client within any ``window_seconds``"""
+
+    def __init__(self, limit: int, window_seconds: float = 60, max_idle_clients: int = 10000):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_idle_clients = max_idle_clients
+        self._hits: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def hit(self, client: str, now: Optional[float] = None):
+        """
+        Record a request. Returns (allowed, remaining, reset_seconds), where
+        reset_seconds is when the oldest request in the window expires.
+        """
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window_seconds
+        with self._lock:
+            hits = self._hits.get(client)
+            if hits is None:
+                if len(self._hits) >= self.max_idle_clients:
+                    self._forget_idle(cutoff)
+                hits = self._hits[client] = deque()
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+
+            allowed = len(hits) < self.limit
+            if allowed:
+                hits.append(now)
+            reset = hits[0] + self.window_seconds - now if hits else 0.0
+            return allowed, self.limit - len(hits), reset
+
+    def _forget_idle(self, cutoff: float):
+        for client in [c for c, hits in self._hits.items() if not hits or hits[-1] <= cutoff]:
+            del self._hits[client]
+
+
+class DailyTokenQuota:
+    """LLM tokens each client may use per UTC day"""
+
+    def __init__(self, tokens_per_day: int):
+        self.tokens_per_day = tokens_per_day
+        self._used: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self, client: str, now: Optional[float] = None) -> int:
+        day = int((time.time() if now is None else now) // SECONDS_PER_DAY)
+        with self._lock:
+            used_day, used = self._used.get(client, (day, 0))
+        return self.tokens_per_day - (used if used_day == day else 0)
+
+    def charge(self, client: str, tokens: int, now: Optional[float] = None) -> int:
+        """Add usage; returns the tokens left today (negative when overdrawn)"""
+        day = int((time.time() if now is None else now) // SECONDS_PER_DAY)
+        with self._lock:
+            used_day, used = self._used.get(client, (day, 0))
+            used = (used if used_day == day else 0) + tokens
+            self._used[client] = (day, used)
+            # Entries from earlier days are dead weight
+            if len(self._used) > 10000:
+                for stale in [c for c, (d, _) in self._used.items() if d != day]:
+                    del self._used[stale]
+        return self.tokens_per_day - used
+
+    @staticmethod
+    def seconds_until_reset(now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        return SECONDS_PER_DAY - now % SECONDS_PER_DAY
+
+
+class Admission:
+    """An admitted request: who made it and what it has left"""
+
+    def __init__(self, client: str, rate=None, quota_limit=None, quota_remaining=None):
+        self.client = client
+        self.rate = rate
+        self.quota_limit = quota_limit
+        self.quota_remaining = quota_remaining
+
+    def headers(self) -> dict:
+        headers = {}
+        if self.rate is not None:
+            limit, remaining, reset = self.rate
+            headers["X-RateLimit-Limit"] = str(limit)
+            headers["X-RateLimit-Remaining"] = str(max(0, remaining))
+            headers["X-RateLimit-Reset"] = str(int(math.ceil(reset)))
+        if self.quota_limit is not None:
+            headers["X-Quota-Limit"] = str(self.quota_limit)
+            headers["X-Quota-Remaining"] = str(max(0, self.quota_remaining))
+        return headers
+
+
+class ClientGate:
+    """
+    Authenticates callers of the LLM-bound endpoints and applies their
+    per-minute request limit and daily token quota.
+
+    Clients are identified by the token subject, or by address when
+    anonymous access is allowed. State is held in this process.
+    """
+
+    def __init__(
+        self,
+        verifier: TokenVerifier,
+        auth_required: bool = False,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_day: Optional[int] = None,
+    ):
+        self.verifier = verifier
+        self.auth_required = auth_required
+        self.limiter = SlidingWindowLimiter(requests_per_minute) if requests_per_minute else None
+        self.quota = DailyTokenQuota(tokens_per_day) if tokens_per_day else None
+
+    def identify(self, authorization: Optional[str], remote_addr: Optional[str]) -> str:
+        token = bearer_token(authorization)
+        if token is None:
+            if authorization or self.auth_required:
+                raise AuthError("Missing bearer token")
+            return f"addr:{remote_addr or 'unknown'}"
+        return f"user:{self.verifier.verify(token)['sub']}"
+
+    def admit(self, authorization: Optional[str], remote_addr: Optional[str]) -> Admission:
+        """Identify the caller and take one request from their limits"""
+        admission = Admission(self.identify(authorization, remote_addr))
+
+        if self.quota is not None:
+            admission.quota_limit = self.quota.tokens_per_day
+            admission.quota_remaining = self.quota.remaining(admission.client)
+            if admission.quota_remaining <= 0:
+                raise RateLimitExceeded(
+                    "Daily token quota exhausted",
+                    retry_after=self.quota.seconds_until_reset(),
+                    headers=admission.headers(),
+                )
+
+        if self.limiter is not None:
+            allowed, remaining, reset = self.limiter.hit(admission.client)
+            admission.rate = (self.limiter.limit, remaining, reset)
+            if not allowed:
+                raise RateLimitExceeded(
+                    f"Rate limit of {self.limiter.limit} requests per minute exceeded",
+                    retry_after=max(1.0, reset),
+                    headers=admission.headers(),
+                )
+        return admission
+
+    def charge(self, admission: Admission, tokens: int):
+        """Bill the tokens a request used against its client's quota"""
+        if self.quota is not None:
+            admission.quota_remaining = self.quota.charge(admission.client, tokens)
@@ -0,0 +1,93 @@
+"""
+Request deadlines.
+
+A deadline set with ``deadline()`` applies to everything the request runs
+in the same context: executor threads started through
+``metrics.run_in_context`` and asyncio tasks inherit it. Provider calls,
+retries, rate-limit waits and coalesced waits are all cut to the time left,
+and fail with ``DeadlineExceeded`` once it has passed.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import time
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request deadline passed before a call could finish"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Bound the enclosed work to ``seconds`` from now; an earlier enclosing deadline wins"""
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def unbounded():
+    """Lift the deadline, for background work that outlives the request"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left, or None without a deadline"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """
+    The smaller of ``timeout`` and the time left; raises ``DeadlineExceeded``
+    when none is left, so no new call is started
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+def cap(timeout: float) -> float:
+    """``timeout`` cut to the time left; unlike ``clamp`` it never raises"""
+    left = remaining()
+    return timeout if left is None else max(0.0, min(timeout, left))
+
+
+def parse_timeout(value, default: Optional[float] = None, maximum: Optional[float] = None):
+    """
+    A client's requested timeout in seconds, capped at ``maximum``; ``default``
+    when not given. Raises ValueError for anything but a positive number.
+    """
+    if value is None or value == "":
+        seconds = default
+    else:
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("timeout must be a number of seconds")
+        if not seconds > 0 or seconds == float("inf"):
+            raise ValueError("timeout must be a positive number of seconds")
+    if maximum is not None and (seconds is None or seconds > maximum):
+        seconds = maximum
+    return seconds
@@ -0,0 +1,267 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from models.models import DocumentModel, Session
+from services import metrics
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+_HYPHENATED_BREAK = re.compile(r"(\w)-\n(\w)")
+_SPACES = re.compile(r"[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised for a document id that was never uploaded or has expired"""
+
+
+def clean_text(text: str) -> str:
+    """Drop extraction noise: NULs, words hyphenated across lines, runs of spaces"""
+    text = text.replace("\x00", "")
+    text = _HYPHENATED_BREAK.sub(r"\1\2", text)
+    text = _SPACES.sub(" ", text)
+    text = _BLANK_LINES.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.split("\n")).strip()
+
+
+def extract_pdf_chunks(
+    path: str, chunk_size: int = 2000, chunk_overlap: int = 200
+) -> Tuple[int, List[str]]:
+    """Extract, clean and split a PDF; returns (page count, chunks)"""
+    from langchain.document_loaders import PyPDFLoader
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    with metrics.timed("pdf_load"):
+        pages = PyPDFLoader(path).load()
+    for page in pages:
+        page.page_content = clean_text(page.page_content)
+
+    with metrics.timed("split"):
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len
+        )
+        texts = text_splitter.split_documents(pages)
+    return len(pages), [doc.page_content for doc in texts]
+
+
+def join_chunks(chunks: List[str]) -> str:
+    """The generation context for a document's chunks"""
+    return " ".join(chunks)
+
+
+class DocumentStore:
+    """
+    Uploaded PDFs kept as extracted text, so quizzes can be generated from
+    the same material again without re-uploading or re-parsing it.
+
+    Documents belong to the client that uploaded them (``owner``); other
+    clients get DocumentNotFoundError for their ids. Each client's documents
+    are deduplicated by the SHA-256 of the file: uploading a PDF it already
+    stored returns the existing id without parsing. The contexts of recently
+    used documents are cached in memory, and documents unused for
+    ``max_age_seconds`` are removed.
+    """
+
+    def __init__(
+        self,
+        max_age_seconds: float = 30 * 86400,
+        cache_size: int = 32,
+        touch_granularity_seconds: float = 3600,
+        prune_interval_seconds: float = 3600,
+        chunk_size: int = 64 * 1024,
+    ):
+        self.max_age_seconds = max_age_seconds
+        self.cache_size = cache_size
+        self.touch_granularity_seconds = touch_granularity_seconds
+        self.prune_interval_seconds = prune_interval_seconds
+        self.chunk_size = chunk_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _describe(self, document: DocumentModel) -> dict:
+        return {
+            "doc_id": document.id,
+            "filename": document.filename,
+            "pages": document.page_count,
+            "chunks": len(document.get_chunks()),
+            "characters": document.characters,
+            "created_at": document.created_at.isoformat() if document.created_at else None,
+        }
+
+    def put(self, file, owner: Optional[str] = None) -> dict:
+        """
+        Store an uploaded PDF (a FileStorage) for ``owner``; check it with
+        validate_pdf_upload first. ``created`` in the result is False when
+        the owner already stored it.
+        """
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = file.stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+            content_hash = digest.hexdigest()
+
+            existing = self._find(content_hash, owner)
+            if existing is not None:
+                return {**existing, "created": False}
+
+            page_count, chunks = extract_pdf_chunks(temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        session = Session()
+        try:
+            document = DocumentModel(
+                owner=owner,
+                content_hash=content_hash,
+                filename=file.filename,
+                page_count=page_count,
+            )
+            document.set_chunks(chunks)
+            session.add(document)
+            session.commit()
+            description = {**self._describe(document), "created": True}
+        except IntegrityError:
+            # The same PDF was stored concurrently
+            session.rollback()
+            description = {**self._find(content_hash, owner), "created": False}
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        self._maybe_prune()
+        return description
+
+    def _find(self, content_hash: str, owner: Optional[str]) -> Optional[dict]:
+        session = Session()
+        try:
+            document = (
+                session.query(DocumentModel)
+                .filter_by(content_hash=content_hash, owner=owner)
+                .first()
+            )
+            if document is None:
+                return None
+            self._touch(session, document.id, document.last_used_at)
+            return self._describe(document)
+        finally:
+            session.close()
+
+    def _touch(self, session, doc_id: str, last_used_at: Optional[datetime]):
+        """Refresh a document's age, writing at most once per granularity"""
+        now = datetime.utcnow()
+        if last_used_at is None or now - last_used_at >= timedelta(
+            seconds=self.touch_granularity_seconds
+        ):
+            session.query(DocumentModel).filter_by(id=doc_id).update({"last_used_at": now})
+            session.commit()
+
+    def describe(self, doc_id: str, owner: Optional[str] = None) -> dict:
+        session = Session()
+        try:
+            document = session.query(DocumentModel).filter_by(id=doc_id, owner=owner).first()
+            if document is None:
+                raise DocumentNotFoundError(f"Unknown document id: {doc_id}")
+            return self._describe(document)
+        finally:
+            session.close()
+
+    def context(self, doc_id: str, owner: Optional[str] = None) -> str:
+        """The combined text of a document, as load_pdf_context would return it"""
+        with self._lock:
+            text = self._cache.get(doc_id)
+            if text is not None:
+                self._cache.move_to_end(doc_id)
+        metrics.record_cache_lookup("document", text is not None)
+
+        session = Session()
+        try:
+            # Only the small columns unless the text has to be loaded. The
+            # owner is checked on every call, cached or not.
+            row = (
+                session.query(DocumentModel.last_used_at)
+                .filter_by(id=doc_id, owner=owner)
+                .first()
+            )
+            if row is None:
+                raise DocumentNotFoundError(f"Unknown document id: {doc_id}")
+            self._touch(session, doc_id, row.last_used_at)
+            if text is None:
+                chunks_json = (
+                    session.query(DocumentModel.chunks_json).filter_by(id=doc_id).scalar()
+                )
+                text = join_chunks(json.loads(chunks_json) if chunks_json else [])
+        finally:
+            session.close()
+
+        with self._lock:
+            self._cache[doc_id] = text
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def _evict(self, doc_id: str):
+        with self._lock:
+            self._cache.pop(doc_id, None)
+
+    def delete(self, doc_id: str, owner: Optional[str] = None) -> bool:
+        """Delete an owner's document; returns False if it has no such document"""
+        session = Session()
+        try:
+            deleted = session.query(DocumentModel).filter_by(id=doc_id, owner=owner).delete()
+            session.commit()
+            if deleted:
+                self._evict(doc_id)
+            return bool(deleted)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def prune(self) -> int:
+        """Delete documents unused for the maximum age; returns how many"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+        session = Session()
+        try:
+            stale = session.query(DocumentModel.id).filter(DocumentModel.last_used_at < cutoff)
+            ids = [row.id for row in stale]
+            if ids:
+                session.query(DocumentModel).filter(DocumentModel.id.in_(ids)).delete(
+                    synchronize_session=False
+                )
+                session.commit()
+            for doc_id in ids:
+                self._evict(doc_id)
+            return len(ids)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_prune < self.prune_interval_seconds:
+                return
+            self._last_prune = now
+        try:
+            self.prune()
+        except Exception as e:
+            print(f"Error pruning document store: {str(e)}")
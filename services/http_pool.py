@@ -0,0 +1,166 @@
+"""
+Process-wide HTTP clients for the LLM providers.
+
+Every OpenAI-compatible chat model is built on the same keep-alive pool,
+one sync and one async ``httpx`` client, instead of one pool per model,
+so tiers and fallbacks to the same host share warm connections. Requests
+are counted by whether they opened a new connection or reused one.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
+from services import metrics
+import asyncio
+import threading
+
+
+def _request_hook(request):
+    """Count the request as new or reused once it is written to a connection"""
+    state = {"new": False}
+
+    def trace(event, info):
+        if event == "connection.connect_tcp.complete":
+            state["new"] = True
+        elif event.endswith(".send_request_headers.started"):
+            metrics.record_http_request(request.url.host, state["new"])
+
+    request.extensions["trace"] = trace
+
+
+async def _arequest_hook(request):
+    state = {"new": False}
+
+    async def trace(event, info):
+        if event == "connection.connect_tcp.complete":
+            state["new"] = True
+        elif event.endswith(".send_request_headers.started"):
+            metrics.record_http_request(request.url.host, state["new"])
+
+    request.extensions["trace"] = trace
+
+
+class HttpPool:
+    """
+    Shared, tunable ``httpx`` clients built on first use. ``http2`` needs
+    the ``h2`` package and falls back to HTTP/1.1 without it.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        connect_timeout: float = 5.0,
+        pool_timeout: float = 10.0,
+        read_timeout: Optional[float] = None,
+        http2: bool = False,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def timeout(self, read: Optional[float] = None):
+        """
+        The ``httpx.Timeout`` for a model: ``read`` (or the pool's default)
+        for reading and writing, with the pool's connect and pool timeouts
+        """
+        import httpx
+
+        read = self.read_timeout if read is None else read
+        return httpx.Timeout(read, connect=self.connect_timeout, pool=self.pool_timeout)
+
+    def _settings(self) -> dict:
+        import httpx
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("HTTP/2 for LLM providers needs the h2 package; using HTTP/1.1")
+                http2 = False
+        return {
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            "timeout": self.timeout(),
+            "http2": http2,
+        }
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+
+                    self._client = httpx.Client(
+                        **self._settings(), event_hooks={"request": [_request_hook]}
+                    )
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    import httpx
+
+                    self._async_client = httpx.AsyncClient(
+                        **self._settings(), event_hooks={"request": [_arequest_hook]}
+                    )
+        return self._async_client
+
+    def _warm_count(self, connections: int) -> int:
+        return max(0, min(connections, self.max_keepalive_connections))
+
+    def warm_up(self, urls: Iterable[str], connections: int = 4) -> int:
+        """
+        Open up to ``connections`` keep-alive connections to each URL's host
+        with concurrent HEAD requests; any response leaves the connection
+        pooled. Returns how many requests got a response.
+        """
+        targets = [url for url in urls for _ in range(self._warm_count(connections))]
+        if not targets:
+            return 0
+
+        def head(url):
+            try:
+                self.client.head(url)
+                return True
+            except Exception as e:
+                print(f"Error warming up connection to {url}: {str(e)}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            return sum(executor.map(head, targets))
+
+    async def awarm_up(self, urls: Iterable[str], connections: int = 4) -> int:
+        """``warm_up`` for the async client; run it on the serving event loop"""
+        targets = [url for url in urls for _ in range(self._warm_count(connections))]
+
+        async def head(url):
+            try:
+                await self.async_client.head(url)
+                return True
+            except Exception as e:
+                print(f"Error warming up connection to {url}: {str(e)}")
+                return False
+
+        return sum(await asyncio.gather(*(head(url) for url in targets)))
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from models.models import AttemptModel, Session
+import threading
+
+NO_CHOICE = -1
+MAX_OPTIONS = 127  # choices are stored as int8
+
+# Items are only flagged once enough students have answered them
+MIN_FLAG_RESPONSES = 10
+TOO_HARD = 0.2
+TOO_EASY = 0.95
+LOW_DISCRIMINATION = 0.1
+
+
+def _choice_index(question: dict, answer) -> int:
+    """Index of the option a multiple-choice answer picked, or NO_CHOICE"""
+    options = question.get("options")
+    if not isinstance(options, list) or not isinstance(answer, str):
+        return NO_CHOICE
+    normalized = answer.strip().lower()
+    for index, option in enumerate(options[:MAX_OPTIONS]):
+        if str(option).strip().lower() == normalized:
+            return index
+    # Answers given by letter ("b")
+    if len(normalized) == 1 and "a" <= normalized <= "z":
+        index = ord(normalized) - ord("a")
+        if index < min(len(options), MAX_OPTIONS):
+            return index
+    return NO_CHOICE
+
+
+def encode_attempt(questions: List[dict], results: List[dict]) -> Tuple[bytes, bytes]:
+    """
+    Encode an evaluation as two int8 strings with one byte per question:
+    the outcome and, for multiple choice, the option chosen
+    """
+    outcomes = bytearray(b"\xff" * len(questions))
+    choices = bytearray(b"\xff" * len(questions))
+    for index, (question, result) in enumerate(zip(questions, results)):
+        if result.get("timed_out"):
+            continue  # never graded: counts as unanswered
+        outcomes[index] = 1 if result.get("is_correct") else 0
+        choices[index] = _choice_index(question, result.get("user_answer")) & 0xFF
+    return bytes(outcomes), bytes(choices)
+
+
+def save_attempt(quiz_id: str, questions: List[dict], results: List[dict]):
+    """Store an evaluation for item analytics"""
+    outcomes, choices = encode_attempt(questions, results)
+    session = Session()
+    try:
+        session.add(AttemptModel(quiz_id=quiz_id, outcomes=outcomes, choices=choices))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+class ItemStats:
+    """
+    Running sums for one quiz's items. Every statistic follows from these,
+    so new attempts are folded in without revisiting old ones.
+    """
+
+    def __init__(self):
+        import numpy as np
+
+        self.np = np
+        self.attempts = 0
+        self.last_attempt_id = 0
+        self.responses = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.total = np.zeros(0)
+        self.total_sq = np.zeros(0)
+        self.correct_total = np.zeros(0)
+        self.choice_counts = np.zeros((0, 0), dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def _grow(self, n_items: int, n_options: int):
+        np = self.np
+        extra = n_items - len(self.responses)
+        if extra > 0:
+            self.responses = np.concatenate([self.responses, np.zeros(extra, dtype=np.int64)])
+            self.correct = np.concatenate([self.correct, np.zeros(extra, dtype=np.int64)])
+            self.total = np.concatenate([self.total, np.zeros(extra)])
+            self.total_sq = np.concatenate([self.total_sq, np.zeros(extra)])
+            self.correct_total = np.concatenate([self.correct_total, np.zeros(extra)])
+        rows, cols = self.choice_counts.shape
+        if n_items > rows or n_options > cols:
+            counts = np.zeros((max(n_items, rows), max(n_options, cols)), dtype=np.int64)
+            counts[:rows, :cols] = self.choice_counts
+            self.choice_counts = counts
+
+    def add(self, outcomes, choices):
+        """Fold in an (attempts x items) block of encoded outcomes and choices"""
+        np = self.np
+        n_attempts, n_items = outcomes.shape
+        n_options = int(choices.max()) + 1 if choices.size else 0
+        self._grow(n_items, n_options)
+
+        answered = outcomes >= 0
+        correct = outcomes == 1
+        # Each attempt's total: the share of its answered items it got right
+        score = correct.sum(axis=1) / np.maximum(answered.sum(axis=1), 1)
+        score = score[:, None]
+
+        self.responses[:n_items] += answered.sum(axis=0)
+        self.correct[:n_items] += correct.sum(axis=0)
+        self.total[:n_items] += (answered * score).sum(axis=0)
+        self.total_sq[:n_items] += (answered * score**2).sum(axis=0)
+        self.correct_total[:n_items] += (correct * score).sum(axis=0)
+
+        chosen = choices >= 0
+        if chosen.any():
+            items = np.nonzero(chosen)[1]
+            width = self.choice_counts.shape[1]
+            histogram = np.bincount(
+                items * width + choices[chosen], minlength=n_items * width
+            ).reshape(n_items, width)
+            self.choice_counts[:n_items] += histogram
+        self.attempts += n_attempts
+
+    def statistics(self):
+        """Per-item difficulty (proportion correct) and point-biserial discrimination"""
+        np = self.np
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = self.responses.astype(float)
+            difficulty = self.correct / n
+            mean_total = self.total / n
+            var_total = self.total_sq / n - mean_total**2
+            covariance = self.correct_total / n - difficulty * mean_total
+            discrimination = covariance / np.sqrt(difficulty * (1 - difficulty) * var_total)
+        return difficulty, discrimination
+
+
+class ItemAnalytics:
+    """
+    Cached per-quiz item statistics. Each request first folds in attempts
+    stored since the last one, read in pages as NumPy arrays, so the cost
+    follows the number of new evaluations rather than the history.
+    """
+
+    def __init__(self, cache_size: int = 256, page_size: int = 10000):
+        self.cache_size = cache_size
+        self.page_size = page_size
+        self._cache: "OrderedDict[str, ItemStats]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stats(self, quiz_id: str) -> ItemStats:
+        with self._lock:
+            stats = self._cache.get(quiz_id)
+            if stats is None:
+                stats = self._cache[quiz_id] = ItemStats()
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            else:
+                self._cache.move_to_end(quiz_id)
+            return stats
+
+    def _catch_up(self, quiz_id: str, stats: ItemStats):
+        np = stats.np
+        session = Session()
+        try:
+            while True:
+                rows = (
+                    session.query(AttemptModel.id, AttemptModel.outcomes, AttemptModel.choices)
+                    .filter(AttemptModel.quiz_id == quiz_id, AttemptModel.id > stats.last_attempt_id)
+                    .order_by(AttemptModel.id)
+                    .limit(self.page_size)
+                    .all()
+                )
+                if not rows:
+                    return
+                # Quizzes can grow (progressive generation): pad to the widest
+                width = max(len(row.outcomes) for row in rows)
+                outcomes = np.frombuffer(
+                    b"".join(row.outcomes.ljust(width, b"\xff") for row in rows), dtype=np.int8
+                ).reshape(len(rows), width)
+                choices = np.frombuffer(
+                    b"".join(row.choices.ljust(width, b"\xff") for row in rows), dtype=np.int8
+                ).reshape(len(rows), width)
+                stats.add(outcomes, choices)
+                stats.last_attempt_id = rows[-1].id
+                if len(rows) < self.page_size:
+                    return
+        finally:
+            session.close()
+
+    def report(self, quiz_id: str, questions: List[dict]) -> dict:
+        """Item statistics and quality flags for every question of a quiz"""
+        stats = self._stats(quiz_id)
+        with stats.lock:
+            self._catch_up(quiz_id, stats)
+            difficulty, discrimination = stats.statistics()
+            responses = stats.responses.tolist()
+            choice_counts = stats.choice_counts.tolist()
+            attempts = stats.attempts
+
+        items = []
+        for index, question in enumerate(questions):
+            answered = responses[index] if index < len(responses) else 0
+            p = _finite(difficulty, index)
+            r = _finite(discrimination, index)
+            item = {
+                "index": index,
+                "question": question.get("question"),
+                "type": question.get("type"),
+                "responses": answered,
+                "difficulty": p,
+                "discrimination": r,
+                "flags": _flags(answered, p, r),
+            }
+            options = question.get("options")
+            if isinstance(options, list):
+                counts = choice_counts[index] if index < len(choice_counts) else []
+                item["distractors"] = [
+                    {
+                        "option": option,
+                        "count": counts[i] if i < len(counts) else 0,
+                        "correct": str(option).strip().lower()
+                        == str(question.get("answer", "")).strip().lower(),
+                    }
+                    for i, option in enumerate(options[:MAX_OPTIONS])
+                ]
+            items.append(item)
+        return {"quiz_id": quiz_id, "attempts": attempts, "items": items}
+
+
+def _finite(values, index: int) -> Optional[float]:
+    if index >= len(values):
+        return None
+    value = float(values[index])
+    return round(value, 4) if value == value and abs(value) != float("inf") else None
+
+
+def _flags(responses: int, difficulty: Optional[float], discrimination: Optional[float]) -> List[str]:
+    if responses < MIN_FLAG_RESPONSES or difficulty is None:
+        return []
+    flags = []
+    if difficulty < TOO_HARD:
+        flags.append("too_hard")
+    elif difficulty > TOO_EASY:
+        flags.append("too_easy")
+    if discrimination is not None:
+        if discrimination < 0:
+            flags.append("negative_discrimination")
+        elif discrimination < LOW_DISCRIMINATION:
+            flags.append("low_discrimination")
+    return flags
@@ -0,0 +1,75 @@
+from typing import Any, Dict, List
+import json
+import re
+
+
+def _array_start(text: str) -> int:
+    """Find the array holding the questions, preferring the "questions" key"""
+    match = re.search(r'"questions"\s*:\s*\[', text)
+    if match:
+        return match.end() - 1
+    return text.find("[")
+
+
+def salvage_json_objects(text: str) -> List[Dict[str, Any]]:
+    """
+    Recover every complete object from a truncated or malformed JSON array.
+
+    Objects are delimited by tracking brace depth outside of string literals,
+    so a reply cut off mid-question still yields all the questions before it.
+    Objects that fail to parse on their own are skipped.
+    """
+    start = _array_start(text)
+    if start == -1:
+        return []
+
+    objects = []
+    depth = 0
+    in_string = False
+    escaped = False
+    object_start = None
+
+    for index in range(start + 1, len(text)):
+        char = text[index]
+
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char == "{":
+            if depth == 0:
+                object_start = index
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0 and object_start is not None:
+                parsed = _loads_lenient(text[object_start : index + 1])
+                if isinstance(parsed, dict):
+                    objects.append(parsed)
+                object_start = None
+        elif char == "]" and depth == 0:
+            break
+
+    return objects
+
+
+def _loads_lenient(fragment: str):
+    try:
+        return json.loads(fragment)
+    except ValueError:
+        pass
+
+    # Trailing commas and // comments are the usual culprits in model output
+    cleaned = re.sub(r"^\s*//.*$", "", fragment, flags=re.MULTILINE)
+    cleaned = re.sub(r",\s*([}\]])", r"\1", cleaned)
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        return None
@@ -1,16 +1,37 @@
-from typing import List, Optional, Union, Dict, Any
-from langchain_core.prompts import PromptTemplate
-from langchain_core.messages import HumanMessage
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List, Optional, Union, Dict, Any, Awaitable, Callable
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+from services.deadlines import DeadlineExceeded
+from services.http_pool import HttpPool
+from services.json_repair import salvage_json_objects
+from services.model_routing import TIER_MODELS, ModelRoutingTable
+from services.providers import (
+    ProviderBackend,
+    ProviderError,
+    ProviderRouter,
+    create_chat_model,
+)
+from services.rate_limiter import RateGovernor, RateLimitExceeded
+from services.singleflight import SingleFlight, SingleFlightTimeout
+from services.structured_output import complete_questions, grade_schema, questions_schema
+from services import deadlines, metrics
+import asyncio
 import os
 import json
 import ast
 import random
 import base64
 import io
-from PIL import Image
+import re
+import copy
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 
 def subjectTopicTemplate(subject, topic, questionType, questionQuantity):
@@ -50,17 +71,247 @@ def textTemplate(questionType, questionQuantity, text):
         """
 
 
+class IncompleteGenerationError(Exception):
+    """Raised when the model returned fewer questions than requested"""
+
+
+# Plain str.format templates; literal braces are doubled
+QUESTION_FORMATS = """
+        Questions must strictly follow one of these types and formats:
+
+        1. For "mcq":
+            {{
+                "question": "What is X?",
+                "type": "mcq",
+                "options": ["Option A", "Option B", "Option C", "Option D"],
+                "answer": "Option A",
+                "explanation": "Explanation here"
+            }}
+
+        2. For "fill_in_blank":
+            {{
+                "question": "_____ is the capital of France.",
+                "type": "fill_in_blank", 
+                "answer": "Paris",
+                "explanation": "Explanation here"
+            }}
+
+        3. For "true_false":
+            {{
+                "question": "The Earth is flat.",
+                "type": "true_false",
+                "answer": "false",
+                "explanation": "Explanation here"
+            }}
+
+        4. For "short":
+            {{
+                "question": "Define photosynthesis.",
+                "type": "short",
+                "answer": "Brief definition here",
+                "explanation": "Explanation here"
+            }}
+
+        5. For "long":
+            {{
+                "question": "Explain in detail how photosynthesis works.",
+                "type": "long",
+                "answer": "Detailed explanation here",
+                "explanation": "Key points here"
+            }}
+
+        6. For "code":
+            {{
+                "question": "Write a function that...",
+                "type": "code",
+                "answer": "Code solution here",
+                "explanation": "Code explanation here"
+            }}
+
+        7. For "sequence":
+            {{
+                "question": "Arrange the steps in order",
+                "type": "sequence",
+                "answer": [
+                    {{"id": "1", "content": "First step"}},
+                    {{"id": "2", "content": "Second step"}},
+                    {{"id": "3", "content": "Third step"}}
+                ],
+                "explanation": "Sequence explanation here"
+            }}
+
+        8. For "diagram":
+            {{
+                "question": "Draw a diagram of...",
+                "type": "diagram",
+                "answer": "Description of expected diagram",
+                "explanation": "Diagram requirements here"
+            }}
+
+        9. For "match_the_following":
+            {{
+                "question": "Match the following items",
+                "type": "match_the_following",
+                "match_the_following_pairs": {{
+                    "left": ["A", "B", "C"],
+                    "right": ["1", "2", "3"]
+                }},
+                "answer": {{"A": "1", "B": "2", "C": "3"}},
+                "explanation": "Matching explanation here"
+            }}
+
+        Context: {context}
+
+        Return response as:
+        {{
+            "questions": [
+                // Array of question objects following above formats
+            ]
+        }}
+
+        Ensure all JSON is valid and question types are exactly as specified.
+        """
+
+QUESTION_PROMPT = (
+    """
+        Generate {num_questions} {question_type} questions about {topic} in {subject}.
+        The questions should be at {difficulty} difficulty level.{variation}
+"""
+    + QUESTION_FORMATS
+)
+
+# One call covering several types; {allocation} lists "- N type questions"
+MIXED_QUESTION_PROMPT = (
+    """
+        Generate questions about {topic} in {subject}, exactly this many of each type:
+{allocation}
+        Set each question's "type" field to its type.
+        The questions should be at {difficulty} difficulty level.{variation}
+"""
+    + QUESTION_FORMATS
+)
+
+# Structured-output mode: the schema carries the format, so the prompt does not
+STRUCTURED_QUESTION_PROMPT = """
+        Generate {num_questions} {question_type} questions about {topic} in {subject}.
+        The questions should be at {difficulty} difficulty level.{variation}
+        Keep each explanation to one sentence.
+
+        Context: {context}
+        """
+
+STRUCTURED_MIXED_PROMPT = """
+        Generate questions about {topic} in {subject}, exactly this many of each type:
+{allocation}
+        Set each question's "type" field to its type.
+        The questions should be at {difficulty} difficulty level.{variation}
+        Keep each explanation to one sentence.
+
+        Context: {context}
+        """
+
+# At most this many existing questions are quoted in a prompt to be avoided
+MAX_EXCLUDED_QUESTIONS = 40
+
+
 class LLMService:
-    def __init__(self, provider: str = "gemini"):
+    def __init__(
+        self,
+        provider: str = "gemini",
+        fallback_providers: Optional[List[str]] = None,
+        backends: Optional[List[ProviderBackend]] = None,
+        timeout: Optional[float] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_delay: float = 1.0,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        rate_limit_max_wait: float = 30.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 0.5,
+        retry_max_wait: float = 8.0,
+        model_routes: Optional[ModelRoutingTable] = None,
+        tier_backends: Optional[Dict[str, List[ProviderBackend]]] = None,
+        grade_confidence_margin: float = 0.2,
+        single_flight_timeout: Optional[float] = None,
+        combined_max_questions: int = 10,
+        structured_output: float = 0.0,
+        grade_short_explanations: bool = False,
+        http_pool: Optional[HttpPool] = None,
+    ):
         self.provider = provider
-        if provider == "gemini":
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=os.getenv("GOOGLE_API_KEY"),
-                temperature=0,
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.retry_max_wait = retry_max_wait
+        self.grade_confidence_margin = grade_confidence_margin
+        self.single_flight = SingleFlight(timeout=single_flight_timeout)
+        self.combined_max_questions = combined_max_questions
+        # Share of calls using the providers' structured output; the rest
+        # use prompt-only JSON, so the two can be compared on live traffic
+        self.structured_output = structured_output
+        self.grade_short_explanations = grade_short_explanations
+        self.http_pool = http_pool
+
+        # One governor per provider: every tier calls it with the same API
+        # key, so the tiers share its request and token limits
+        governors = {}
+
+        def governor_for(name: str) -> Optional[RateGovernor]:
+            if not (requests_per_minute or tokens_per_minute):
+                return None
+            if name not in governors:
+                governors[name] = RateGovernor(
+                    requests_per_minute=requests_per_minute,
+                    tokens_per_minute=tokens_per_minute,
+                    max_wait_seconds=rate_limit_max_wait,
+                    model=TIER_MODELS["standard"].get(name) or name,
+                )
+            return governors[name]
+
+        def build_backends(tier: str) -> List[ProviderBackend]:
+            backends = []
+            for name in [provider] + list(fallback_providers or []):
+                model = TIER_MODELS.get(tier, TIER_MODELS["standard"]).get(name)
+                backends.append(
+                    ProviderBackend(
+                        name if tier == "standard" else f"{name}:{tier}",
+                        factory=functools.partial(
+                            create_chat_model,
+                            name,
+                            timeout=timeout,
+                            model=model,
+                            http_pool=http_pool,
+                        ),
+                        governor=governor_for(name),
+                    )
+                )
+            return backends
+
+        def build_router(backends: List[ProviderBackend]) -> ProviderRouter:
+            return ProviderRouter(
+                backends,
+                timeout=timeout,
+                hedge=hedge,
+                hedge_percentile=hedge_percentile,
+                hedge_min_delay=hedge_min_delay,
             )
-        else:
-            self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+
+        # Injected backends (e.g. fakes) replace every provider built from config
+        if tier_backends is None and backends is None and model_routes is not None:
+            tier_backends = {tier: build_backends(tier) for tier in model_routes.tiers()}
+        tier_backends = dict(tier_backends or {})
+        if backends is not None:
+            tier_backends["standard"] = backends
+        tier_backends.setdefault("standard", build_backends("standard"))
+
+        self.routers = {tier: build_router(b) for tier, b in tier_backends.items()}
+        self.router = self.routers["standard"]
+        self.model_routes = model_routes or ModelRoutingTable(routes={})
+
+        # langchain_core is imported here rather than at module load so that
+        # importing this module (Alembic, manage_db, worker boot) stays cheap
+        from langchain_core.prompts import PromptTemplate
+        from langchain_core.output_parsers import JsonOutputParser
 
         self.question_prompt = PromptTemplate.from_template(
             """Generate {num_questions} {question_type} questions about {topic} in {subject}.
@@ -83,6 +334,253 @@ class LLMService:
 
         self.output_parser = JsonOutputParser()
 
+    @property
+    def llm(self):
+        """
+        The primary provider's chat model, built on first access
+        """
+        return self.router.backends[0].llm
+
+    def warm_up(self, connections: int = 0):
+        """
+        Build every provider client ahead of the first request and open up
+        to ``connections`` pooled connections to each provider host
+        """
+        self._build_clients()
+        if self.http_pool is not None and connections:
+            self.http_pool.warm_up(self.provider_urls(), connections)
+
+    async def awarm_up(self, connections: int = 0):
+        """
+        ``warm_up`` for the async client; run it on the serving event loop
+        """
+        self._build_clients()
+        if self.http_pool is not None and connections:
+            await self.http_pool.awarm_up(self.provider_urls(), connections)
+
+    def _build_clients(self):
+        for router in self.routers.values():
+            for backend in router.backends:
+                backend.llm
+                # Loading a token encoding may download it; not on a request
+                if backend.governor is not None and backend.governor.token_bucket is not None:
+                    backend.governor.count_tokens("")
+
+    def provider_urls(self) -> List[str]:
+        """
+        Base URLs of the providers served over the shared HTTP pool
+        """
+        urls = set()
+        for router in self.routers.values():
+            for backend in router.backends:
+                client = getattr(backend.llm, "root_client", None)
+                if client is not None:
+                    urls.add(str(client.base_url))
+        return sorted(urls)
+
+    def _use_structured(self) -> bool:
+        """Whether the next call uses structured output"""
+        return self.structured_output >= 1 or random.random() < self.structured_output
+
+    def _complete(
+        self,
+        messages,
+        tier: str = "standard",
+        accept: Optional[Callable[[Any], bool]] = None,
+        schema: Optional[dict] = None,
+        salvage: bool = False,
+    ) -> Any:
+        """
+        Send a prompt to the best available provider and parse the JSON reply.
+
+        Calls routed to a cheaper tier escalate to the standard tier when the
+        reply cannot be parsed or ``accept`` rejects it as low confidence.
+        With a ``schema`` the provider's structured output is used instead of
+        parsing JSON out of the text. ``salvage`` is for question generation
+        only: complete questions are kept from a broken reply.
+        """
+        parse = (
+            functools.partial(self._parse_json, salvage=salvage)
+            if schema is None
+            else self._parse_structured
+        )
+        with metrics.label_context(output_mode="prompt" if schema is None else "structured"):
+            return self._complete_on(messages, tier, accept, parse, schema)
+
+    def _complete_on(self, messages, tier, accept, parse, schema) -> Any:
+        router = self.routers.get(tier)
+        if router is not None and router is not self.router:
+            with metrics.label_context(tier=tier):
+                try:
+                    result = router.invoke(messages, parse=parse, schema=schema)
+                    if accept is None or accept(result):
+                        return result
+                    reason = "low_confidence"
+                except RateLimitExceeded:
+                    reason = "rate_limited"
+                except ProviderError:
+                    reason = "error"
+            metrics.TIER_ESCALATIONS.inc(tier=tier, reason=reason)
+
+        with metrics.label_context(tier="standard"):
+            return self.router.invoke(messages, parse=parse, schema=schema)
+
+    async def _acomplete(
+        self,
+        messages,
+        tier: str = "standard",
+        accept: Optional[Callable[[Any], bool]] = None,
+        schema: Optional[dict] = None,
+        salvage: bool = False,
+    ) -> Any:
+        """
+        Async ``_complete`` with the same tier escalation
+        """
+        parse = (
+            functools.partial(self._parse_json, salvage=salvage)
+            if schema is None
+            else self._parse_structured
+        )
+        with metrics.label_context(output_mode="prompt" if schema is None else "structured"):
+            return await self._acomplete_on(messages, tier, accept, parse, schema)
+
+    async def _acomplete_on(self, messages, tier, accept, parse, schema) -> Any:
+        router = self.routers.get(tier)
+        if router is not None and router is not self.router:
+            with metrics.label_context(tier=tier):
+                try:
+                    result = await router.ainvoke(messages, parse=parse, schema=schema)
+                    if accept is None or accept(result):
+                        return result
+                    reason = "low_confidence"
+                except RateLimitExceeded:
+                    reason = "rate_limited"
+                except ProviderError:
+                    reason = "error"
+            metrics.TIER_ESCALATIONS.inc(tier=tier, reason=reason)
+
+        with metrics.label_context(tier="standard"):
+            return await self.router.ainvoke(messages, parse=parse, schema=schema)
+
+    def _request_key(self, *parts) -> str:
+        """
+        Stable hash identifying a normalized LLM request
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _coalesce(self, operation: str, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers with the same key
+        """
+        timeout = deadlines.clamp(self.single_flight.timeout)
+        try:
+            result, shared = self.single_flight.do(key, fn, timeout=timeout)
+        except SingleFlightTimeout:
+            if deadlines.expired():
+                raise DeadlineExceeded("Request deadline exceeded") from None
+            raise
+        return self._coalesced(operation, result, shared)
+
+    async def _acoalesce(self, operation: str, key: str, fn: Callable[[], Awaitable]) -> Any:
+        timeout = deadlines.clamp(self.single_flight.timeout)
+        try:
+            result, shared = await self.single_flight.do_async(key, fn, timeout=timeout)
+        except SingleFlightTimeout:
+            if deadlines.expired():
+                raise DeadlineExceeded("Request deadline exceeded") from None
+            raise
+        return self._coalesced(operation, result, shared)
+
+    def _coalesced(self, operation: str, result: Any, shared: bool) -> Any:
+        metrics.SINGLE_FLIGHT.inc(operation=operation, role="follower" if shared else "leader")
+        # Followers get their own copy so callers can never mutate each other's result
+        return copy.deepcopy(result) if shared else result
+
+    def _is_confident_grade(self, result: Any) -> bool:
+        """
+        A grade is trusted when it is well formed, self-consistent and not
+        too close to the pass mark
+        """
+        if not isinstance(result, dict) or not isinstance(result.get("is_correct"), bool):
+            return False
+        try:
+            score = float(result.get("score"))
+        except (TypeError, ValueError):
+            return False
+        if result["is_correct"] != (score >= 0.5):
+            return False
+        return abs(score - 0.5) >= self.grade_confidence_margin
+
+    def _parse_json(self, text: str, salvage: bool = False) -> Any:
+        """
+        Parse a JSON reply; with ``salvage``, complete questions are
+        recovered from a broken questions array
+        """
+        from langchain_core.exceptions import OutputParserException
+
+        try:
+            result = self.output_parser.parse(text)
+        except OutputParserException:
+            salvaged = salvage_json_objects(text) if salvage else None
+            if not salvaged:
+                metrics.record_parse("failed")
+                raise
+            metrics.record_parse("salvaged")
+            return {"questions": salvaged}
+        metrics.record_parse("ok")
+        return result
+
+    def _parse_structured(self, reply: dict) -> Any:
+        """
+        Unwrap a structured-output reply; raises like ``_parse_json`` when
+        the provider's output did not match the schema
+        """
+        parsed = reply.get("parsed")
+        if reply.get("parsing_error") is not None or parsed is None:
+            metrics.record_parse("failed")
+            raise ValueError(
+                f"Structured output did not match the schema: {reply.get('parsing_error')}"
+            )
+        metrics.record_parse("ok")
+        if hasattr(parsed, "model_dump"):
+            parsed = parsed.model_dump()
+        return complete_questions(parsed)
+
+    def _retry_policy(self, max_attempts: Optional[int] = None, backoff: bool = True) -> dict:
+        policy = {
+            "stop": stop_after_attempt(max_attempts or self.max_attempts),
+            "retry": retry_if_not_exception_type((RateLimitExceeded, DeadlineExceeded)),
+            "reraise": True,
+        }
+        if backoff:
+            wait = wait_random_exponential(multiplier=self.retry_backoff, max=self.retry_max_wait)
+            # Never sleep past the request deadline; the next attempt then fails fast
+            policy["wait"] = lambda retry_state: max(
+                0.0, min(wait(retry_state), deadlines.remaining() or float("inf"))
+            )
+        return policy
+
+    def _retrying(self, max_attempts: Optional[int] = None, backoff: bool = True) -> Retrying:
+        """
+        Retry policy with jittered exponential backoff for LLM calls
+        """
+        return Retrying(**self._retry_policy(max_attempts, backoff))
+
+    def _aretrying(
+        self, max_attempts: Optional[int] = None, backoff: bool = True
+    ) -> AsyncRetrying:
+        """
+        Same policy as ``_retrying``, sleeping on the event loop
+        """
+        return AsyncRetrying(**self._retry_policy(max_attempts, backoff))
+
+    def provider_stats(self) -> List[dict]:
+        """
+        Per-provider latency and error statistics used for routing
+        """
+        return [stats for router in self.routers.values() for stats in router.stats()]
+
     def generate_questions(
         self,
         subject: str,
@@ -91,149 +589,820 @@ class LLMService:
         difficulty: str,
         num_questions: int,
         context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        """
+        Generate questions, sharing one LLM run between identical concurrent requests.
+
+        ``exclude`` lists questions the model must not repeat; ``variant``
+        asks for a different set than the other variants of the same quiz.
+        """
+        key = self._generation_key(
+            subject, topic, question_type, difficulty, num_questions, context, exclude, variant
+        )
+        return self._coalesce(
+            "generate",
+            key,
+            lambda: self._generate_questions(
+                subject, topic, question_type, difficulty, num_questions, context,
+                exclude, variant,
+            ),
+        )
+
+    async def agenerate_questions(
+        self,
+        subject: str,
+        topic: str,
+        question_type: str,
+        difficulty: str,
+        num_questions: int,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        """
+        Async ``generate_questions``; missing types are generated concurrently
+        """
+        key = self._generation_key(
+            subject, topic, question_type, difficulty, num_questions, context, exclude, variant
+        )
+        return await self._acoalesce(
+            "generate",
+            key,
+            lambda: self._agenerate_questions(
+                subject, topic, question_type, difficulty, num_questions, context,
+                exclude, variant,
+            ),
+        )
+
+    def generate_remaining(
+        self,
+        subject: str,
+        topic: str,
+        question_type: List[str],
+        difficulty: str,
+        num_questions: int,
+        questions: List[Dict],
+        context: str = "",
+    ) -> List[Dict]:
+        """
+        The questions a quiz of ``num_questions`` still lacks after
+        ``questions``, per type and different from the ones it has
+        """
+        missing = self.missing_questions(question_type, num_questions, questions)
+        if not missing:
+            return []
+        return self._generate_allocation(
+            subject, topic, missing, difficulty, context, self.question_stems(questions)
+        )
+
+    async def agenerate_remaining(
+        self,
+        subject: str,
+        topic: str,
+        question_type: List[str],
+        difficulty: str,
+        num_questions: int,
+        questions: List[Dict],
+        context: str = "",
     ) -> List[Dict]:
-        all_questions = []
-        question_types = question_type
+        """
+        Async ``generate_remaining``
+        """
+        missing = self.missing_questions(question_type, num_questions, questions)
+        if not missing:
+            return []
+        return await self._agenerate_allocation(
+            subject, topic, missing, difficulty, context, self.question_stems(questions)
+        )
+
+    def _generation_key(
+        self, subject, topic, question_type, difficulty, num_questions, context,
+        exclude=None, variant=0,
+    ) -> str:
+        parts = [
+            "generate",
+            self._normalize_question_text(subject),
+            self._normalize_question_text(topic),
+            list(question_type),
+            str(difficulty).strip().lower(),
+            int(num_questions),
+            context,
+        ]
+        # Plain requests keep their original key, which stocked quizzes are filed under
+        if exclude or variant:
+            parts += [sorted(self._normalize_question_text(q) for q in exclude or []), int(variant)]
+        return self._request_key(*parts)
+
+    @staticmethod
+    def question_stems(questions: List[Dict]) -> List[str]:
+        """
+        The text of each question, for passing as ``exclude``
+        """
+        return [str(q["question"]) for q in questions if isinstance(q, dict) and q.get("question")]
+
+    def _variation(self, exclude: Optional[List[str]], variant: int) -> str:
+        """
+        Prompt lines steering the model away from questions it already wrote
+        """
+        lines = []
+        if variant:
+            lines.append(
+                f"This is version {int(variant) + 1} of this quiz; choose different "
+                "questions from the other versions."
+            )
+        if exclude:
+            lines.append("Do not repeat or rephrase any of these existing questions:")
+            lines.extend(
+                f"- {' '.join(stem.split())[:200]}" for stem in exclude[-MAX_EXCLUDED_QUESTIONS:]
+            )
+        return "".join(f"\n        {line}" for line in lines)
+
+    def _allocate(self, question_types: List[str], num_questions: int) -> Dict[str, int]:
+        """
+        Spread the requested count over the question types
+        """
         num_questions_per_type = num_questions // len(question_types)
         remainder = num_questions % len(question_types)
 
+        allocation = {}
         for i, q_type in enumerate(question_types):
             n_questions = num_questions_per_type + (1 if i < remainder else 0)
             if n_questions > 0:
-                question_prompt = PromptTemplate.from_template(
-                    """
-                    Generate {num_questions} {question_type} questions about {topic} in {subject}.
-                    The questions should be at {difficulty} difficulty level.
+                allocation[q_type] = allocation.get(q_type, 0) + n_questions
+        return allocation
 
-                    Questions must strictly follow one of these types and formats:
+    def missing_questions(
+        self, question_types: List[str], num_questions: int, questions: List[Dict]
+    ) -> Dict[str, int]:
+        """
+        How many questions of each type a request is still short of
+        """
+        missing = self._allocate(question_types, num_questions)
+        for question in questions:
+            if missing.get(question.get("type"), 0) > 0:
+                missing[question["type"]] -= 1
+        return {q_type: n for q_type, n in missing.items() if n > 0}
 
-                    1. For "mcq":
-                        {{
-                            "question": "What is X?",
-                            "type": "mcq",
-                            "options": ["Option A", "Option B", "Option C", "Option D"],
-                            "answer": "Option A",
-                            "explanation": "Explanation here"
-                        }}
+    def _use_mixed(self, allocation: Dict[str, int], num_questions: int) -> bool:
+        # Small mixed quizzes are requested in one call to save per-call overhead
+        return len(allocation) > 1 and num_questions <= self.combined_max_questions
 
-                    2. For "fill_in_blank":
-                        {{
-                            "question": "_____ is the capital of France.",
-                            "type": "fill_in_blank", 
-                            "answer": "Paris",
-                            "explanation": "Explanation here"
-                        }}
+    def _generate_questions(
+        self,
+        subject: str,
+        topic: str,
+        question_type: str,
+        difficulty: str,
+        num_questions: int,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        return self._generate_allocation(
+            subject, topic, self._allocate(question_type, num_questions), difficulty,
+            context, exclude, variant,
+        )
 
-                    3. For "true_false":
-                        {{
-                            "question": "The Earth is flat.",
-                            "type": "true_false",
-                            "answer": "false",
-                            "explanation": "Explanation here"
-                        }}
+    def _generate_allocation(
+        self,
+        subject: str,
+        topic: str,
+        allocation: Dict[str, int],
+        difficulty: str,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        collected = {q_type: [] for q_type in allocation}
+        last_error = None
 
-                    4. For "short":
-                        {{
-                            "question": "Define photosynthesis.",
-                            "type": "short",
-                            "answer": "Brief definition here",
-                            "explanation": "Explanation here"
-                        }}
+        if self._use_mixed(allocation, sum(allocation.values())):
+            try:
+                with metrics.label_context(operation="generate", question_type="mixed"):
+                    collected = self._generate_mixed(
+                        subject, topic, allocation, difficulty, context, exclude, variant
+                    )
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"Error generating mixed questions: {str(e)}")
+                last_error = e
+
+        for q_type, n_questions in allocation.items():
+            missing = n_questions - len(collected[q_type])
+            if missing > 0:
+                # Each type is isolated: a failure here keeps the other types
+                try:
+                    with metrics.label_context(operation="generate", question_type=q_type):
+                        questions = self._generate_type(
+                            subject, topic, q_type, difficulty, missing, context,
+                            exclude, variant,
+                        )
+                except RateLimitExceeded:
+                    raise
+                except DeadlineExceeded as e:
+                    # No time left for the remaining types either
+                    last_error = e
+                    break
+                except Exception as e:
+                    print(f"Error generating {q_type} questions: {str(e)}")
+                    last_error = e
+                    continue
+                collected[q_type].extend(questions)
+
+        all_questions = [
+            question for q_type in allocation for question in collected[q_type]
+        ]
+        if not all_questions and last_error is not None:
+            raise last_error
 
-                    5. For "long":
-                        {{
-                            "question": "Explain in detail how photosynthesis works.",
-                            "type": "long",
-                            "answer": "Detailed explanation here",
-                            "explanation": "Key points here"
-                        }}
+        return all_questions
 
-                    6. For "code":
-                        {{
-                            "question": "Write a function that...",
-                            "type": "code",
-                            "answer": "Code solution here",
-                            "explanation": "Code explanation here"
-                        }}
+    async def _agenerate_questions(
+        self,
+        subject: str,
+        topic: str,
+        question_type: str,
+        difficulty: str,
+        num_questions: int,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        return await self._agenerate_allocation(
+            subject, topic, self._allocate(question_type, num_questions), difficulty,
+            context, exclude, variant,
+        )
 
-                    7. For "sequence":
-                        {{
-                            "question": "Arrange the steps in order",
-                            "type": "sequence",
-                            "answer": [
-                                {{"id": "1", "content": "First step"}},
-                                {{"id": "2", "content": "Second step"}},
-                                {{"id": "3", "content": "Third step"}}
-                            ],
-                            "explanation": "Sequence explanation here"
-                        }}
+    async def _agenerate_allocation(
+        self,
+        subject: str,
+        topic: str,
+        allocation: Dict[str, int],
+        difficulty: str,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        collected = {q_type: [] for q_type in allocation}
+        last_error = None
 
-                    8. For "diagram":
-                        {{
-                            "question": "Draw a diagram of...",
-                            "type": "diagram",
-                            "answer": "Description of expected diagram",
-                            "explanation": "Diagram requirements here"
-                        }}
+        if self._use_mixed(allocation, sum(allocation.values())):
+            try:
+                with metrics.label_context(operation="generate", question_type="mixed"):
+                    collected = await self._agenerate_mixed(
+                        subject, topic, allocation, difficulty, context, exclude, variant
+                    )
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                print(f"Error generating mixed questions: {str(e)}")
+                last_error = e
+
+        async def generate_type(q_type: str, missing: int) -> List[Dict]:
+            with metrics.label_context(operation="generate", question_type=q_type):
+                return await self._agenerate_type(
+                    subject, topic, q_type, difficulty, missing, context, exclude, variant
+                )
 
-                    9. For "match_the_following":
-                        {{
-                            "question": "Match the following items",
-                            "type": "match_the_following",
-                            "match_the_following_pairs": {{
-                                "left": ["A", "B", "C"],
-                                "right": ["1", "2", "3"]
-                            }},
-                            "answer": {{"A": "1", "B": "2", "C": "3"}},
-                            "explanation": "Matching explanation here"
-                        }}
+        gaps = {
+            q_type: n_questions - len(collected[q_type])
+            for q_type, n_questions in allocation.items()
+            if n_questions > len(collected[q_type])
+        }
+        outcomes = await asyncio.gather(
+            *(generate_type(q_type, missing) for q_type, missing in gaps.items()),
+            return_exceptions=True,
+        )
+        for q_type, outcome in zip(gaps, outcomes):
+            if isinstance(outcome, RateLimitExceeded):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                print(f"Error generating {q_type} questions: {str(outcome)}")
+                last_error = outcome
+                continue
+            collected[q_type].extend(outcome)
+
+        all_questions = [
+            question for q_type in allocation for question in collected[q_type]
+        ]
+        if not all_questions and last_error is not None:
+            raise last_error
 
-                    Context: {context}
+        return all_questions
 
-                    Return response as:
-                    {{
-                        "questions": [
-                            // Array of question objects following above formats
-                        ]
-                    }}
+    def _mixed_tier(self, allocation: Dict[str, int], difficulty: str) -> str:
+        """
+        The shared tier of every type in the call, else the standard tier
+        """
+        tiers = {
+            self.model_routes.select("generate", q_type, difficulty) for q_type in allocation
+        }
+        return tiers.pop() if len(tiers) == 1 else "standard"
 
-                    Ensure all JSON is valid and question types are exactly as specified.
-                    """
+    def _mixed_prompt(
+        self,
+        subject: str,
+        topic: str,
+        allocation: Dict[str, int],
+        collected: Dict[str, List[Dict]],
+        difficulty: str,
+        context: str,
+        structured: bool = False,
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> str:
+        """
+        Prompt for the questions still missing from a combined call
+        """
+        missing = {
+            q_type: n - len(collected[q_type])
+            for q_type, n in allocation.items()
+            if n > len(collected[q_type])
+        }
+        template = STRUCTURED_MIXED_PROMPT if structured else MIXED_QUESTION_PROMPT
+        with metrics.timed("prompt_build"):
+            return template.format(
+                subject=subject,
+                topic=topic,
+                allocation="\n".join(
+                    f"        - {n} {q_type} questions" for q_type, n in missing.items()
+                ),
+                difficulty=difficulty,
+                variation=self._variation(exclude, variant),
+                context=context,
+            )
+
+    def _absorb_mixed(
+        self,
+        parsed_output: Any,
+        allocation: Dict[str, int],
+        collected: Dict[str, List[Dict]],
+    ):
+        """
+        Sort a combined reply into ``collected`` by type, raising when any
+        type is still short
+        """
+        for question in self._valid_questions(parsed_output):
+            q_type = str(question.get("type", "")).strip().lower()
+            if len(collected.get(q_type, [])) >= allocation.get(q_type, 0):
+                continue
+            collected[q_type].append(self._finalize_question(question, q_type))
+
+        if any(len(collected[t]) < n for t, n in allocation.items()):
+            raise IncompleteGenerationError(
+                "Missing questions after combined generation: "
+                + ", ".join(
+                    f"{allocation[t] - len(collected[t])} {t}"
+                    for t in allocation
+                    if len(collected[t]) < allocation[t]
                 )
+            )
+
+    def _generate_mixed(
+        self,
+        subject: str,
+        topic: str,
+        allocation: Dict[str, int],
+        difficulty: str,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Generate several question types in one call and validate the exact
+        per-type counts, topping up only the missing questions once
+        """
+        collected = {q_type: [] for q_type in allocation}
+        tier = self._mixed_tier(allocation, difficulty)
+        schema = questions_schema(list(allocation)) if self._use_structured() else None
+
+        try:
+            for attempt in self._retrying(max_attempts=2, backoff=False):
+                with attempt:
+                    parsed_output = self._complete(
+                        self._mixed_prompt(
+                            subject, topic, allocation, collected, difficulty, context,
+                            structured=schema is not None,
+                            # Retries must not ask for the questions already kept
+                            exclude=(exclude or [])
+                            + self.question_stems(
+                                [q for questions in collected.values() for q in questions]
+                            ),
+                            variant=variant,
+                        ),
+                        tier=tier,
+                        accept=self._has_questions,
+                        schema=schema,
+                        salvage=True,
+                    )
+                    self._absorb_mixed(parsed_output, allocation, collected)
+        except Exception:
+            if not any(collected.values()):
+                raise
+
+        return collected
+
+    async def _agenerate_mixed(
+        self,
+        subject: str,
+        topic: str,
+        allocation: Dict[str, int],
+        difficulty: str,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> Dict[str, List[Dict]]:
+        collected = {q_type: [] for q_type in allocation}
+        tier = self._mixed_tier(allocation, difficulty)
+        schema = questions_schema(list(allocation)) if self._use_structured() else None
+
+        try:
+            async for attempt in self._aretrying(max_attempts=2, backoff=False):
+                with attempt:
+                    parsed_output = await self._acomplete(
+                        self._mixed_prompt(
+                            subject, topic, allocation, collected, difficulty, context,
+                            structured=schema is not None,
+                            # Retries must not ask for the questions already kept
+                            exclude=(exclude or [])
+                            + self.question_stems(
+                                [q for questions in collected.values() for q in questions]
+                            ),
+                            variant=variant,
+                        ),
+                        tier=tier,
+                        accept=self._has_questions,
+                        schema=schema,
+                        salvage=True,
+                    )
+                    self._absorb_mixed(parsed_output, allocation, collected)
+        except Exception:
+            if not any(collected.values()):
+                raise
+
+        return collected
+
+    def _type_prompt(
+        self,
+        subject: str,
+        topic: str,
+        q_type: str,
+        difficulty: str,
+        n_questions: int,
+        context: str,
+        structured: bool = False,
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> str:
+        template = STRUCTURED_QUESTION_PROMPT if structured else QUESTION_PROMPT
+        with metrics.timed("prompt_build"):
+            return template.format(
+                subject=subject,
+                topic=topic,
+                question_type=q_type,
+                difficulty=difficulty,
+                num_questions=n_questions,
+                variation=self._variation(exclude, variant),
+                context=context,
+            )
+
+    def _absorb_type(
+        self,
+        parsed_output: Any,
+        questions: List[Dict],
+        q_type: str,
+        n_questions: int,
+    ):
+        """
+        Add a reply's valid questions to ``questions``, raising when short
+        """
+        for question in self._valid_questions(parsed_output)[: n_questions - len(questions)]:
+            questions.append(self._finalize_question(question, q_type))
+        if len(questions) < n_questions:
+            raise IncompleteGenerationError(
+                f"Got {len(questions)} of {n_questions} {q_type} questions"
+            )
 
-                formatted_prompt = question_prompt.format(
-                    subject=subject,
-                    topic=topic,
-                    question_type=q_type,
-                    difficulty=difficulty,
-                    num_questions=n_questions,
-                    context=context,
+    def _generate_type(
+        self,
+        subject: str,
+        topic: str,
+        q_type: str,
+        difficulty: str,
+        n_questions: int,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        """
+        Generate questions of one type, retrying only for the missing ones
+        """
+        questions = []
+        schema = questions_schema([q_type]) if self._use_structured() else None
+        try:
+            for attempt in self._retrying():
+                with attempt:
+                    parsed_output = self._complete(
+                        self._type_prompt(
+                            subject, topic, q_type, difficulty,
+                            n_questions - len(questions), context,
+                            structured=schema is not None,
+                            # Retries must not ask for the questions already kept
+                            exclude=(exclude or []) + self.question_stems(questions),
+                            variant=variant,
+                        ),
+                        tier=self.model_routes.select("generate", q_type, difficulty),
+                        accept=self._has_questions,
+                        schema=schema,
+                        salvage=True,
+                    )
+                    self._absorb_type(parsed_output, questions, q_type, n_questions)
+        except Exception:
+            # Keep whatever was salvaged rather than discarding paid-for output
+            if not questions:
+                raise
+
+        return questions
+
+    async def _agenerate_type(
+        self,
+        subject: str,
+        topic: str,
+        q_type: str,
+        difficulty: str,
+        n_questions: int,
+        context: str = "",
+        exclude: Optional[List[str]] = None,
+        variant: int = 0,
+    ) -> List[Dict]:
+        questions = []
+        schema = questions_schema([q_type]) if self._use_structured() else None
+        try:
+            async for attempt in self._aretrying():
+                with attempt:
+                    parsed_output = await self._acomplete(
+                        self._type_prompt(
+                            subject, topic, q_type, difficulty,
+                            n_questions - len(questions), context,
+                            structured=schema is not None,
+                            # Retries must not ask for the questions already kept
+                            exclude=(exclude or []) + self.question_stems(questions),
+                            variant=variant,
+                        ),
+                        tier=self.model_routes.select("generate", q_type, difficulty),
+                        accept=self._has_questions,
+                        schema=schema,
+                        salvage=True,
+                    )
+                    self._absorb_type(parsed_output, questions, q_type, n_questions)
+        except Exception:
+            if not questions:
+                raise
+
+        return questions
+
+    @staticmethod
+    def _has_questions(output: Any) -> bool:
+        return isinstance(output, dict) and bool(output.get("questions"))
+
+    @staticmethod
+    def _valid_questions(parsed_output: Any) -> List[Dict]:
+        if not isinstance(parsed_output, dict):
+            return []
+        return [
+            question
+            for question in parsed_output.get("questions", [])
+            if isinstance(question, dict) and "question" in question and "answer" in question
+        ]
+
+    def _finalize_question(self, question: Dict, q_type: str) -> Dict:
+        """
+        Normalize a generated question and shuffle match_the_following pairs
+        """
+        question["type"] = q_type  # Ensure the type is correctly set
+        if question["type"] == "match_the_following":
+            pairs = question["match_the_following_pairs"]
+            right_options = pairs["right"]
+            shuffled_right = right_options.copy()
+            random.shuffle(shuffled_right)
+            pairs["right"] = shuffled_right
+
+            correct_mapping = {}
+            for left, right in zip(pairs["left"], right_options):
+                correct_mapping[left] = right
+            question["answer"] = correct_mapping
+        return question
+
+    def generate_question_batch(
+        self,
+        subject: str,
+        topic: str,
+        specs: List[Dict],
+        context: str = "",
+        max_workers: int = 4,
+    ) -> List[Dict]:
+        """
+        Generate several quiz variants from one shared context concurrently.
+
+        Each variant asks for different questions from the others. Questions
+        repeated anyway are kept only in the first variant that produced them,
+        and the variants they were removed from are topped up.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs)))) as executor:
+            futures = [
+                executor.submit(
+                    metrics.run_in_context(
+                        self._generate_variant,
+                        **self._variant_params(subject, topic, spec, context, index),
+                    )
                 )
+                for index, spec in enumerate(specs)
+            ]
+            variants = [future.result() for future in futures]
 
-                response = self.llm.invoke(formatted_prompt)
-                parsed_output = self.output_parser.parse(response.content)
-
-                if "questions" in parsed_output:
-                    for question in parsed_output["questions"]:
-                        question["type"] = q_type  # Ensure the type is correctly set
-                        if question["type"] == "match_the_following":
-                            pairs = question["match_the_following_pairs"]
-                            right_options = pairs["right"]
-                            shuffled_right = right_options.copy()
-                            random.shuffle(shuffled_right)
-                            pairs["right"] = shuffled_right
-
-                            correct_mapping = {}
-                            for left, right in zip(pairs["left"], right_options):
-                                correct_mapping[left] = right
-                            question["answer"] = correct_mapping
-                    all_questions.extend(parsed_output["questions"])
+        results = self._dedupe_variants(variants)
+        for index, q_type, n_questions in self._top_ups(specs, results):
+            try:
+                questions = self.generate_questions(
+                    **self._variant_params(
+                        subject, topic, specs[index], context, index,
+                        question_type=[q_type],
+                        num_questions=n_questions,
+                        exclude=self._batch_stems(results),
+                    )
+                )
+            except (RateLimitExceeded, DeadlineExceeded):
+                break
+            except Exception as e:
+                print(f"Error topping up quiz variant {index}: {str(e)}")
+                continue
+            self._absorb_top_up(results, index, questions)
 
-        return all_questions
+        return self._mark_shortfall(results, specs)
+
+    async def agenerate_question_batch(
+        self,
+        subject: str,
+        topic: str,
+        specs: List[Dict],
+        context: str = "",
+    ) -> List[Dict]:
+        """
+        Async ``generate_question_batch``; every variant runs concurrently
+        """
+        variants = await asyncio.gather(
+            *(
+                self._agenerate_variant(
+                    **self._variant_params(subject, topic, spec, context, index)
+                )
+                for index, spec in enumerate(specs)
+            )
+        )
+
+        results = self._dedupe_variants(variants)
+        # One at a time, so each top-up avoids the questions of the ones before
+        for index, q_type, n_questions in self._top_ups(specs, results):
+            try:
+                questions = await self.agenerate_questions(
+                    **self._variant_params(
+                        subject, topic, specs[index], context, index,
+                        question_type=[q_type],
+                        num_questions=n_questions,
+                        exclude=self._batch_stems(results),
+                    )
+                )
+            except (RateLimitExceeded, DeadlineExceeded):
+                break
+            except Exception as e:
+                print(f"Error topping up quiz variant {index}: {str(e)}")
+                continue
+            self._absorb_top_up(results, index, questions)
+
+        return self._mark_shortfall(results, specs)
+
+    @staticmethod
+    def _variant_params(subject, topic, spec, context, index, **overrides) -> dict:
+        params = dict(
+            subject=subject,
+            topic=topic,
+            question_type=spec["question_type"],
+            difficulty=spec.get("difficulty", "medium"),
+            num_questions=spec["num_questions"],
+            context=context,
+            variant=index,
+        )
+        params.update(overrides)
+        return params
+
+    def _generate_variant(self, **params) -> List[Dict]:
+        """
+        One batch variant; running out of time leaves it empty rather than
+        failing the variants that finished
+        """
+        try:
+            return self.generate_questions(**params)
+        except DeadlineExceeded:
+            return []
+
+    async def _agenerate_variant(self, **params) -> List[Dict]:
+        try:
+            return await self.agenerate_questions(**params)
+        except DeadlineExceeded:
+            return []
+
+    def _top_ups(self, specs: List[Dict], results: List[Dict]):
+        """
+        Yield (variant index, question type, count) for every type a variant
+        is short of after dedup, until the deadline passes
+        """
+        for index, (spec, result) in enumerate(zip(specs, results)):
+            missing = self.missing_questions(
+                spec["question_type"], spec["num_questions"], result["questions"]
+            )
+            for q_type, n_questions in missing.items():
+                if deadlines.expired():
+                    return
+                yield index, q_type, n_questions
+
+    def _batch_stems(self, results: List[Dict]) -> List[str]:
+        return [stem for result in results for stem in self.question_stems(result["questions"])]
+
+    def _absorb_top_up(self, results: List[Dict], index: int, questions: List[Dict]):
+        """
+        Add a variant's top-up questions that no variant has yet
+        """
+        seen = {
+            self._normalize_question_text(question.get("question", ""))
+            for result in results
+            for question in result["questions"]
+        }
+        result = results[index]
+        for question in questions:
+            key = self._normalize_question_text(question.get("question", ""))
+            if key and key in seen:
+                result["duplicates_removed"] += 1
+                continue
+            seen.add(key)
+            result["questions"].append(question)
+
+    def _mark_shortfall(self, results: List[Dict], specs: List[Dict]) -> List[Dict]:
+        """
+        Record what each variant is still short of, and whether the deadline
+        cut it; raises when no variant got any questions
+        """
+        timed_out = deadlines.expired()
+        for result, spec in zip(results, specs):
+            missing = self.missing_questions(
+                spec["question_type"], spec["num_questions"], result["questions"]
+            )
+            if missing:
+                result["missing"] = missing
+                if timed_out:
+                    result["timed_out"] = True
+
+        if not any(result["questions"] for result in results):
+            if timed_out:
+                raise DeadlineExceeded("Request deadline exceeded")
+            raise IncompleteGenerationError("No questions could be generated for any quiz")
+        return results
+
+    def _dedupe_variants(self, variants: List[List[Dict]]) -> List[Dict]:
+        """
+        Keep each question only in the first variant that produced it
+        """
+        seen = set()
+        results = []
+        for questions in variants:
+            unique = []
+            for question in questions:
+                key = self._normalize_question_text(question.get("question", ""))
+                if key and key in seen:
+                    continue
+                seen.add(key)
+                unique.append(question)
+            results.append(
+                {
+                    "questions": unique,
+                    "duplicates_removed": len(questions) - len(unique),
+                }
+            )
+
+        return results
+
+    def _normalize_question_text(self, text: str) -> str:
+        """
+        Normalize question text for duplicate detection
+        """
+        return " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
 
     def extract_context_from_text(
         self, text: str, question_type: str, question_quantity: int
     ) -> List[Dict]:
+        from langchain_core.prompts import PromptTemplate
+
         context_prompt = PromptTemplate.from_template(
             """
                 You are an expert teacher. Based on the following text, create {questionQuantity} {questionType} questions.  
@@ -276,8 +1445,7 @@ class LLMService:
         formatted_prompt = context_prompt.format(
             text=text, questionType=question_type, questionQuantity=question_quantity
         )
-        response = self.llm.invoke(formatted_prompt)
-        parsed_output = self.output_parser.parse(response.content)
+        parsed_output = self._complete(formatted_prompt, salvage=True)
 
         return parsed_output["questions"]
 
@@ -285,11 +1453,116 @@ class LLMService:
         """
         Evaluate a user's answer using LLM
         """
+        result, grading = self._grading_request(question_data, user_answer)
+        if result is not None:
+            return result
+
+        try:
+            with metrics.label_context(
+                operation="grade", question_type=question_data["type"]
+            ), metrics.timed("grade_llm", question_type=question_data["type"]):
+
+                def grade():
+                    for attempt in self._retrying():
+                        with attempt:
+                            return self._checked_grade(
+                                self._complete(
+                                    grading["messages"],
+                                    tier=grading["tier"],
+                                    accept=self._is_confident_grade,
+                                    schema=grading["schema"],
+                                )
+                            )
+
+                return self._with_explanation(self._coalesce("grade", grading["key"], grade))
+        except RateLimitExceeded:
+            raise
+        except DeadlineExceeded:
+            return self._timed_out_grade()
+        except Exception as e:
+            return self._grading_error(e)
+
+    async def aevaluate_answer(self, question_data: dict, user_answer: dict) -> dict:
+        """
+        Async ``evaluate_answer``; local grading stays inline as it is cheap
+        """
+        result, grading = self._grading_request(question_data, user_answer)
+        if result is not None:
+            return result
+
+        try:
+            with metrics.label_context(
+                operation="grade", question_type=question_data["type"]
+            ), metrics.timed("grade_llm", question_type=question_data["type"]):
+
+                async def grade():
+                    async for attempt in self._aretrying():
+                        with attempt:
+                            return self._checked_grade(
+                                await self._acomplete(
+                                    grading["messages"],
+                                    tier=grading["tier"],
+                                    accept=self._is_confident_grade,
+                                    schema=grading["schema"],
+                                )
+                            )
+
+                return self._with_explanation(
+                    await self._acoalesce("grade", grading["key"], grade)
+                )
+        except RateLimitExceeded:
+            raise
+        except DeadlineExceeded:
+            return self._timed_out_grade()
+        except Exception as e:
+            return self._grading_error(e)
+
+    @staticmethod
+    def _checked_grade(result: Any) -> dict:
+        """
+        The grade, or ValueError (retried) when a broken reply parsed to
+        something without a verdict
+        """
+        if not isinstance(result, dict) or not isinstance(result.get("is_correct"), bool):
+            raise ValueError("Grading reply has no is_correct verdict")
+        return result
+
+    def _with_explanation(self, result: Any) -> Any:
+        """Fill the explanation a short-explanation grade leaves empty"""
+        if isinstance(result, dict) and not result.get("explanation"):
+            result["explanation"] = (
+                "Correct answer!" if result.get("is_correct") else "Incorrect answer."
+            )
+        return result
+
+    def _timed_out_grade(self) -> dict:
+        """Placeholder for an answer the request deadline left ungraded"""
+        return {
+            "is_correct": False,
+            "explanation": "Grading timed out",
+            "score": 0.0,
+            "timed_out": True,
+        }
+
+    def _grading_error(self, error: Exception) -> dict:
+        return {
+            "is_correct": False,
+            "explanation": f"Error evaluating answer: {str(error)}",
+            "score": 0.0,
+        }
+
+    def _grading_request(self, question_data: dict, user_answer: dict):
+        """
+        Grade locally when the type allows it. Returns ``(result, None)`` for
+        a finished grade, or ``(None, grading)`` with the LLM messages, tier
+        and single-flight key.
+        """
+        from langchain_core.messages import HumanMessage
 
         base64_str = ""
         mime_type = ""
 
-        if "image" in user_answer:
+        if isinstance(user_answer, dict) and "image" in user_answer:
             base64_str = user_answer["image"]
             mime_type = self._get_media_type(base64_str)
             if mime_type not in ["image/png", "image/jpeg", "image/gif", "image/webp"]:
@@ -297,7 +1570,7 @@ class LLMService:
                     "is_correct": False,
                     "explanation": "Unsupported image format. Supported formats are: png, jpeg, gif, webp.",
                     "score": 0.0,
-                }
+                }, None
 
         processed_user_answer = self._preprocess_answer(
             user_answer, question_data["type"]
@@ -313,16 +1586,17 @@ class LLMService:
             "sequence",
             "match_the_following",
         ]:
-            is_correct = self._basic_string_match(
-                processed_user_answer, processed_correct_answer, question_data["type"]
-            )
+            with metrics.timed("grade_local", question_type=question_data["type"]):
+                is_correct = self._basic_string_match(
+                    processed_user_answer, processed_correct_answer, question_data["type"]
+                )
             return {
                 "is_correct": is_correct,
                 "explanation": self._get_explanation(
                     is_correct, question_data["type"], processed_correct_answer
                 ),
                 "score": 1.0 if is_correct else 0.0,
-            }
+            }, None
 
         messages = []
 
@@ -355,26 +1629,37 @@ class LLMService:
         - For code questions: Check logic, syntax, and functional correctness.
         - For diagram questions: Compare the user's image to the correct answer for structure, proportions, and accuracy.
         - For long quizzes (text, text + image, or only image): Evaluate textual accuracy, image correctness (if applicable), and overall relevance. Ensure the user's response fully addresses the question requirements.
+        """
 
+        if self.grade_short_explanations:
+            explanation = "Leave empty if the answer is correct, otherwise one short sentence on what is wrong."
+        else:
+            explanation = "Brief explanation of why the answer is correct/incorrect, addressing both text and image as needed."
+        structured = self._use_structured()
+        if structured:
+            evaluation_text += f"""
+        Give is_correct, a score between 0 and 1 and the explanation: {explanation}
+        """
+        else:
+            evaluation_text += f"""
         Return your evaluation in this JSON format:
         {{
             "is_correct": true/false,
-            "explanation": "Brief explanation of why the answer is correct/incorrect, addressing both text and image as needed.",
+            "explanation": "{explanation}",
             "score": numerical_score_between_0_and_1
         }}
         """
 
         messages.append(HumanMessage(content=evaluation_text))
 
-        try:
-            response = self.llm.invoke(messages)
-            return self.output_parser.parse(response.content)
-        except Exception as e:
-            return {
-                "is_correct": False,
-                "explanation": f"Error evaluating answer: {str(e)}",
-                "score": 0.0,
-            }
+        # Stored questions carry no difficulty, so grading is routed by type
+        tier = self.model_routes.select("grade", question_data["type"])
+        return None, {
+            "messages": messages,
+            "tier": tier,
+            "schema": grade_schema(self.grade_short_explanations) if structured else None,
+            "key": self._request_key("grade", tier, evaluation_text, base64_str),
+        }
 
     def _get_explanation(
         self, is_correct: bool, question_type: str, correct_answer: any
@@ -499,9 +1784,10 @@ class LLMService:
                 return answer.strip().lower()
             return answer
 
-        elif "image" in answer:
+        elif isinstance(answer, dict) and "image" in answer:
+            # The image is sent as its own message part
             del answer["image"]
-            del answer["image_data"]
+            answer.pop("image_data", None)
             return answer
 
         return answer
@@ -587,18 +1873,24 @@ class LLMService:
 
     def calculate_quiz_score(self, evaluations: List[dict]) -> dict:
         """
-        Calculate overall quiz score and rank
+        Calculate overall quiz score and rank; answers left ungraded by the
+        deadline do not count against it
         """
         total_questions = len(evaluations)
+        timed_out = sum(1 for eval in evaluations if eval.get("timed_out"))
+        graded = total_questions - timed_out
         correct_answers = sum(1 for eval in evaluations if eval["is_correct"])
-        score_percentage = (correct_answers / total_questions) * 100
+        score_percentage = (correct_answers / graded) * 100 if graded else 0.0
 
-        return {
+        score = {
             "total_questions": total_questions,
             "correct_answers": correct_answers,
             "score_percentage": round(score_percentage, 2),
             "rank": self._determine_rank(score_percentage),
         }
+        if timed_out:
+            score["timed_out"] = timed_out
+        return score
 
     def _determine_rank(self, percentage: float) -> str:
         """
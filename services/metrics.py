@@ -0,0 +1,317 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+import bisect
+import contextvars
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Labels attached to metrics recorded deeper in the call stack (e.g. the
+# question type being generated when the provider call is timed)
+_labels = contextvars.ContextVar("metric_labels", default={})
+# Per-request list of (stage, seconds) used for the Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# Per-request LLM token total, billed against the client's quota
+_request_tokens = contextvars.ContextVar("request_tokens", default=None)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts, then +Inf count, sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f"{self.name}_bucket{_format_labels(key + (('le', le),))} {cumulative}"
+                    )
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, documentation, buckets))
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        """Add a callback producing extra exposition lines at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                lines.append(f"# collector error: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "quiz_stage_duration_seconds", "Time spent in each processing stage"
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by endpoint"
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "llm_prompt_tokens_total", "Prompt tokens sent to LLM providers"
+)
+COMPLETION_TOKENS = REGISTRY.counter(
+    "llm_completion_tokens_total", "Completion tokens returned by LLM providers"
+)
+LLM_CALLS = REGISTRY.counter("llm_calls_total", "LLM calls by provider and outcome")
+TIER_ESCALATIONS = REGISTRY.counter(
+    "llm_tier_escalations_total", "Calls retried on the standard tier, by tier and reason"
+)
+SINGLE_FLIGHT = REGISTRY.counter(
+    "llm_single_flight_total", "Coalesced LLM requests by operation and role"
+)
+CACHE_LOOKUPS = REGISTRY.counter("cache_lookups_total", "Cache lookups by cache and result")
+LLM_PARSES = REGISTRY.counter(
+    "llm_parse_total", "Parsed LLM replies by operation, output mode and outcome"
+)
+LLM_HTTP_REQUESTS = REGISTRY.counter(
+    "llm_http_requests_total", "Provider HTTP requests by host and connection (new or reused)"
+)
+LLM_DEADLINES = REGISTRY.counter(
+    "llm_deadline_exceeded_total", "LLM calls abandoned at the request deadline, by provider and operation"
+)
+
+
+def current_labels() -> dict:
+    return _labels.get()
+
+
+@contextmanager
+def label_context(**labels):
+    """Attach labels to metrics recorded inside this block"""
+    token = _labels.set({**_labels.get(), **labels})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """Time a stage into the stage histogram and the Server-Timing list"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, **labels)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+class TokenTally:
+    """Tokens used by the LLM calls of one request, across threads and tasks"""
+
+    def __init__(self):
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, tokens: int):
+        with self._lock:
+            self.total += tokens
+
+
+@contextmanager
+def tally_tokens():
+    """Count the LLM tokens used inside this block"""
+    tally = TokenTally()
+    token = _request_tokens.set(tally)
+    try:
+        yield tally
+    finally:
+        _request_tokens.reset(token)
+
+
+def record_tokens(provider: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+    labels = {
+        "provider": provider,
+        "question_type": current_labels().get("question_type", "none"),
+        "operation": current_labels().get("operation", "none"),
+        "tier": current_labels().get("tier", "standard"),
+        "output_mode": current_labels().get("output_mode", "prompt"),
+    }
+    if prompt_tokens:
+        PROMPT_TOKENS.inc(prompt_tokens, **labels)
+    if completion_tokens:
+        COMPLETION_TOKENS.inc(completion_tokens, **labels)
+    tally = _request_tokens.get()
+    if tally is not None:
+        tally.add((prompt_tokens or 0) + (completion_tokens or 0))
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_http_request(host: str, new_connection: bool):
+    LLM_HTTP_REQUESTS.inc(host=host, connection="new" if new_connection else "reused")
+
+
+def record_deadline(provider: str):
+    """Count a provider call given up on because the request deadline passed"""
+    LLM_DEADLINES.inc(provider=provider, operation=current_labels().get("operation", "none"))
+
+
+def record_parse(outcome: str):
+    """Count a parsed (``ok``/``salvaged``) or unparseable (``failed``) reply"""
+    LLM_PARSES.inc(
+        operation=current_labels().get("operation", "none"),
+        output_mode=current_labels().get("output_mode", "prompt"),
+        outcome=outcome,
+    )
+
+
+def run_in_context(fn: Callable, *args, **kwargs):
+    """Wrap ``fn`` so an executor thread sees the caller's labels and timings"""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args, **kwargs)
+
+
+def init_app(app, server_timing: bool = False):
+    """Record request latency and optionally emit Server-Timing headers"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+        _request_timings.set([])
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "_metrics_start", None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(
+            elapsed,
+            endpoint=request.endpoint or "unknown",
+            method=request.method,
+            status=str(response.status_code),
+        )
+        if server_timing or request.headers.get("X-Server-Timing"):
+            response.headers["Server-Timing"] = _server_timing(elapsed)
+        return response
+
+
+def _server_timing(elapsed: float) -> str:
+    entries = [
+        f"{stage};dur={seconds * 1000:.1f}"
+        for stage, seconds in (_request_timings.get() or [])
+    ]
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def aiohttp_middleware(server_timing: bool = False, skip_routes=()):
+    """aiohttp counterpart of ``init_app``; requests to ``skip_routes`` are not timed"""
+    from aiohttp import web
+
+    @web.middleware
+    async def middleware(request, handler):
+        route = request.match_info.route
+        if route.name in skip_routes:
+            return await handler(request)
+
+        start = time.perf_counter()
+        _request_timings.set([])
+        status = "500"
+        try:
+            response = await handler(request)
+            status = str(response.status)
+        except web.HTTPException as e:
+            status = str(e.status)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUEST_SECONDS.observe(
+                elapsed,
+                endpoint=route.name or "unknown",
+                method=request.method,
+                status=status,
+            )
+        if server_timing or request.headers.get("X-Server-Timing"):
+            response.headers["Server-Timing"] = _server_timing(elapsed)
+        return response
+
+    return middleware
@@ -0,0 +1,65 @@
+from typing import Dict, List, Optional, Tuple
+
+# Model used for each tier, per provider
+TIER_MODELS = {
+    "standard": {"openai": "gpt-4o", "gemini": "gemini-1.5-flash"},
+    "fast": {"openai": "gpt-4o-mini", "gemini": "gemini-1.5-flash-8b"},
+}
+
+# (operation, question_type, difficulty) -> tier; "*" matches anything.
+# Simple generation and one-word grading go to the fast tier.
+DEFAULT_ROUTES = {
+    ("generate", "true_false", "*"): "fast",
+    ("generate", "mcq", "easy"): "fast",
+    ("generate", "mcq", "medium"): "fast",
+    ("generate", "fill_in_blank", "*"): "fast",
+    ("grade", "fill_in_blank", "*"): "fast",
+}
+
+
+class ModelRoutingTable:
+    """Pick a model tier for an operation, question type and difficulty"""
+
+    def __init__(
+        self,
+        routes: Optional[Dict[Tuple[str, str, str], str]] = None,
+        default_tier: str = "standard",
+    ):
+        self.routes = dict(DEFAULT_ROUTES if routes is None else routes)
+        self.default_tier = default_tier
+
+    @classmethod
+    def parse(cls, spec: str, default_tier: str = "standard") -> "ModelRoutingTable":
+        """
+        Build a table from ``operation:question_type:difficulty=tier`` entries
+        separated by commas, e.g. ``generate:mcq:*=fast,grade:short:easy=fast``.
+        """
+        routes = {}
+        for entry in spec.split(","):
+            entry = entry.strip()
+            if not entry:
+                continue
+            key, tier = entry.split("=")
+            parts = [part.strip() or "*" for part in key.split(":")]
+            parts += ["*"] * (3 - len(parts))
+            routes[tuple(parts[:3])] = tier.strip()
+        return cls(routes, default_tier)
+
+    def tiers(self) -> List[str]:
+        return sorted(set(self.routes.values()) | {self.default_tier})
+
+    def select(self, operation: str, question_type: str = "*", difficulty: str = "*") -> str:
+        """Return the tier of the most specific matching route"""
+        best_tier = self.default_tier
+        best_specificity = -1
+        for (route_op, route_type, route_difficulty), tier in self.routes.items():
+            if route_op not in ("*", operation):
+                continue
+            if route_type not in ("*", question_type):
+                continue
+            if route_difficulty not in ("*", difficulty):
+                continue
+            specificity = (route_op != "*") + (route_type != "*") + (route_difficulty != "*")
+            if specificity > best_specificity:
+                best_tier, best_specificity = tier, specificity
+        return best_tier
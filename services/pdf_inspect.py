@@ -0,0 +1,33 @@
+PDF_SIGNATURE = b"%PDF-"
+
+
+def count_pdf_pages(stream) -> int:
+    """
+    Read the page count of a PDF without extracting any text.
+
+    Only the trailer, the cross-reference table and the root of the page
+    tree are parsed, so the cost does not grow with the document. The stream
+    is rewound afterwards. Raises ValueError for anything that is not a
+    readable PDF.
+    """
+    from PyPDF2 import PdfReader
+
+    position = stream.tell()
+    try:
+        # The signature may follow a little leading junk
+        if PDF_SIGNATURE not in stream.read(1024):
+            raise ValueError("Invalid file format. File must be PDF.")
+        stream.seek(position)
+
+        reader = PdfReader(stream, strict=False)
+        try:
+            return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+        except (KeyError, TypeError, ValueError):
+            # Malformed page tree root: count the leaves instead
+            return len(reader.pages)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Could not read PDF: {str(e)}")
+    finally:
+        stream.seek(position)
@@ -0,0 +1,384 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from models.models import PregeneratedQuizModel, Session
+from services import metrics
+import threading
+import time
+
+PREGEN_QUIZZES = metrics.REGISTRY.counter(
+    "pregen_quizzes_total", "Pre-generated quizzes by outcome (generated, served, expired)"
+)
+PREGEN_TOKENS = metrics.REGISTRY.counter(
+    "pregen_tokens_total", "LLM tokens of pre-generated quizzes by outcome"
+)
+
+
+class DemandTracker:
+    """Request counts per generation key that decay with a half-life"""
+
+    def __init__(self, half_life_seconds: float, max_keys: int = 1000):
+        self.half_life_seconds = half_life_seconds
+        self.max_keys = max_keys
+        self._entries: Dict[str, list] = {}  # key -> [params, score, updated]
+        self._lock = threading.Lock()
+
+    def _decayed(self, entry: list, now: float) -> float:
+        return entry[1] * 0.5 ** ((now - entry[2]) / self.half_life_seconds)
+
+    def record(self, key: str, params: dict, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_keys:
+                    coldest = min(self._entries, key=lambda k: self._decayed(self._entries[k], now))
+                    del self._entries[coldest]
+                entry = self._entries[key] = [params, 0.0, now]
+            entry[1] = self._decayed(entry, now) + 1
+            entry[2] = now
+
+    def hottest(
+        self, n: int, min_score: float = 0, now: Optional[float] = None
+    ) -> List[Tuple[str, dict, float]]:
+        """The ``n`` keys with the highest current demand of at least ``min_score``"""
+        now = time.time() if now is None else now
+        with self._lock:
+            scored = [
+                (key, entry[0], self._decayed(entry, now))
+                for key, entry in self._entries.items()
+            ]
+        scored = [item for item in scored if item[2] >= min_score]
+        return sorted(scored, key=lambda item: item[2], reverse=True)[:n]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PregenerationWorker(threading.Thread):
+    """
+    Daemon thread that stocks quizzes for the most requested generation keys.
+
+    Topic requests (not PDF uploads) are counted per normalized key. When no
+    request has arrived for ``idle_seconds``, the worker tops up the
+    ``top_keys`` hottest keys to ``stock_per_key`` ready quizzes, spending at
+    most ``daily_token_budget`` tokens per UTC day. A matching request takes
+    a stocked quiz instead of waiting on the LLM; stock older than
+    ``max_age_seconds`` is discarded.
+
+    Stock counts per key are kept in memory and re-read from the database
+    every interval, so requests for unstocked keys never touch it. Each
+    stocked quiz for a key is asked to differ from the ones already stocked.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable,
+        interval_seconds: float = 60,
+        idle_seconds: float = 30,
+        top_keys: int = 10,
+        stock_per_key: int = 2,
+        min_requests: float = 3,
+        daily_token_budget: Optional[int] = None,
+        max_age_seconds: float = 72 * 3600,
+        half_life_seconds: float = 72 * 3600,
+    ):
+        super().__init__(name="quiz-pregeneration", daemon=True)
+        self.service_factory = service_factory
+        self.interval_seconds = interval_seconds
+        self.idle_seconds = idle_seconds
+        self.top_keys = top_keys
+        self.stock_per_key = stock_per_key
+        self.min_requests = min_requests
+        self.daily_token_budget = daily_token_budget
+        self.max_age_seconds = max_age_seconds
+        self.demand = DemandTracker(half_life_seconds)
+        self._counts: Dict[str, int] = {}  # key -> stocked quizzes
+        self._last_request = 0.0
+        self._budget = (None, 0)  # (UTC day, tokens used)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.tokens_spent = 0
+        self.tokens_served = 0
+        self.tokens_expired = 0
+
+    def take(
+        self, subject: str, topic: str, question_type, difficulty: str, num_questions: int
+    ) -> Optional[List[Dict]]:
+        """Record demand for a quiz and return a stocked copy, or None"""
+        params = {
+            "subject": subject,
+            "topic": topic,
+            "question_type": list(question_type),
+            "difficulty": difficulty,
+            "num_questions": int(num_questions),
+        }
+        key = self._key(params)
+        self._last_request = time.monotonic()
+        self.demand.record(key, params)
+
+        with self._lock:
+            stocked = self._counts.get(key, 0) > 0
+        questions, tokens = self._pop(key) if stocked else (None, 0)
+        hit = questions is not None
+        metrics.record_cache_lookup("pregenerated", hit)
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.tokens_served += tokens
+            else:
+                self.misses += 1
+        if hit:
+            PREGEN_QUIZZES.inc(outcome="served")
+            PREGEN_TOKENS.inc(tokens, outcome="served")
+        return questions
+
+    def _key(self, params: dict) -> str:
+        # The same normalization single-flight uses, so equivalent requests match
+        return self.service_factory()._generation_key(
+            params["subject"],
+            params["topic"],
+            params["question_type"],
+            params["difficulty"],
+            params["num_questions"],
+            "",
+        )
+
+    def _cutoff(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+
+    def _pop(self, key: str):
+        session = Session()
+        try:
+            while True:
+                quiz = (
+                    session.query(PregeneratedQuizModel)
+                    .filter(
+                        PregeneratedQuizModel.generation_key == key,
+                        PregeneratedQuizModel.created_at >= self._cutoff(),
+                    )
+                    .order_by(PregeneratedQuizModel.id)
+                    .first()
+                )
+                if quiz is None:
+                    self._count(key, None)
+                    return None, 0
+                questions, tokens = quiz.get_questions(), quiz.tokens
+                # Another process may have served the same row first
+                deleted = (
+                    session.query(PregeneratedQuizModel)
+                    .filter_by(id=quiz.id)
+                    .delete(synchronize_session=False)
+                )
+                session.commit()
+                if deleted:
+                    self._count(key, -1)
+                    return questions, tokens
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _count(self, key: str, change: Optional[int]):
+        """Adjust the in-memory stock of a key; None marks it empty"""
+        with self._lock:
+            count = 0 if change is None else self._counts.get(key, 0) + change
+            if count > 0:
+                self._counts[key] = count
+            else:
+                self._counts.pop(key, None)
+
+    def refresh_counts(self) -> Dict[str, int]:
+        """Re-read the stock from the database, which other processes share"""
+        counts = self.stock()
+        with self._lock:
+            self._counts = dict(counts)
+        return counts
+
+    def is_idle(self) -> bool:
+        return time.monotonic() - self._last_request >= self.idle_seconds
+
+    def budget_left(self) -> Optional[int]:
+        """Tokens left in today's pre-generation budget; None when unlimited"""
+        if not self.daily_token_budget:
+            return None
+        day, used = self._budget
+        if day != datetime.utcnow().date():
+            return self.daily_token_budget
+        return self.daily_token_budget - used
+
+    def _spend(self, tokens: int):
+        today = datetime.utcnow().date()
+        with self._lock:
+            day, used = self._budget
+            self._budget = (today, (used if day == today else 0) + tokens)
+            self.tokens_spent += tokens
+            self.generated += 1
+        PREGEN_QUIZZES.inc(outcome="generated")
+        PREGEN_TOKENS.inc(tokens, outcome="generated")
+
+    def stock(self) -> Dict[str, int]:
+        """Ready quizzes per generation key"""
+        session = Session()
+        try:
+            rows = (
+                session.query(PregeneratedQuizModel.generation_key, func.count())
+                .filter(PregeneratedQuizModel.created_at >= self._cutoff())
+                .group_by(PregeneratedQuizModel.generation_key)
+                .all()
+            )
+            return dict(rows)
+        finally:
+            session.close()
+
+    def _stocked_questions(self, key: str) -> List[Dict]:
+        """The questions of the quizzes stocked for a key"""
+        session = Session()
+        try:
+            quizzes = (
+                session.query(PregeneratedQuizModel)
+                .filter(
+                    PregeneratedQuizModel.generation_key == key,
+                    PregeneratedQuizModel.created_at >= self._cutoff(),
+                )
+                .order_by(PregeneratedQuizModel.id)
+                .all()
+            )
+            return [q for quiz in quizzes for q in quiz.get_questions()]
+        finally:
+            session.close()
+
+    def _store(self, key: str, questions: List[Dict], tokens: int):
+        session = Session()
+        try:
+            quiz = PregeneratedQuizModel(generation_key=key, tokens=tokens)
+            quiz.set_questions(questions)
+            session.add(quiz)
+            session.commit()
+            self._count(key, 1)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def expire(self) -> int:
+        """Delete stock older than the maximum age; returns how many"""
+        session = Session()
+        try:
+            stale = session.query(PregeneratedQuizModel).filter(
+                PregeneratedQuizModel.created_at < self._cutoff()
+            )
+            count, tokens = stale.with_entities(
+                func.count(), func.coalesce(func.sum(PregeneratedQuizModel.tokens), 0)
+            ).one()
+            if count:
+                stale.delete(synchronize_session=False)
+                session.commit()
+                with self._lock:
+                    self.tokens_expired += tokens
+                PREGEN_QUIZZES.inc(count, outcome="expired")
+                PREGEN_TOKENS.inc(tokens, outcome="expired")
+            return count
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def run_once(self) -> dict:
+        expired = self.expire()
+        generated = 0
+        stock = self.refresh_counts()
+        for key, params, _ in self.demand.hottest(self.top_keys, self.min_requests):
+            while stock.get(key, 0) < self.stock_per_key:
+                budget = self.budget_left()
+                # Live traffic and the budget are re-checked before every call
+                if not self.is_idle() or (budget is not None and budget <= 0):
+                    return {"generated": generated, "expired": expired}
+                # Without this every quiz stocked for a key would be the same
+                service = self.service_factory()
+                stocked = service.question_stems(self._stocked_questions(key))
+                try:
+                    with metrics.tally_tokens() as tally:
+                        questions = service.generate_questions(
+                            context="",
+                            exclude=stocked or None,
+                            variant=stock.get(key, 0),
+                            **params,
+                        )
+                except Exception as e:
+                    print(f"Error pre-generating quiz: {str(e)}")
+                    return {"generated": generated, "expired": expired}
+                if not questions:
+                    break
+                self._store(key, questions, tally.total)
+                self._spend(tally.total)
+                stock[key] = stock.get(key, 0) + 1
+                generated += 1
+        return {"generated": generated, "expired": expired}
+
+    def run(self):
+        try:
+            self.refresh_counts()
+        except Exception as e:
+            print(f"Error reading pre-generated stock: {str(e)}")
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error in quiz pre-generation: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "generated": self.generated,
+            "tokens_spent": self.tokens_spent,
+            "tokens_served": self.tokens_served,
+            "tokens_expired": self.tokens_expired,
+            "budget_left": self.budget_left(),
+            "tracked_keys": len(self.demand),
+        }
+
+    def collect_metrics(self) -> List[str]:
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE pregen_stock_quizzes gauge",
+            f"pregen_stock_quizzes {sum(self.stock().values())}",
+            "# TYPE pregen_tracked_keys gauge",
+            f"pregen_tracked_keys {snapshot['tracked_keys']}",
+        ]
+        if snapshot["hit_rate"] is not None:
+            lines += ["# TYPE pregen_hit_rate gauge", f"pregen_hit_rate {snapshot['hit_rate']}"]
+        return lines
+
+
+def start_pregeneration_worker(config, service_factory: Callable) -> Optional[PregenerationWorker]:
+    """Start the background pre-generation worker if the config enables it"""
+    if not config.PREGEN_ENABLED:
+        return None
+
+    worker = PregenerationWorker(
+        service_factory,
+        interval_seconds=config.PREGEN_INTERVAL_SECONDS,
+        idle_seconds=config.PREGEN_IDLE_SECONDS,
+        top_keys=config.PREGEN_TOP_KEYS,
+        stock_per_key=config.PREGEN_STOCK_PER_KEY,
+        min_requests=config.PREGEN_MIN_REQUESTS,
+        daily_token_budget=config.PREGEN_DAILY_TOKEN_BUDGET or None,
+        max_age_seconds=config.PREGEN_MAX_AGE_HOURS * 3600,
+        half_life_seconds=config.PREGEN_DEMAND_HALF_LIFE_HOURS * 3600,
+    )
+    metrics.REGISTRY.register_collector(worker.collect_metrics)
+    worker.start()
+    return worker
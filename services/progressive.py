@@ -0,0 +1,137 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from models.models import SessionModel, Session
+from services import metrics
+import asyncio
+import threading
+import time
+
+GENERATING = "generating"
+READY = "ready"
+FAILED = "failed"
+
+
+def _question_text(question: Dict) -> str:
+    return " ".join(str(question.get("question", "")).lower().split())
+
+
+class ProgressiveQuizzes:
+    """
+    Quizzes that are served before all of their questions exist.
+
+    A quiz is stored with its first questions and the number expected; the
+    rest are generated in the background and appended in one write. Readers
+    wait only for the questions they need. An append in this process wakes
+    them at once, and the database is polled in case the writer runs in
+    another process.
+    """
+
+    def __init__(self, poll_seconds: float = 0.5, stale_after_seconds: Optional[float] = None):
+        self.poll_seconds = poll_seconds
+        self.stale_after_seconds = stale_after_seconds
+        self._condition = threading.Condition()
+
+    def create(self, questions: List[Dict], expected: int) -> str:
+        """Store a quiz holding its first questions; returns its id"""
+        session = Session()
+        try:
+            quiz = SessionModel(
+                expected_questions=expected,
+                generation_status=GENERATING if len(questions) < expected else READY,
+            )
+            quiz.set_questions(questions)
+            session.add(quiz)
+            with metrics.timed("db_commit"):
+                session.commit()
+            return quiz.id
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def finish(self, quiz_id: str, questions: List[Dict], failed: bool = False):
+        """
+        Append the remaining questions and mark the quiz complete. Repeats
+        of questions already served are dropped, so the quiz may end up a
+        little shorter than expected.
+        """
+        session = Session()
+        try:
+            quiz = session.query(SessionModel).filter_by(id=quiz_id).first()
+            if quiz is None:
+                return
+            existing = quiz.get_questions()
+            seen = {_question_text(question) for question in existing}
+            for question in questions:
+                text = _question_text(question)
+                if text not in seen:
+                    seen.add(text)
+                    existing.append(question)
+            quiz.set_questions(existing)
+            quiz.generation_status = FAILED if failed else READY
+            quiz.expected_questions = len(existing)
+            with metrics.timed("db_commit"):
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        with self._condition:
+            self._condition.notify_all()
+
+    def fill(self, quiz_id: str, generate: Callable[[int], List[Dict]], remaining: int):
+        """Generate the remaining questions and append them to the quiz"""
+        try:
+            questions = generate(remaining) if remaining > 0 else []
+        except Exception as e:
+            print(f"Error generating remaining questions for quiz {quiz_id}: {str(e)}")
+            self.finish(quiz_id, [], failed=True)
+            return
+        self.finish(quiz_id, questions)
+
+    def load(self, quiz_id: str) -> Tuple[Optional[List[Dict]], Optional[dict]]:
+        """A quiz's current questions and progress; (None, None) if missing"""
+        session = Session()
+        try:
+            quiz = session.query(SessionModel).filter_by(id=quiz_id).first()
+            if quiz is None:
+                return None, None
+            return quiz.get_questions(), quiz.progress(self.stale_after_seconds)
+        finally:
+            session.close()
+
+    def _done_waiting(self, questions, progress, count: int) -> bool:
+        return (
+            questions is None
+            or len(questions) >= count
+            or progress is None
+            or progress["status"] != GENERATING
+        )
+
+    def wait_for(self, quiz_id: str, count: int, timeout: float):
+        """
+        Wait until the quiz has ``count`` questions, finished generating or
+        ``timeout`` passed. Returns the latest (questions, progress).
+        """
+        deadline = time.monotonic() + timeout
+        with metrics.timed("progressive_wait"):
+            while True:
+                questions, progress = self.load(quiz_id)
+                remaining = deadline - time.monotonic()
+                if self._done_waiting(questions, progress, count) or remaining <= 0:
+                    return questions, progress
+                with self._condition:
+                    self._condition.wait(min(remaining, self.poll_seconds))
+
+    async def wait_for_async(self, quiz_id: str, count: int, timeout: float, executor=None):
+        """Event-loop counterpart of ``wait_for``, reading on ``executor``"""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + timeout
+        with metrics.timed("progressive_wait"):
+            while True:
+                questions, progress = await loop.run_in_executor(executor, self.load, quiz_id)
+                remaining = deadline - time.monotonic()
+                if self._done_waiting(questions, progress, count) or remaining <= 0:
+                    return questions, progress
+                await asyncio.sleep(min(remaining, self.poll_seconds))
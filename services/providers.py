@@ -0,0 +1,541 @@
+from typing import Any, Callable, List, Optional
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    TimeoutError as FutureTimeoutError,
+    wait,
+)
+from services.deadlines import DeadlineExceeded
+from services.http_pool import HttpPool
+from services.rate_limiter import RateGovernor, RateLimitExceeded
+from services import deadlines, metrics
+import asyncio
+import os
+import threading
+import time
+
+
+def create_chat_model(
+    provider: str,
+    timeout: Optional[float] = None,
+    model: Optional[str] = None,
+    http_pool: Optional[HttpPool] = None,
+):
+    """
+    Build the LangChain chat model for a provider name. OpenAI models use
+    ``http_pool``'s shared clients when given; Gemini's client keeps its
+    own gRPC channel.
+    """
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model or "gemini-1.5-flash",
+            google_api_key=os.getenv("GOOGLE_API_KEY"),
+            temperature=0,
+            timeout=timeout,
+        )
+
+    from langchain_openai import ChatOpenAI
+
+    if http_pool is None:
+        return ChatOpenAI(model=model or "gpt-4o", temperature=0, timeout=timeout)
+    return ChatOpenAI(
+        model=model or "gpt-4o",
+        temperature=0,
+        timeout=http_pool.timeout(timeout),
+        http_client=http_pool.client,
+        http_async_client=http_pool.async_client,
+    )
+
+
+class ProviderError(Exception):
+    """
+    Raised when every provider backend failed for a call. ``errors`` holds
+    one message per backend tried and ``throttled`` the RateLimitExceeded
+    errors among them.
+    """
+
+    def __init__(self, message: str, errors: Optional[List[str]] = None, throttled=None):
+        super().__init__(message)
+        self.errors = errors if errors is not None else [message]
+        self.throttled = throttled or []
+
+
+class _Outcome:
+    """
+    Settles a call's outcome once: either the thread running it records
+    the result, or a waiter that gave up on it records the timeout
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._settled = False
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+
+class ProviderBackend:
+    """
+    A named chat model plus rolling latency and error statistics.
+
+    Pass either a ready ``llm`` or a ``factory`` that builds it on first use.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        llm: Any = None,
+        factory: Optional[Callable[[], Any]] = None,
+        window: int = 200,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30.0,
+        governor: Optional[RateGovernor] = None,
+    ):
+        self.name = name
+        self._llm = llm
+        self._factory = factory
+        self.governor = governor
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._structured = {}
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._factory()
+        return self._llm
+
+    def structured(self, schema: dict):
+        """
+        The chat model bound to a JSON schema through its native structured
+        output, built once per schema title. Replies are
+        ``{"raw", "parsed", "parsing_error"}`` dicts.
+        """
+        runnable = self._structured.get(schema["title"])
+        if runnable is None:
+            # Resolved outside the lock: building a lazy client takes it too
+            llm = self.llm
+            with self._lock:
+                runnable = self._structured.get(schema["title"])
+                if runnable is None:
+                    runnable = self._structured[schema["title"]] = llm.with_structured_output(
+                        schema, include_raw=True, strict=True
+                    )
+        return runnable
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.calls += 1
+            self.consecutive_failures = 0
+            self._latencies.append(latency)
+            self._outcomes.append(True)
+
+    def record_failure(self, timed_out: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            if timed_out:
+                self.timeouts += 1
+            self.consecutive_failures += 1
+            self._outcomes.append(False)
+            if self.consecutive_failures >= self.failure_threshold:
+                self.cooldown_until = time.monotonic() + self.cooldown_seconds
+
+    def is_cooling_down(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+
+    def score(self) -> float:
+        """Lower is better: median latency inflated by the recent error rate"""
+        median = self.latency_percentile(50)
+        if median is None:
+            return float("inf")
+        return median * (1 + 4 * self.error_rate())
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "error_rate": round(self.error_rate(), 4),
+            "p50_seconds": self.latency_percentile(50),
+            "p95_seconds": self.latency_percentile(95),
+            "cooling_down": self.is_cooling_down(),
+            "rate_limit": self.governor.snapshot() if self.governor else None,
+        }
+
+
+class ProviderRouter:
+    """
+    Send a call to the best provider backend, failing over on errors or
+    timeouts and optionally hedging with a second backend.
+
+    A call only succeeds once ``parse`` accepts the response, so an
+    unparseable answer from one provider is treated like an error. Calls
+    are cut to the request deadline, if any; running out of it raises
+    ``DeadlineExceeded`` instead of failing over.
+    """
+
+    def __init__(
+        self,
+        backends: List[ProviderBackend],
+        timeout: Optional[float] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        hedge_min_delay: float = 1.0,
+        max_workers: int = 16,
+    ):
+        if not backends:
+            raise ValueError("At least one provider backend is required")
+        self.backends = backends
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-provider"
+        )
+
+    def ordered_backends(self) -> List[ProviderBackend]:
+        """Healthy, fast backends first; configured order breaks ties"""
+        return [
+            backend
+            for _, backend in sorted(
+                enumerate(self.backends),
+                key=lambda item: (item[1].is_cooling_down(), item[1].score(), item[0]),
+            )
+        ]
+
+    def _finish(self, backend: ProviderBackend, response, estimated_tokens: int, parse: Callable):
+        """
+        Account for a provider response and parse its content; structured
+        replies are passed to ``parse`` whole
+        """
+        structured = isinstance(response, dict)
+        message = response.get("raw") if structured else response
+        usage = getattr(message, "usage_metadata", None) or {}
+        metrics.record_tokens(
+            backend.name, usage.get("input_tokens"), usage.get("output_tokens")
+        )
+        if backend.governor is not None:
+            backend.governor.settle(estimated_tokens, usage.get("total_tokens"))
+        with metrics.timed("parse", provider=backend.name):
+            return parse(response if structured else response.content)
+
+    @staticmethod
+    def _estimate_tokens(backend: ProviderBackend, messages) -> int:
+        """Token estimate for the backend's tokens-per-minute limit; 0 without one"""
+        if backend.governor is None or backend.governor.token_bucket is None:
+            return 0
+        return backend.governor.estimate_tokens(messages)
+
+    def _call(
+        self,
+        backend: ProviderBackend,
+        messages,
+        parse: Callable,
+        schema=None,
+        outcome: Optional[_Outcome] = None,
+    ):
+        outcome = outcome or _Outcome()
+        estimated_tokens = self._estimate_tokens(backend, messages)
+        if backend.governor is not None and backend.governor.enabled:
+            backend.governor.acquire(
+                estimated_tokens, max_wait=deadlines.clamp(backend.governor.max_wait_seconds)
+            )
+
+        tier = metrics.current_labels().get("tier", "standard")
+        start = time.perf_counter()
+        try:
+            with metrics.timed("llm_call", provider=backend.name, tier=tier):
+                model = backend.llm if schema is None else backend.structured(schema)
+                response = model.invoke(messages)
+            result = self._finish(backend, response, estimated_tokens, parse)
+        except Exception:
+            # A waiter that timed out on this call has already recorded it
+            if outcome.claim():
+                backend.record_failure()
+                metrics.LLM_CALLS.inc(provider=backend.name, tier=tier, outcome="error")
+            raise
+        if outcome.claim():
+            backend.record_success(time.perf_counter() - start)
+            metrics.LLM_CALLS.inc(provider=backend.name, tier=tier, outcome="success")
+        return result
+
+    async def _acall(self, backend: ProviderBackend, messages, parse: Callable, schema=None):
+        estimated_tokens = 0
+        if backend.governor is not None and backend.governor.token_bucket is not None:
+            # Tokenizing, and loading the encoding on first use, would block the event loop
+            estimated_tokens = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._estimate_tokens, backend, messages
+            )
+        if backend.governor is not None and backend.governor.enabled:
+            await backend.governor.acquire_async(
+                estimated_tokens, max_wait=deadlines.clamp(backend.governor.max_wait_seconds)
+            )
+
+        tier = metrics.current_labels().get("tier", "standard")
+        start = time.perf_counter()
+        try:
+            with metrics.timed("llm_call", provider=backend.name, tier=tier):
+                model = backend.llm if schema is None else backend.structured(schema)
+                response = await model.ainvoke(messages)
+            result = self._finish(backend, response, estimated_tokens, parse)
+        except Exception:
+            backend.record_failure()
+            metrics.LLM_CALLS.inc(provider=backend.name, tier=tier, outcome="error")
+            raise
+        backend.record_success(time.perf_counter() - start)
+        metrics.LLM_CALLS.inc(provider=backend.name, tier=tier, outcome="success")
+        return result
+
+    def _deadline_cut(self, timeout: Optional[float]) -> bool:
+        """Whether a call that ran out of ``timeout`` was cut by the request deadline"""
+        return timeout != self.timeout
+
+    def _deadline_exceeded(self, backends) -> DeadlineExceeded:
+        for backend in backends:
+            metrics.record_deadline(backend.name)
+        return DeadlineExceeded(
+            "Request deadline exceeded waiting for " + ", ".join(b.name for b in backends)
+        )
+
+    def _hedge_delay(self, backend: ProviderBackend, timeout: Optional[float] = None) -> float:
+        delay = max(self.hedge_min_delay, backend.latency_percentile(self.hedge_percentile) or 0.0)
+        return delay if timeout is None else min(delay, timeout)
+
+    def invoke(self, messages, parse: Callable, schema: Optional[dict] = None):
+        """
+        Call the best backend. With a ``schema`` the provider's structured
+        output is used and ``parse`` receives the structured reply.
+        """
+        backends = self.ordered_backends()
+        errors = []
+        throttled = []
+
+        if self.hedge and len(backends) > 1:
+            try:
+                return self._invoke_hedged(backends[0], backends[1], messages, parse, schema)
+            except ProviderError as e:
+                errors.extend(e.errors)
+                throttled.extend(e.throttled)
+                backends = backends[2:]
+
+        for backend in backends:
+            timeout = deadlines.clamp(self.timeout)
+            future = None
+            outcome = _Outcome()
+            try:
+                if timeout is None:
+                    return self._call(backend, messages, parse, schema)
+                future = self._executor.submit(
+                    metrics.run_in_context(self._call, backend, messages, parse, schema, outcome)
+                )
+                return future.result(timeout=timeout)
+            except DeadlineExceeded:
+                raise
+            except FutureTimeoutError:
+                if future is not None:
+                    # A running thread cannot be stopped; its result is discarded
+                    future.cancel()
+                # Claimed even when cut by the deadline, so the abandoned
+                # thread does not record the call later
+                settled = outcome.claim()
+                if self._deadline_cut(timeout):
+                    raise self._deadline_exceeded([backend])
+                if settled:
+                    backend.record_failure(timed_out=True)
+                errors.append(f"{backend.name}: timed out after {timeout}s")
+            except RateLimitExceeded as e:
+                throttled.append(e)
+                errors.append(f"{backend.name}: {str(e)}")
+            except Exception as e:
+                errors.append(f"{backend.name}: {str(e)}")
+
+        if throttled and len(throttled) == len(errors):
+            # Every backend was saturated locally; let the caller back off
+            raise min(throttled, key=lambda e: e.retry_after)
+        raise ProviderError("All LLM providers failed: " + "; ".join(errors), errors, throttled)
+
+    def _invoke_hedged(self, primary, secondary, messages, parse: Callable, schema=None):
+        started = time.monotonic()
+        timeout = deadlines.clamp(self.timeout)
+        outcomes = {}
+
+        def submit(backend):
+            outcome = _Outcome()
+            future = self._executor.submit(
+                metrics.run_in_context(self._call, backend, messages, parse, schema, outcome)
+            )
+            outcomes[future] = outcome
+            return future
+
+        def abandon():
+            # Running threads cannot be stopped; they must not record later
+            for future in pending:
+                future.cancel()
+                outcomes[future].claim()
+
+        pending = {submit(primary): primary}
+        done, _ = wait(pending, timeout=self._hedge_delay(primary, timeout))
+        if done and isinstance(next(iter(done)).exception(), DeadlineExceeded):
+            raise next(iter(done)).exception()
+        if not done or next(iter(done)).exception() is not None:
+            pending[submit(secondary)] = secondary
+
+        errors = []
+        throttled = []
+        while pending:
+            remaining = None
+            if timeout is not None:
+                remaining = max(0.0, timeout - (time.monotonic() - started))
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                settled = {}
+                for future, backend in pending.items():
+                    future.cancel()
+                    settled[backend] = outcomes[future].claim()
+                if self._deadline_cut(timeout):
+                    raise self._deadline_exceeded(pending.values())
+                for backend in pending.values():
+                    if settled[backend]:
+                        backend.record_failure(timed_out=True)
+                    errors.append(f"{backend.name}: timed out after {timeout}s")
+                break
+            for future in done:
+                backend = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    return future.result()
+                if isinstance(error, DeadlineExceeded):
+                    abandon()
+                    raise error
+                if isinstance(error, RateLimitExceeded):
+                    throttled.append(error)
+                errors.append(f"{backend.name}: {str(error)}")
+
+        raise ProviderError("; ".join(errors), errors, throttled)
+
+    async def ainvoke(self, messages, parse: Callable, schema: Optional[dict] = None):
+        """
+        Async ``invoke`` using the chat models' ``ainvoke``, so waiting on a
+        provider holds no thread. Timed-out and losing hedged calls are
+        cancelled rather than left running.
+        """
+        backends = self.ordered_backends()
+        errors = []
+        throttled = []
+
+        if self.hedge and len(backends) > 1:
+            try:
+                return await self._ainvoke_hedged(
+                    backends[0], backends[1], messages, parse, schema
+                )
+            except ProviderError as e:
+                errors.extend(e.errors)
+                throttled.extend(e.throttled)
+                backends = backends[2:]
+
+        for backend in backends:
+            timeout = deadlines.clamp(self.timeout)
+            try:
+                return await asyncio.wait_for(
+                    self._acall(backend, messages, parse, schema), timeout
+                )
+            except DeadlineExceeded:
+                raise
+            except asyncio.TimeoutError:
+                if self._deadline_cut(timeout):
+                    raise self._deadline_exceeded([backend])
+                backend.record_failure(timed_out=True)
+                errors.append(f"{backend.name}: timed out after {timeout}s")
+            except RateLimitExceeded as e:
+                throttled.append(e)
+                errors.append(f"{backend.name}: {str(e)}")
+            except Exception as e:
+                errors.append(f"{backend.name}: {str(e)}")
+
+        if throttled and len(throttled) == len(errors):
+            raise min(throttled, key=lambda e: e.retry_after)
+        raise ProviderError("All LLM providers failed: " + "; ".join(errors), errors, throttled)
+
+    async def _ainvoke_hedged(self, primary, secondary, messages, parse: Callable, schema=None):
+        started = time.monotonic()
+        timeout = deadlines.clamp(self.timeout)
+        pending = {
+            asyncio.ensure_future(self._acall(primary, messages, parse, schema)): primary
+        }
+        done, _ = await asyncio.wait(pending, timeout=self._hedge_delay(primary, timeout))
+        if done and isinstance(next(iter(done)).exception(), DeadlineExceeded):
+            raise next(iter(done)).exception()
+        if not done or next(iter(done)).exception() is not None:
+            pending[
+                asyncio.ensure_future(self._acall(secondary, messages, parse, schema))
+            ] = secondary
+
+        errors = []
+        throttled = []
+        try:
+            while pending:
+                remaining = None
+                if timeout is not None:
+                    remaining = max(0.0, timeout - (time.monotonic() - started))
+                done, _ = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if self._deadline_cut(timeout):
+                        raise self._deadline_exceeded(pending.values())
+                    for backend in pending.values():
+                        backend.record_failure(timed_out=True)
+                        errors.append(f"{backend.name}: timed out after {timeout}s")
+                    break
+                for task in done:
+                    backend = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if isinstance(error, DeadlineExceeded):
+                        raise error
+                    if isinstance(error, RateLimitExceeded):
+                        throttled.append(error)
+                    errors.append(f"{backend.name}: {str(error)}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise ProviderError("; ".join(errors), errors, throttled)
+
+    def stats(self) -> List[dict]:
+        return [backend.snapshot() for backend in self.backends]
@@ -0,0 +1,240 @@
+from typing import Optional
+from collections import deque
+import asyncio
+import itertools
+import threading
+import time
+
+# How often async callers waiting behind the queue head re-check their turn
+ASYNC_POLL_SECONDS = 0.05
+
+# Token encodings by model, shared by every governor. None marks one that
+# could not be loaded (e.g. no network for tiktoken's download), so the
+# download is tried once per process rather than on every call.
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _load_encoding(model: str):
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Token encoding for {model} unavailable, estimating from length: {str(e)}")
+                encoding = None
+            _encodings[model] = encoding
+        return _encodings[model]
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a caller could not get capacity within its maximum wait"""
+
+    def __init__(self, message: str, retry_after: float = 1.0, headers: Optional[dict] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.headers = headers or {}
+
+
+class TokenBucket:
+    """A bucket that refills continuously up to ``capacity`` per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (call after refill)"""
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateGovernor:
+    """
+    Shared client-side limiter for requests and tokens per minute.
+
+    Callers are served strictly in arrival order: only the head of the queue
+    may take capacity, so a large prompt cannot be starved by small ones.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_wait_seconds: float = 30.0,
+        model: str = "gpt-4o",
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_wait_seconds = max_wait_seconds
+        self.model = model
+        self._encoding = None
+        self._queue = deque()
+        self._tickets = itertools.count()
+        self._condition = threading.Condition()
+        self.throttled = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def enabled(self) -> bool:
+        return self.request_bucket is not None or self.token_bucket is not None
+
+    def _get_encoding(self):
+        if self._encoding is None:
+            self._encoding = _load_encoding(self.model)
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        encoding = self._get_encoding()
+        if encoding is None:
+            # Encoding files unavailable; roughly four characters per token
+            return len(text) // 4
+        return len(encoding.encode(text))
+
+    def estimate_tokens(self, messages, completion_tokens: int = 1000, image_tokens: int = 1000) -> int:
+        """Estimate prompt plus completion tokens for a string or message list"""
+        if isinstance(messages, str):
+            return self.count_tokens(messages) + completion_tokens
+
+        total = completion_tokens
+        for message in messages:
+            content = getattr(message, "content", message)
+            if isinstance(content, str):
+                total += self.count_tokens(content)
+                continue
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    total += self.count_tokens(part.get("text", ""))
+                elif isinstance(part, dict) and part.get("type") == "image_url":
+                    total += image_tokens
+                else:
+                    total += self.count_tokens(str(part))
+        return total
+
+    def _try_take(self, ticket: int, tokens: int, now: float) -> Optional[float]:
+        """
+        Take capacity if ``ticket`` is at the head of the queue. Returns 0.0
+        when taken, the seconds to wait when the head is short of capacity,
+        or None when another caller is ahead. Call with the condition held.
+        """
+        if self._queue[0] != ticket:
+            return None
+        wait = 0.0
+        if self.request_bucket is not None:
+            self.request_bucket.refill(now)
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            self.token_bucket.refill(now)
+            wait = max(wait, self.token_bucket.wait_time(tokens))
+        if wait == 0.0:
+            if self.request_bucket is not None:
+                self.request_bucket.tokens -= 1
+            if self.token_bucket is not None:
+                self.token_bucket.tokens -= tokens
+        return wait
+
+    def _throttle(self, wait: Optional[float]) -> RateLimitExceeded:
+        self.throttled += 1
+        return RateLimitExceeded(
+            f"LLM rate limit reached; {len(self._queue)} calls queued",
+            retry_after=max(1.0, wait or 0.0),
+        )
+
+    def acquire(self, tokens: int = 0, max_wait: Optional[float] = None):
+        """Block until one request and ``tokens`` tokens are available"""
+        if self.request_bucket is None and self.token_bucket is None:
+            return
+
+        max_wait = self.max_wait_seconds if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        if self.token_bucket is not None:
+            tokens = min(tokens, self.token_bucket.capacity)
+
+        with self._condition:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._try_take(ticket, tokens, now)
+                    if wait == 0.0:
+                        return
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._throttle(wait)
+                    self._condition.wait(min(remaining, wait) if wait else remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    async def acquire_async(self, tokens: int = 0, max_wait: Optional[float] = None):
+        """
+        Event-loop counterpart of ``acquire``: waits in the same arrival-order
+        queue but sleeps with ``asyncio.sleep`` instead of blocking a thread
+        """
+        if self.request_bucket is None and self.token_bucket is None:
+            return
+
+        max_wait = self.max_wait_seconds if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        if self.token_bucket is not None:
+            tokens = min(tokens, self.token_bucket.capacity)
+
+        with self._condition:
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._condition:
+                    now = time.monotonic()
+                    wait = self._try_take(ticket, tokens, now)
+                    if wait == 0.0:
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._throttle(wait)
+                # Callers behind the head poll; the head sleeps until refill
+                await asyncio.sleep(min(remaining, wait or ASYNC_POLL_SECONDS))
+        finally:
+            with self._condition:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the provider reports real usage"""
+        if self.token_bucket is None or actual_tokens is None:
+            return
+        with self._condition:
+            self.token_bucket.tokens = min(
+                self.token_bucket.capacity,
+                self.token_bucket.tokens + estimated_tokens - actual_tokens,
+            )
+            self._condition.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "throttled": self.throttled,
+            "requests_available": (
+                round(self.request_bucket.tokens, 2) if self.request_bucket else None
+            ),
+            "tokens_available": (
+                round(self.token_bucket.tokens, 2) if self.token_bucket else None
+            ),
+        }
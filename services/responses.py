@@ -0,0 +1,193 @@
+from typing import Any, Iterable, List, Optional
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compressing tiny bodies costs more than it saves
+DEFAULT_MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def dumps(
+    obj: Any,
+    default=None,
+    sort_keys: bool = False,
+    indent: bool = False,
+    passthrough_datetime: bool = False,
+) -> bytes:
+    """Serialize to UTF-8 JSON bytes with orjson, falling back to the stdlib"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if passthrough_datetime:
+            # Let ``default`` format datetimes, as Flask's provider does
+            option |= orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(
+        obj,
+        default=default,
+        sort_keys=sort_keys,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+def orjson_provider(app):
+    """A Flask JSON provider that serializes with orjson"""
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            return dumps(
+                obj,
+                default=kwargs.get("default", self.default),
+                sort_keys=kwargs.get("sort_keys", self.sort_keys),
+                indent=bool(kwargs.get("indent")),
+                passthrough_datetime=True,
+            ).decode("utf-8")
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            body = dumps(
+                obj,
+                default=self.default,
+                sort_keys=self.sort_keys,
+                indent=indent,
+                passthrough_datetime=True,
+            )
+            return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+    return OrjsonProvider(app)
+
+
+def parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    """Split a ``fields=a,b.c`` query parameter; None when absent"""
+    if not value:
+        return None
+    return [field.strip() for field in value.split(",") if field.strip()]
+
+
+def project(data: Any, fields: Optional[Iterable[str]]) -> Any:
+    """
+    Keep only the dotted ``fields`` of a JSON-like value. Lists are projected
+    item by item, so ``detailed_results.is_correct`` keeps one key per result.
+    """
+    if not fields:
+        return data
+    tree = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+    return _project(data, tree)
+
+
+def _project(data: Any, tree: dict) -> Any:
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [_project(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: _project(data[key], sub) for key, sub in tree.items() if key in data}
+    return data
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick brotli or gzip from an Accept-Encoding header, honouring q=0"""
+    offered = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name.strip().lower()] = quality
+
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Quality 5 is close to gzip speed with noticeably smaller output
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def should_compress(content_type: Optional[str], body_size: int, min_size: int) -> bool:
+    return body_size >= min_size and (content_type or "").startswith(COMPRESSIBLE_TYPES)
+
+
+def init_app(app, min_size: int = DEFAULT_MIN_COMPRESS_BYTES):
+    """Serialize JSON with orjson and compress large responses"""
+    from flask import request
+
+    app.json = orjson_provider(app)
+
+    @app.after_request
+    def _compress_response(response):
+        response.vary.add("Accept-Encoding")
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+        ):
+            return response
+        body = response.get_data()
+        if not should_compress(response.content_type, len(body), min_size):
+            return response
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def aiohttp_middleware(min_size: int = DEFAULT_MIN_COMPRESS_BYTES):
+    """aiohttp counterpart of ``init_app``'s response compression"""
+    from aiohttp import web
+
+    @web.middleware
+    async def middleware(request, handler):
+        response = await handler(request)
+        body = getattr(response, "body", None)
+        if (
+            not isinstance(body, (bytes, bytearray))
+            or "Content-Encoding" in response.headers
+            or not should_compress(response.content_type, len(body), min_size)
+        ):
+            return response
+        if "Accept-Encoding" not in response.headers.get("Vary", ""):
+            response.headers.add("Vary", "Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is not None:
+            response.body = compress(bytes(body), encoding)
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    return middleware
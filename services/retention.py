@@ -0,0 +1,256 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import or_, text
+from models.models import AttemptModel, SessionModel, Session, engine
+from services.bulk_transfer import RESULT_FILE_PREFIX
+import os
+import threading
+import time
+
+
+def _expired_condition(
+    now: datetime, max_age_days: Optional[float], max_idle_days: Optional[float]
+):
+    """Build the WHERE clause selecting sessions outside the retention policy"""
+    conditions = []
+    if max_age_days:
+        conditions.append(SessionModel.created_at < now - timedelta(days=max_age_days))
+    if max_idle_days:
+        cutoff = now - timedelta(days=max_idle_days)
+        conditions.append(
+            or_(
+                SessionModel.last_accessed_at < cutoff,
+                # Rows that were never read fall back to their creation time
+                (SessionModel.last_accessed_at.is_(None))
+                & (SessionModel.created_at < cutoff),
+            )
+        )
+    if not conditions:
+        return None
+    return or_(*conditions)
+
+
+def _result_path(results_dir: str, quiz_id: str) -> str:
+    return os.path.join(results_dir, f"{RESULT_FILE_PREFIX}{quiz_id}.json")
+
+
+def _remove_result_files(results_dir: Optional[str], ids) -> int:
+    """Delete the result files of removed quizzes; returns how many existed"""
+    if not results_dir:
+        return 0
+    removed = 0
+    for quiz_id in ids:
+        try:
+            os.remove(_result_path(results_dir, quiz_id))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def count_expired_sessions(
+    max_age_days=None, max_idle_days=None, now=None, results_dir=None
+) -> dict:
+    """
+    Count what the retention policy would delete: sessions, their attempts
+    and, with ``results_dir``, their result files
+    """
+    counts = {"sessions": 0, "attempts": 0, "result_files": 0}
+    condition = _expired_condition(now or datetime.utcnow(), max_age_days, max_idle_days)
+    if condition is None:
+        return counts
+    session = Session()
+    try:
+        expired = session.query(SessionModel.id).filter(condition)
+        counts["sessions"] = expired.count()
+        counts["attempts"] = (
+            session.query(AttemptModel.id)
+            .filter(AttemptModel.quiz_id.in_(expired.subquery().select()))
+            .count()
+        )
+        if results_dir:
+            counts["result_files"] = sum(
+                os.path.exists(_result_path(results_dir, row.id)) for row in expired.yield_per(1000)
+            )
+        return counts
+    finally:
+        session.close()
+
+
+def prune_expired_sessions(
+    max_age_days=None,
+    max_idle_days=None,
+    batch_size: int = 200,
+    max_batches: Optional[int] = None,
+    pause_seconds: float = 0.05,
+    now=None,
+    results_dir: Optional[str] = None,
+) -> int:
+    """
+    Delete expired sessions in small batches and return the number removed.
+
+    A session's evaluation attempts go in the same transaction, and its
+    result file in ``results_dir`` (imported results) right after, since
+    nothing can reach them once the quiz is gone. Each batch is its own
+    short transaction so concurrent requests are never blocked on the
+    database lock for long.
+    """
+    condition = _expired_condition(now or datetime.utcnow(), max_age_days, max_idle_days)
+    if condition is None:
+        return 0
+
+    deleted = 0
+    batches = 0
+    session = Session()
+    try:
+        while max_batches is None or batches < max_batches:
+            ids = [
+                row.id
+                for row in session.query(SessionModel.id)
+                .filter(condition)
+                .limit(batch_size)
+                .all()
+            ]
+            if not ids:
+                break
+
+            session.query(AttemptModel).filter(AttemptModel.quiz_id.in_(ids)).delete(
+                synchronize_session=False
+            )
+            session.query(SessionModel).filter(SessionModel.id.in_(ids)).delete(
+                synchronize_session=False
+            )
+            session.commit()
+            _remove_result_files(results_dir, ids)
+            deleted += len(ids)
+            batches += 1
+
+            if len(ids) < batch_size:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    return deleted
+
+
+def database_stats(bind=engine) -> dict:
+    """Return SQLite page accounting for the database file"""
+    with bind.connect() as conn:
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        page_count = conn.execute(text("PRAGMA page_count")).scalar()
+        freelist_count = conn.execute(text("PRAGMA freelist_count")).scalar()
+        auto_vacuum = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+
+    return {
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist_count,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum),
+    }
+
+
+def compact_database(pages: Optional[int] = None, full: bool = False, bind=engine) -> dict:
+    """
+    Reclaim free pages from the database file.
+
+    Incremental vacuum only releases up to ``pages`` free pages, so it is cheap
+    enough to run from the background worker. It requires
+    ``auto_vacuum=INCREMENTAL``; a ``full`` run switches the database to that
+    mode and rewrites the file once with VACUUM.
+    """
+    before = database_stats(bind)
+
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if full:
+            if before["auto_vacuum"] != "incremental":
+                conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+        elif before["auto_vacuum"] == "incremental":
+            if pages:
+                conn.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+            else:
+                conn.execute(text("PRAGMA incremental_vacuum"))
+
+    after = database_stats(bind)
+    return {
+        "before_bytes": before["size_bytes"],
+        "after_bytes": after["size_bytes"],
+        "reclaimed_bytes": before["size_bytes"] - after["size_bytes"],
+        "free_bytes": after["free_bytes"],
+        "auto_vacuum": after["auto_vacuum"],
+    }
+
+
+class RetentionWorker(threading.Thread):
+    """Daemon thread that periodically prunes expired sessions and compacts"""
+
+    def __init__(
+        self,
+        max_age_days=None,
+        max_idle_days=None,
+        batch_size: int = 200,
+        interval_seconds: int = 3600,
+        vacuum_pages: int = 1000,
+        results_dir: Optional[str] = None,
+    ):
+        super().__init__(name="session-retention", daemon=True)
+        self.max_age_days = max_age_days
+        self.max_idle_days = max_idle_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.vacuum_pages = vacuum_pages
+        self.results_dir = results_dir
+        self._stop_event = threading.Event()
+        self._warned_auto_vacuum = False
+
+    def run_once(self) -> dict:
+        deleted = prune_expired_sessions(
+            max_age_days=self.max_age_days,
+            max_idle_days=self.max_idle_days,
+            batch_size=self.batch_size,
+            results_dir=self.results_dir,
+        )
+        compaction = compact_database(pages=self.vacuum_pages) if deleted else None
+        if compaction and compaction["auto_vacuum"] != "incremental" and not self._warned_auto_vacuum:
+            print(
+                "Database is not in auto_vacuum=INCREMENTAL mode, so freed pages are not "
+                "reclaimed; run 'alembic upgrade head' or 'python manage_db.py prune --full' once"
+            )
+            self._warned_auto_vacuum = True
+        return {"deleted": deleted, "compaction": compaction}
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error pruning sessions: {str(e)}")
+            self._stop_event.wait(self.interval_seconds)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_retention_worker(config) -> Optional[RetentionWorker]:
+    """Start the background pruner if the config defines a retention policy"""
+    if not (config.SESSION_MAX_AGE_DAYS or config.SESSION_MAX_IDLE_DAYS):
+        return None
+
+    worker = RetentionWorker(
+        max_age_days=config.SESSION_MAX_AGE_DAYS,
+        max_idle_days=config.SESSION_MAX_IDLE_DAYS,
+        batch_size=config.RETENTION_BATCH_SIZE,
+        interval_seconds=config.RETENTION_INTERVAL_SECONDS,
+        vacuum_pages=config.RETENTION_VACUUM_PAGES,
+        results_dir=config.QUIZ_RESULTS_DIR,
+    )
+    worker.start()
+    return worker
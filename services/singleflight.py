@@ -0,0 +1,140 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+from services.deadlines import DeadlineExceeded
+from services import deadlines
+import asyncio
+import copy
+import threading
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a follower gave up waiting for the in-flight call"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+def _rerun(error: BaseException) -> bool:
+    """
+    Whether a follower should run the call itself after the leader failed:
+    the leader ran out of its own request deadline, but the follower has time left
+    """
+    return isinstance(error, DeadlineExceeded) and not deadlines.expired()
+
+
+def _shared_error(error: BaseException) -> BaseException:
+    """A copy of the leader's exception, so followers do not raise one object on many threads"""
+    try:
+        shared = copy.copy(error)
+    except Exception:
+        return error
+    shared.__cause__ = error
+    return shared
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight wait for and share its result, or its
+    exception. Nothing is kept once the call completes, so this is not a
+    cache: a later caller with the same key starts a new call.
+
+    The call runs under the leader's request deadline. When that deadline
+    cuts it short, followers with time left start the call again rather
+    than fail with the leader.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._tasks)
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None):
+        """Return ``(result, shared)``; ``shared`` is True for followers"""
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.followers += 1
+
+            if leader:
+                break
+            wait = None if timeout is None else deadlines.cap(timeout)
+            if not call.done.wait(wait):
+                raise SingleFlightTimeout(
+                    f"Timed out after {wait}s waiting for an identical in-flight request"
+                )
+            if call.error is None:
+                return call.result, True
+            if not _rerun(call.error):
+                raise _shared_error(call.error)
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    async def do_async(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None,
+    ):
+        """
+        Coroutine counterpart of ``do`` for callers on one event loop.
+
+        The call runs as its own task and every caller awaits it shielded, so
+        a disconnecting leader does not cancel the call for its followers.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            task = self._tasks.get(key)
+            # A finished task may not have been forgotten yet
+            leader = task is None or task.done()
+            if leader:
+                task = self._tasks[key] = asyncio.ensure_future(fn())
+
+                def _forget(done):
+                    if self._tasks.get(key) is done:
+                        del self._tasks[key]
+                    if not done.cancelled():
+                        done.exception()  # mark as retrieved when nobody is left waiting
+
+                task.add_done_callback(_forget)
+                return await asyncio.shield(task), False
+
+            wait = None if timeout is None else deadlines.cap(timeout)
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), wait), True
+            except asyncio.TimeoutError:
+                if task.done() and isinstance(task.exception(), asyncio.TimeoutError):
+                    error = task.exception()
+                else:
+                    raise SingleFlightTimeout(
+                        f"Timed out after {wait}s waiting for an identical in-flight request"
+                    )
+            except Exception as e:
+                error = e
+            if not _rerun(error):
+                raise _shared_error(error)
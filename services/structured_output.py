@@ -0,0 +1,100 @@
+"""
+Compact JSON schemas for provider-native structured output.
+
+The schemas are strict (every property required, no extra properties) so
+they work with OpenAI's ``json_schema`` mode as well as Gemini function
+calling, and they are what the model fills in instead of following the
+JSON examples spelled out in the prompt-only templates.
+"""
+from typing import Any, Dict, List
+
+_TEXT = {"type": "string"}
+_EXPLANATION = {"type": "string", "description": "One short sentence"}
+
+
+def _obj(properties: Dict[str, dict], description: str = "") -> dict:
+    schema = {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def _answer_schema(q_type: str) -> Dict[str, dict]:
+    """The type-specific properties of a question"""
+    if q_type == "mcq":
+        return {
+            "options": {"type": "array", "items": _TEXT, "description": "Four options"},
+            "answer": {"type": "string", "description": "The correct option, verbatim"},
+        }
+    if q_type == "true_false":
+        return {"answer": {"type": "string", "enum": ["true", "false"]}}
+    if q_type == "sequence":
+        return {
+            "answer": {
+                "type": "array",
+                "items": _obj({"id": _TEXT, "content": _TEXT}),
+                "description": "Steps in the correct order",
+            }
+        }
+    if q_type == "match_the_following":
+        # The answer is derived from the pairs, see LLMService._finalize_question
+        return {
+            "match_the_following_pairs": _obj(
+                {"left": {"type": "array", "items": _TEXT}, "right": {"type": "array", "items": _TEXT}},
+                "right[i] is the match of left[i]",
+            )
+        }
+    return {"answer": _TEXT}
+
+
+def question_item_schema(q_type: str, tagged: bool = False) -> dict:
+    """One question of a type; ``tagged`` adds the type field for mixed quizzes"""
+    properties = {"question": _TEXT}
+    if tagged:
+        properties["type"] = {"type": "string", "enum": [q_type]}
+    properties.update(_answer_schema(q_type))
+    properties["explanation"] = _EXPLANATION
+    return _obj(properties)
+
+
+def questions_schema(question_types: List[str]) -> dict:
+    """Schema for a reply of questions of one or several types"""
+    if len(question_types) == 1:
+        items = question_item_schema(question_types[0])
+    else:
+        items = {"anyOf": [question_item_schema(t, tagged=True) for t in question_types]}
+    schema = _obj({"questions": {"type": "array", "items": items}})
+    # Used as the schema name by providers; one per type combination
+    schema["title"] = "questions_" + "_".join(question_types)
+    return schema
+
+
+def grade_schema(short_explanation: bool = False) -> dict:
+    explanation = (
+        {"type": "string", "description": "Empty if correct, else one short sentence"}
+        if short_explanation
+        else {"type": "string", "description": "Why the answer is correct or incorrect"}
+    )
+    schema = _obj(
+        {
+            "is_correct": {"type": "boolean"},
+            "score": {"type": "number", "description": "Between 0 and 1"},
+            "explanation": explanation,
+        }
+    )
+    schema["title"] = "grade_short" if short_explanation else "grade"
+    return schema
+
+
+def complete_questions(parsed: Any) -> Any:
+    """Fill the fields the compact schemas leave out, so replies match prompt mode"""
+    if isinstance(parsed, dict):
+        for question in parsed.get("questions") or []:
+            if isinstance(question, dict) and "match_the_following_pairs" in question:
+                question.setdefault("answer", {})
+    return parsed
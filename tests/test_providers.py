@@ -0,0 +1,191 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_llm import FakeChatModel
+from services.deadlines import DeadlineExceeded
+from services.providers import ProviderBackend, ProviderError, ProviderRouter
+from services.rate_limiter import RateGovernor, RateLimitExceeded
+from services.structured_output import grade_schema
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = {}
+
+
+class StubModel:
+    """Answers every call with ``content`` after ``delay``, or raises ``error``"""
+
+    def __init__(self, content="ok", delay=0.0, error=None):
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return Reply(self.content)
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return Reply(self.content)
+
+
+def accept_valid(content):
+    if content == "invalid":
+        raise ValueError("Unparseable reply")
+    return content
+
+
+def throttled_governor():
+    governor = RateGovernor(requests_per_minute=1, max_wait_seconds=0)
+    governor.request_bucket.tokens = 0
+    return governor
+
+
+def test_structured_on_lazy_backend():
+    backend = ProviderBackend("lazy", factory=FakeChatModel)
+    result = {}
+
+    # Run in a thread so a deadlock fails the test instead of hanging it
+    thread = threading.Thread(
+        target=lambda: result.update(runnable=backend.structured(grade_schema())),
+        daemon=True,
+    )
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive(), "structured() deadlocked building the lazy client"
+    assert result["runnable"] is backend.structured(grade_schema())
+    assert result["runnable"].model is backend.llm
+
+
+def test_fails_over_when_primary_raises():
+    primary = ProviderBackend("primary", StubModel(error=RuntimeError("boom")))
+    secondary = ProviderBackend("secondary", StubModel("from secondary"))
+    router = ProviderRouter([primary, secondary])
+
+    assert router.invoke("prompt", accept_valid) == "from secondary"
+    assert (primary.calls, primary.errors) == (1, 1)
+    assert (secondary.calls, secondary.errors) == (1, 0)
+
+
+def test_fails_over_on_unparseable_reply():
+    primary = ProviderBackend("primary", StubModel("invalid"))
+    secondary = ProviderBackend("secondary", StubModel("valid"))
+    router = ProviderRouter([primary, secondary])
+
+    assert router.invoke("prompt", accept_valid) == "valid"
+    assert primary.errors == 1
+
+
+def test_all_backends_failing_raises_provider_error():
+    router = ProviderRouter(
+        [
+            ProviderBackend("a", StubModel(error=RuntimeError("down"))),
+            ProviderBackend("b", StubModel(error=RuntimeError("down"))),
+        ]
+    )
+    with pytest.raises(ProviderError) as raised:
+        router.invoke("prompt", accept_valid)
+    assert len(raised.value.errors) == 2
+
+
+def test_hedge_fires_for_slow_primary():
+    primary = ProviderBackend("primary", StubModel("slow", delay=0.5))
+    secondary = ProviderBackend("secondary", StubModel("fast"))
+    router = ProviderRouter([primary, secondary], hedge=True, hedge_min_delay=0.05)
+
+    started = time.monotonic()
+    assert router.invoke("prompt", accept_valid) == "fast"
+    assert time.monotonic() - started < 0.4
+    assert secondary.calls == 1
+
+
+def test_hedge_keeps_waiting_for_a_valid_parse():
+    primary = ProviderBackend("primary", StubModel("valid", delay=0.3))
+    secondary = ProviderBackend("secondary", StubModel("invalid"))
+    router = ProviderRouter([primary, secondary], hedge=True, hedge_min_delay=0.05)
+
+    assert router.invoke("prompt", accept_valid) == "valid"
+    assert secondary.errors == 1
+    assert primary.errors == 0
+
+
+def test_async_hedge_fires_for_slow_primary():
+    primary = ProviderBackend("primary", StubModel("slow", delay=0.5))
+    secondary = ProviderBackend("secondary", StubModel("fast"))
+    router = ProviderRouter([primary, secondary], hedge=True, hedge_min_delay=0.05)
+
+    assert asyncio.run(router.ainvoke("prompt", accept_valid)) == "fast"
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_rate_limit_propagates_when_every_backend_is_throttled(hedge):
+    router = ProviderRouter(
+        [
+            ProviderBackend("a", StubModel(), governor=throttled_governor()),
+            ProviderBackend("b", StubModel(), governor=throttled_governor()),
+        ],
+        hedge=hedge,
+        hedge_min_delay=0.05,
+    )
+    with pytest.raises(RateLimitExceeded):
+        router.invoke("prompt", accept_valid)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(router.ainvoke("prompt", accept_valid))
+
+
+def test_hedged_deadline_is_not_a_provider_error():
+    router = ProviderRouter(
+        [
+            ProviderBackend("a", StubModel(error=DeadlineExceeded("out of time"))),
+            ProviderBackend("b", StubModel(error=RuntimeError("down"))),
+        ],
+        hedge=True,
+        hedge_min_delay=0.05,
+    )
+    with pytest.raises(DeadlineExceeded):
+        router.invoke("prompt", accept_valid)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(router.ainvoke("prompt", accept_valid))
+
+
+def test_cooling_down_backends_are_tried_last():
+    flaky = ProviderBackend("flaky", StubModel(), failure_threshold=2, cooldown_seconds=60)
+    steady = ProviderBackend("steady", StubModel())
+    router = ProviderRouter([flaky, steady])
+    assert router.ordered_backends() == [flaky, steady]
+
+    flaky.record_failure()
+    flaky.record_failure()
+    assert flaky.is_cooling_down()
+    assert router.ordered_backends() == [steady, flaky]
+
+    flaky.cooldown_until = 0.0
+    flaky.record_success(0.01)
+    steady.record_success(0.5)
+    assert router.ordered_backends() == [flaky, steady]
+
+
+def test_stats_per_backend():
+    primary = ProviderBackend("primary", StubModel(error=RuntimeError("boom")))
+    secondary = ProviderBackend("secondary", StubModel("ok"))
+    router = ProviderRouter([primary, secondary])
+    router.invoke("prompt", accept_valid)
+
+    stats = {entry["name"]: entry for entry in router.stats()}
+    assert stats["primary"]["errors"] == 1
+    assert stats["primary"]["error_rate"] == 1.0
+    assert stats["secondary"]["calls"] == 1
+    assert stats["secondary"]["p50_seconds"] is not None
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+from services import deadlines
+from services.deadlines import DeadlineExceeded
+from services.singleflight import SingleFlight
+
+
+def slow_call(calls, seconds=0.3):
+    """A call that takes ``seconds`` or fails once the caller's deadline passes"""
+
+    def call():
+        calls.append(threading.current_thread().name)
+        if deadlines.remaining() is not None and deadlines.remaining() < seconds:
+            time.sleep(max(0.0, deadlines.remaining()))
+            raise DeadlineExceeded("Request deadline exceeded")
+        time.sleep(seconds)
+        return "done"
+
+    return call
+
+
+def test_follower_reruns_after_leader_deadline():
+    flight = SingleFlight(timeout=5)
+    calls, results = [], {}
+
+    def leader():
+        with deadlines.deadline(0.1):
+            try:
+                flight.do("key", slow_call(calls))
+            except DeadlineExceeded as e:
+                results["leader"] = e
+
+    def follower():
+        with deadlines.deadline(5):
+            results["follower"] = flight.do("key", slow_call(calls))
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=follower))
+    threads[1].start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert isinstance(results["leader"], DeadlineExceeded)
+    assert results["follower"] == ("done", False)
+    assert len(calls) == 2
+
+
+def test_followers_get_their_own_copy_of_other_errors():
+    flight = SingleFlight(timeout=5)
+    errors = []
+
+    def failing():
+        time.sleep(0.1)
+        raise ValueError("bad reply")
+
+    def caller():
+        try:
+            flight.do("key", failing)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(errors) == 3
+    assert len({id(error) for error in errors}) == 3
+
+
+def test_async_follower_reruns_after_leader_deadline():
+    flight = SingleFlight(timeout=5)
+    calls = []
+
+    async def call():
+        calls.append(deadlines.remaining())
+        left = deadlines.remaining()
+        if left < 0.3:
+            await asyncio.sleep(max(0.0, left))
+            raise DeadlineExceeded("Request deadline exceeded")
+        await asyncio.sleep(0.3)
+        return "done"
+
+    async def leader():
+        with deadlines.deadline(0.1):
+            return await flight.do_async("key", call)
+
+    async def follower():
+        await asyncio.sleep(0.02)
+        with deadlines.deadline(5):
+            return await flight.do_async("key", call)
+
+    async def main():
+        return await asyncio.gather(leader(), follower(), return_exceptions=True)
+
+    leader_result, follower_result = asyncio.run(main())
+    assert isinstance(leader_result, DeadlineExceeded)
+    assert follower_result == ("done", False)
+    assert len(calls) == 2